@@ -1,11 +1,22 @@
 # File: app.py
-import flet as ft
-from db_functions import init_db, get_current_aya, update_current_aya, load_aya_data, get_speed, update_speed
-from components.page import create_page
-from components.audio_player import create_audio_player
+import os
+from db_functions import init_db, get_current_aya, update_current_aya, load_aya_data, get_speed, update_speed, load_pause_points, load_trim_offsets, load_image_variants, load_image_atlas
+from image_cache import ImageCache
+from asset_store import open_asset_store, DirectoryAssetStore
+from asset_manifest import quick_check
+from state import StateStore
+from navigation_scheduler import NavigationScheduler
+from input_bus import InputBus
 
 class QuranApp:
-    def __init__(self):
+    def __init__(self, asset_pack=None, content_addressed=False, db_path=None, player_factory=None,
+                 check_assets=True, save_position=None):
+        """player_factory creates audio players (create_audio_player's signature); Flet's by default.
+
+        save_position(aya_id) persists the aya navigated to; a write to the database by default.
+        """
+        # current_index, speed, aya_duration and the play-beginning flag live in the store
+        self.state = StateStore()
         self.current_index = 0
         self.aya_data = []
         self.sura_map = {}
@@ -14,76 +25,464 @@ class QuranApp:
         self.aya_duration = None
         self.play_begining_of_aya_is_true = False
         self.audio_volume = 1.0
+        self.is_playing = False
+        self.is_paused = False  # paused part-way by the user, so play resumes from there
+        self.auto_continue = True  # keep playing into the next aya when one finishes
+        self.play_on_load = False  # start the next player as soon as it loads (auto-advance)
+        self.db_path = db_path
+        self.player_factory = player_factory
+        self.save_position = save_position
+        self.play_beginning_fade_fraction = 0.3
+        self.play_beginning_stop_fraction = 0.6
+        self.pause_snap_tolerance = 0.15  # max distance to a natural pause, as a fraction of the aya
+        self.play_beginning_cut = (None, None)
+        self.trim_keep_margin_ms = 150  # silence kept around the trimmed aya
+        self.trim_stop_at = None
+        self.trim_stop_fired = False
+        self.voice_morph = None  # MorphRenderScheduler while voice morphing is enabled
+        self.tracer = None  # LatencyTracer while key-to-audio latency is traced
+        self.recorder = None  # IntentRecorder while user intents are recorded for replay
+        self.ui_dispatch = None  # runs a callable on the page's event loop; set by the page
+        self.image_cache = ImageCache()  # set to None to let the client fetch image files itself
+        self.image_display_height = 300
+        self.image_pixel_ratio = 1.0
+        self.image_formats = ('webp', 'png')  # formats the client can display
+        self.use_image_atlas = True
+        self.check_assets_on_start = check_assets
+        self.asset_watcher = None
+        # Key presses and skips go through here so a burst loads only the aya it ends on
+        self.navigation = NavigationScheduler(apply=self.load_index, dispatch=self.call_on_ui)
+        self.loaded_index = None  # index the current audio player was created for
+        # Keyboard and ring events, mapped to these commands through keymap.json
+        self.input_bus = InputBus({
+            'next': self.next_item,
+            'previous': self.prev_item,
+            'toggle_play': self.toggle_play,
+            'volume_up': lambda: self.change_volume(0.1),
+            'volume_down': lambda: self.change_volume(-0.1),
+            'speed_up': lambda: self.change_speed(0.1),
+            'speed_down': lambda: self.change_speed(-0.1),
+        })
+        self.asset_store = open_asset_store(asset_pack, content_addressed=content_addressed, db_path=self.db_path)
+        if not isinstance(self.asset_store, DirectoryAssetStore):
+            # Stored assets don't live at their catalog paths, so images are always sent inline
+            self.image_cache = ImageCache(reader=lambda path: self.asset_store.read(self.asset_store.name_for(path)))
+            self.use_image_atlas = False
 
         # Initialize database and load data
         self.init_db()  # Correctly call the instance method
-        self.aya_data = load_aya_data()
+        self.aya_data = load_aya_data(db_path)
         if not self.aya_data:
             raise ValueError("No aya data found in database")
+        self.pause_points = load_pause_points(db_path)
+        self.trim_offsets = load_trim_offsets(db_path)
+        self.image_variants = load_image_variants(db_path)
+        self.image_atlas = load_image_atlas(db_path)
+        if self.check_assets_on_start and isinstance(self.asset_store, DirectoryAssetStore):
+            self.report_asset_problems()
         self.current_index = self.get_current_aya() - 1
 
-        # Get unique sura names and their first ayah indices
-        for item in self.aya_data:
-            if item['sura_name'] not in self.sura_map:
-                self.sura_map[item['sura_name']] = {
-                    'first_index': self.aya_data.index(item),
-                    'last_aya': max(x['aya'] for x in self.aya_data if x['sura_name'] == item['sura_name'])
-                }
+        self.sura_map = self.build_sura_map(self.aya_data)
         #should be removed to app level
         self.audio_player = self.setup_audio_player(self.aya_data[self.current_index]['audio'])
-        
-        
+        self.loaded_index = self.current_index
+
+    @property
+    def current_index(self):
+        return self.state.get('navigation', 'index')
+
+    @current_index.setter
+    def current_index(self, index):
+        # Subscribers (the page) load the new aya when this changes
+        self.state.set('navigation', index=index)
+
+    @property
+    def speed(self):
+        return self.state.get('playback', 'speed')
+
+    @speed.setter
+    def speed(self, speed):
+        self.state.set('playback', speed=speed)
+
+    @property
+    def aya_duration(self):
+        return self.state.get('playback', 'aya_duration')
+
+    @aya_duration.setter
+    def aya_duration(self, duration):
+        self.state.set('playback', aya_duration=duration)
+
+    @property
+    def play_begining_of_aya_is_true(self):
+        return self.state.get('playback', 'play_beginning')
+
+    @play_begining_of_aya_is_true.setter
+    def play_begining_of_aya_is_true(self, enabled):
+        self.state.set('playback', play_beginning=enabled)
+
     def audio_position_changed(self, e):
         """Handle audio position changes."""
+        if self.trim_stop_at and not self.play_begining_of_aya_is_true and not self.trim_stop_fired:
+            if e.data and float(e.data) >= self.trim_stop_at:
+                # Skip the trailing silence by finishing the aya early
+                print(f"[DEBUG] Reached trim end at {e.data}ms, moving to next aya")
+                self.trim_stop_fired = True
+                self.audio_player.pause()
+                self.on_aya_completed()
+                return
         self.audio_player.handle_audio_position_changed(
             #self.audio_player,
             self.aya_duration,
             self.play_begining_of_aya_is_true,
-            self.audio_volume
+            self.audio_volume,
+            *self.play_beginning_cut
         )
 
+    def find_play_beginning_cut(self, audio, duration):
+        """Return (fade_start, stop_at) snapped to the natural pause nearest the configured stop fraction."""
+        stop_at = duration * self.play_beginning_stop_fraction
+        fade_start = duration * self.play_beginning_fade_fraction
+        # At most MAX_CUT_POINTS candidates per aya, so this is a constant-time lookup
+        candidates = self.pause_points.get(os.path.basename(audio), ())
+        if candidates:
+            nearest = min(candidates, key=lambda position: abs(position - stop_at))
+            if abs(nearest - stop_at) <= duration * self.pause_snap_tolerance:
+                fade_start = nearest * self.play_beginning_fade_fraction / self.play_beginning_stop_fraction
+                stop_at = nearest
+        return fade_start, stop_at
+
     def toggle_play_beginning_of_aya(self, e):
         """Handle play beginning of aya button click."""
-        self.play_begining_of_aya_is_true = not self.play_begining_of_aya_is_true
-        print(f"[DEBUG] Play beginning of aya flag set to: {self.play_begining_of_aya_is_true}")
+        with self.state.batch():
+            self.play_begining_of_aya_is_true = not self.play_begining_of_aya_is_true
+            print(f"[DEBUG] Play beginning of aya flag set to: {self.play_begining_of_aya_is_true}")
+            if self.audio_player:
+                self.audio_player.playback_rate = self.speed
+            if self.play_begining_of_aya_is_true:
+                self.current_index = (self.current_index + 1) % len(self.aya_data)
+
+    def on_aya_completed(self):
+        """Move to the next item after the current aya finishes, and keep playing if auto_continue is set."""
+        self.play_on_load = self.auto_continue
+        self.current_index = (self.current_index + 1) % len(self.aya_data)
+
+    def load_aya(self, index, overlay):
+        """Save the position and swap in an audio player for the aya at index.
+
+        overlay is the page's overlay list the player lives in. Returns False
+        when a newer navigation target made this load stale.
+        """
+        if self.navigation.is_stale():
+            # Skipped past already: leave the database and player to the newer target
+            return False
+        item = self.aya_data[index]
+        self.update_current_aya(item['id'])
+        if self.tracer:
+            self.tracer.mark('db_write')
+
+        # Dispose of the old audio player if it exists
+        if self.audio_player:
+            if self.audio_player in overlay:
+                overlay.remove(self.audio_player)
+            self.audio_player._dispose()
+
+        play_on_load, self.play_on_load = self.play_on_load, False
+        self.audio_player = self.setup_audio_player(item['audio'], should_play_on_load=play_on_load)
+        overlay.append(self.audio_player)
+        self.loaded_index = index
+        if self.tracer:
+            self.tracer.mark('player_created')
+        return True
+
+    def next_item(self):
+        """Step to the next aya; rapid steps are coalesced by the navigation scheduler."""
+        self.navigation.step(1, self.current_index, len(self.aya_data))
+
+    def prev_item(self):
+        """Step to the previous aya; rapid steps are coalesced by the navigation scheduler."""
+        self.navigation.step(-1, self.current_index, len(self.aya_data))
+
+    def toggle_play(self):
+        """Pause the current aya, resume it where it was paused, or play it when not started."""
+        if not self.audio_player:
+            return
+        if self.is_playing:
+            self.is_paused = True
+            self.audio_player.pause()
+        elif self.is_paused:
+            self.audio_player.resume()
+        else:
+            self.audio_player.play_current(audio_volume=self.audio_volume, speed=self.speed)
+
+    def change_volume(self, change):
+        """Step the playback volume, kept within 0-1."""
+        self.audio_volume = round(max(0.0, min(1.0, self.audio_volume + change)), 2)
         if self.audio_player:
-            self.audio_player.playback_rate = self.speed
-        if self.play_begining_of_aya_is_true:
-            self.current_index = (self.current_index + 1) % len(self.aya_data)
-            if hasattr(self, 'update_content'):
-                self.update_content()
+            self.audio_player.volume = self.audio_volume
+            self.audio_player.update()
+
+    def change_speed(self, change):
+        """Step the playback speed, kept within 0.5x-2x."""
+        self.update_speed(max(0.5, min(2.0, round(self.speed + change, 1))))
+
+    def select_aya(self, sura_name, aya_number):
+        """Jump to an aya picked in the dropdowns; False when the sura has no such aya."""
+        index = self.find_aya_index(sura_name, aya_number)
+        if index is None:
+            return False
+        self.go_to_index(index)
+        return True
+
+    def play(self):
+        """Play the current aya from its start, as the play button does."""
+        if self.audio_player:
+            self.audio_player.play_current(audio_volume=self.audio_volume, speed=self.speed)
+
+    def go_to_index(self, index):
+        """Jump to an aya, e.g. from the dropdowns."""
+        if self.tracer:
+            self.tracer.begin('jump')
+        self.navigation.request(index)
+
+    def load_index(self, index):
+        """Load the aya at index once a navigation burst settles."""
+        if self.tracer:
+            self.tracer.mark('load_start')
+        if index == self.current_index and self.loaded_index != index:
+            # A load of this aya was cut short by a newer target that came back to it
+            self.state.touch('navigation', 'index')
+        else:
+            self.current_index = index
+        if self.tracer and self.loaded_index == index:
+            self.tracer.mark('sent')
+
+    def enable_latency_trace(self, path=None):
+        """Timestamp every stage from key press to audio; see latency_trace.py."""
+        from latency_trace import LatencyTracer, TRACE_PATH
+        self.tracer = LatencyTracer(path or TRACE_PATH)
+        self.input_bus.tracer = self.tracer
+
+    def enable_intent_recording(self, path=None):
+        """Log every key press, dropdown pick and button press for replay; see input_replay.py."""
+        from input_replay import IntentRecorder, intent_log_path
+        item = self.aya_data[self.current_index]
+        self.recorder = IntentRecorder(path or intent_log_path(), {
+            'index': self.current_index,
+            'aya_id': item['id'],
+            'speed': self.speed,
+            'volume': self.audio_volume,
+            'play_beginning': self.play_begining_of_aya_is_true,
+            'keymap': self.input_bus.keymap,
+        })
+        self.input_bus.recorder = self.recorder
+
+    def record_intent(self, kind, *args):
+        if self.recorder:
+            self.recorder.record(kind, *args)
+
+    @staticmethod
+    def build_sura_map(aya_data):
+        """Sura name -> index of its first row and its last aya number, in one pass."""
+        sura_map = {}
+        for index, item in enumerate(aya_data):
+            entry = sura_map.setdefault(item['sura_name'], {'first_index': index, 'last_aya': item['aya']})
+            entry['last_aya'] = max(entry['last_aya'], item['aya'])
+        return sura_map
+
+    def start_asset_watcher(self, polling=False):
+        """Follow q_files and the catalog for changes while the app runs."""
+        # Imported here so the analysis stack is only loaded when watching
+        from catalog_watcher import CatalogWatcher
+        if not isinstance(self.asset_store, DirectoryAssetStore):
+            print("The asset watcher follows q_files; it is not used with a packed or content store")
+            return
+        self.asset_watcher = CatalogWatcher(on_refresh=self.apply_asset_changes,
+                                            on_catalog=lambda aya_data: self.call_on_ui(self.replace_catalog, aya_data),
+                                            db_path=self.db_path, polling=polling)
+        self.asset_watcher.start()
+
+    def call_on_ui(self, fn, *args):
+        """Run fn on the page's event loop, or right away when there is no page (headless)."""
+        if self.ui_dispatch:
+            self.ui_dispatch(lambda: fn(*args))
+        else:
+            fn(*args)
+
+    def apply_asset_changes(self, report):
+        """Swap in fresh derived data for changed files instead of reloading everything.
+
+        Called on the watcher thread: the rows are read there, the swap runs on the page loop.
+        """
+        from catalog_watcher import load_derived
+        changed_audio = report['audio'] + report['removed']
+        derived = load_derived(changed_audio, self.db_path)
+        self.call_on_ui(self._swap_derived, report, changed_audio, derived)
+
+    def _swap_derived(self, report, changed_audio, derived):
+        pause_points = {audio: points for audio, points in self.pause_points.items() if audio not in changed_audio}
+        pause_points.update(derived['pause_points'])
+        trim_offsets = {key: trim for key, trim in self.trim_offsets.items() if key[0] not in changed_audio}
+        trim_offsets.update(derived['trim_offsets'])
+        self.pause_points, self.trim_offsets = pause_points, trim_offsets
+        if self.image_cache:
+            changed_images = set(report['image'] + report['removed'])
+            self.image_cache.invalidate([item['image'] for item in self.aya_data if item['image_name'] in changed_images])
+
+    def replace_catalog(self, aya_data):
+        """Hot-swap the catalog rows, staying on the same aya when it still exists.
+
+        Runs on the page loop (see start_asset_watcher), so no handler sees the
+        new rows with the old index.
+        """
+        if not aya_data:
+            print("Ignoring empty catalog update")
+            return
+        current_id = self.aya_data[self.current_index]['id']
+        sura_map = self.build_sura_map(aya_data)
+        index = next((i for i, item in enumerate(aya_data) if item['id'] == current_id), None)
+        # Same aya at a new index: nothing to reload
+        with self.state.lock:
+            self.state.set_silently('navigation', index=index or 0)
+            self.aya_data, self.sura_map = aya_data, sura_map
+        if index is None:
+            # The aya is gone from the catalog; load the first row instead
+            self.state.touch('navigation', 'index')
+        print(f"Catalog replaced: {len(aya_data)} rows, current aya at index {index}")
+
+    def report_asset_problems(self):
+        """Stat the catalog's files against the integrity manifest and warn about bad ones."""
+        report = quick_check(self.db_path, aya_data=self.aya_data)
+        print(f"Asset quick check: {len(report['missing'])} missing, {len(report['corrupt'])} corrupt, "
+              f"{len(report['unverified'])} unverified of {report['referenced']} ({report['elapsed_ms']}ms)")
+        for name in report['missing'][:10] + report['corrupt'][:10]:
+            print(f"Warning: asset {name} will not play or display")
+
+    def find_trim(self, audio):
+        """Return (start_offset, stop_at) in ms for an aya's trimmed playback window, keeping the margin."""
+        trim = self.trim_offsets.get((os.path.basename(audio), 0))
+        if not trim:
+            return 0, None
+        trim_start_ms, trim_end_ms = trim
+        return max(0, trim_start_ms - self.trim_keep_margin_ms), trim_end_ms + self.trim_keep_margin_ms
+
+    def image_for(self, item):
+        """Smallest rendered variant tall enough for the display, or the source image."""
+        needed = self.image_display_height * self.image_pixel_ratio
+        fitting = [
+            variant for variant in self.image_variants.get(os.path.basename(item['image']), ())
+            if variant[0] >= needed and variant[1] in self.image_formats
+        ]
+        if not fitting:
+            return item['image']
+        return min(fitting, key=lambda variant: variant[3])[2]
+
+    def image_payload(self, index):
+        """(src, src_base64) to show the aya at index: inline from the cache, or the file path.
+
+        A file the cache cannot read is left to the client, which shows it as
+        a broken image, instead of failing the page update.
+        """
+        image = self.image_for(self.aya_data[index])
+        if not self.image_cache:
+            return image, None
+        try:
+            encoded = self.image_cache.get_base64(image)
+        except OSError as e:
+            print(f"Warning: cannot read image {image}: {e}")
+            return image, None
+        self.image_cache.prefetch_around(self.aya_data, index, self.image_for)
+        return None, encoded
+
+    def atlas_entry_for(self, item):
+        """Atlas rectangle for an aya's image, or None to show the image file itself."""
+        if not self.use_image_atlas:
+            return None
+        return self.image_atlas.get(os.path.basename(item['image']))
+
+    def enable_voice_morph(self, semitones, formant=1.0, workers=2):
+        """Play pitch/formant-morphed variants once they have been rendered in the background."""
+        # Imported here so the DSP stack is only loaded when morphing is used
+        from voice_morph import MorphCache, MorphRenderScheduler
+        if not isinstance(self.asset_store, DirectoryAssetStore):
+            print("Voice morphing renders from the q_files audio; switch back to the directory store to use it")
+            return
+        self.disable_voice_morph()
+        self.voice_morph = MorphRenderScheduler(MorphCache(), semitones, formant, workers)
+
+    def disable_voice_morph(self):
+        """Go back to the original recordings."""
+        if self.voice_morph:
+            self.voice_morph.shutdown()
+            self.voice_morph = None
+
+    def resolve_morphed_audio(self, src):
+        """Queue renders for the rest of the current sura and return the variant for src if ready."""
+        sura = self.aya_data[self.current_index]['sura']
+        upcoming = []
+        for item in self.aya_data[self.current_index:]:
+            if item['sura'] != sura:
+                break
+            upcoming.append(item)
+        self.voice_morph.focus(upcoming, sura)
+        return self.voice_morph.resolve(src)
 
     def setup_audio_player(self, src, should_play_on_load=False, playback_rate=None):
         """Create an audio player with the specified source and playback rate."""
         def on_state_changed(e):
             """Handle audio state changes."""
             print(f"Audio state changed: {e.data}")
-            if e.data == "completed":
-                # Move to next item after audio completes
-                self.current_index = (self.current_index + 1) % len(self.aya_data)
-                if hasattr(self, 'update_content'):
-                    self.update_content()
+            self.is_playing = e.data == "playing"
+            if e.data in ("playing", "completed"):
+                self.is_paused = False
+            if self.tracer and e.data in ("playing", "paused"):
+                self.tracer.mark(e.data)
+            if e.data == "completed" and not self.trim_stop_fired:
+                self.on_aya_completed()
 
         def on_loaded(e):
             """Handle audio loaded event."""
             print("Audio loaded")
+            if self.tracer:
+                self.tracer.mark('loaded')
             self.aya_duration = self.audio_player.get_duration()
-            
-            
-                
+            if self.aya_duration:
+                self.play_beginning_cut = self.find_play_beginning_cut(original_src, self.aya_duration)
+            if should_play_on_load:
+                self.audio_player.play_current(audio_volume=self.audio_volume, speed=self.speed)
+
+        self.play_beginning_cut = (None, None)
+        original_src = src
+        src_base64 = None
+        if self.voice_morph:
+            src = self.resolve_morphed_audio(src)
+        elif not isinstance(self.asset_store, DirectoryAssetStore):
+            name = self.asset_store.name_for(src)
+            if self.asset_store.is_local:
+                src = os.path.abspath(self.asset_store.local_path(name))
+            else:
+                src_base64 = self.asset_store.read_base64(name)
+                src = None
+
         # Use stored speed if no playback_rate provided
         if playback_rate is None:
             playback_rate = self.speed
             
-        self.audio_player = create_audio_player(
+        if self.player_factory is None:
+            from components.audio_player import create_audio_player
+            self.player_factory = create_audio_player
+        self.audio_player = self.player_factory(
             initial_src=src,
             on_loaded=on_loaded,
             on_duration_changed=lambda _: None,
             on_position_changed=self.audio_position_changed,
             on_state_changed=on_state_changed,
             on_seek_complete=lambda _: None,
-            playback_rate=playback_rate
+            playback_rate=playback_rate,
+            src_base64=src_base64
         )
+        self.audio_player.start_offset, self.trim_stop_at = self.find_trim(original_src)
+        self.trim_stop_fired = False
+        self.is_paused = False
         return self.audio_player
         
 
@@ -91,32 +490,36 @@ class QuranApp:
 
     def init_db(self):
         """Initialize the database."""
-        init_db()
+        init_db(self.db_path)
         # Load initial speed
-        self.speed = get_speed()
+        self.speed = get_speed(self.db_path)
 
     def update_current_aya(self, aya_id):
-        """Update the current aya in the database."""
-        update_current_aya(aya_id)
+        """Update the current aya in the database, or wherever save_position keeps it."""
+        if self.save_position:
+            self.save_position(aya_id)
+        else:
+            update_current_aya(aya_id, self.db_path)
 
     def get_current_aya(self):
         """Get the current aya from the database."""
-        return get_current_aya()
+        return get_current_aya(self.db_path)
 
     def load_aya_data(self):
         """Load aya data from SQLite database."""
-        self.aya_data = load_aya_data()
+        self.aya_data = load_aya_data(self.db_path)
         return self.aya_data
 
     def update_speed(self, speed):
         """Update the playback speed."""
-        update_speed(speed)
-        self.speed = speed
+        update_speed(speed, self.db_path)
         if self.audio_player:
             self.audio_player.playback_rate = speed
+        self.speed = speed
 
     def build_sura_dropdown(self):
         """Create dropdown for surah selection."""
+        import flet as ft
         return ft.Dropdown(
             width=200,
             label="Select Surah",
@@ -129,6 +532,7 @@ class QuranApp:
 
     def build_aya_dropdown(self, sura_name):
         """Create dropdown for ayah selection."""
+        import flet as ft
         max_aya = self.sura_map[sura_name]['last_aya']
         return ft.Dropdown(
             width=100,
@@ -147,6 +551,8 @@ class QuranApp:
                 return i
         return None
 
-    def page(self, page: ft.Page):
+    def page(self, page):
         """Create and configure the main application page."""
+        # Imported here so the app core runs without Flet (see headless.py)
+        from components.page import create_page
         create_page(self, page)
@@ -0,0 +1,248 @@
+# File: asset_manifest.py
+import argparse
+import os
+import struct
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Dict
+from db_functions import get_db_connection, load_aya_data, ASSET_DIR
+from content_store import hash_file
+
+
+def init_manifest_table(db_path: str = None) -> None:
+    """Create the asset manifest table if it doesn't exist."""
+    with get_db_connection(db_path) as conn:
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS asset_manifest (
+            name TEXT PRIMARY KEY,
+            kind TEXT,
+            size INTEGER,
+            mtime REAL,
+            hash TEXT,
+            status TEXT,
+            detail TEXT,
+            checked_at REAL
+        );
+        ''')
+        conn.commit()
+
+
+def _check_mp3(head: bytes, tail: bytes, size: int) -> str:
+    offset = 0
+    if head[:3] == b'ID3':
+        # Syncsafe tag size: 7 bits per byte, plus the 10-byte header (and footer if flagged)
+        tag_size = (head[6] << 21) | (head[7] << 14) | (head[8] << 7) | head[9]
+        offset = 10 + tag_size + (10 if head[5] & 0x10 else 0)
+        if offset + 4 > size:
+            return "ID3 tag runs past the end of the file"
+        if offset + 4 > len(head):
+            # Tag larger than the bytes read (embedded artwork); the size check above has to do
+            return ''
+        return '' if _is_frame_sync(head[offset:offset + 4]) else "no MPEG frame after the ID3 tag"
+    return '' if _is_frame_sync(head[:4]) else "no ID3 tag or MPEG frame sync"
+
+
+def _is_frame_sync(header: bytes) -> bool:
+    return len(header) == 4 and header[0] == 0xFF and header[1] & 0xE0 == 0xE0 and header[1] & 0x18 != 0x08
+
+
+def _check_png(head: bytes, tail: bytes, size: int) -> str:
+    if head[:8] != b'\x89PNG\r\n\x1a\n' or head[12:16] != b'IHDR':
+        return "bad PNG signature"
+    width, height = struct.unpack('>II', head[16:24])
+    if not width or not height:
+        return "zero-sized PNG"
+    if tail[-8:-4] != b'IEND':
+        return "PNG truncated (no IEND chunk)"
+    return ''
+
+
+def _check_webp(head: bytes, tail: bytes, size: int) -> str:
+    if head[:4] != b'RIFF' or head[8:12] != b'WEBP':
+        return "bad WebP signature"
+    if struct.unpack('<I', head[4:8])[0] + 8 > size:
+        return "WebP truncated"
+    return ''
+
+
+HEADER_CHECKS = {'.mp3': _check_mp3, '.png': _check_png, '.webp': _check_webp}
+HEAD_BYTES = 64 * 1024
+
+
+def check_file(path: str) -> Dict:
+    """Hash one file and validate its container header; status is 'ok' or 'corrupt'."""
+    kind = os.path.splitext(path)[1].lower()
+    stat = os.stat(path)
+    with open(path, 'rb') as f:
+        head = f.read(HEAD_BYTES)
+        f.seek(max(0, stat.st_size - 16))
+        tail = f.read()
+    if not stat.st_size:
+        detail = "empty file"
+    else:
+        check = HEADER_CHECKS.get(kind)
+        detail = check(head, tail, stat.st_size) if check else ''
+    return {
+        'kind': kind.lstrip('.'),
+        'size': stat.st_size,
+        'mtime': stat.st_mtime,
+        'hash': hash_file(path),
+        'status': 'corrupt' if detail else 'ok',
+        'detail': detail,
+    }
+
+
+def store_check(conn, name: str, result: Dict) -> None:
+    """Record one check_file() result in the manifest (not committed)."""
+    conn.execute(
+        'INSERT OR REPLACE INTO asset_manifest (name, kind, size, mtime, hash, status, detail, checked_at) '
+        'VALUES (:name, :kind, :size, :mtime, :hash, :status, :detail, :checked_at)',
+        dict(result, name=name, checked_at=time.time())
+    )
+
+
+def _check_job(job):
+    name, path = job
+    try:
+        return name, check_file(path), None
+    except OSError as e:
+        return name, None, str(e)
+
+
+def referenced_assets(db_path: str = None, asset_dir: str = ASSET_DIR, aya_data: List[Dict] = None) -> Dict[str, str]:
+    """Every audio/image name referenced from all_aya, mapped to its path."""
+    assets = {}
+    for item in aya_data if aya_data is not None else load_aya_data(db_path, asset_dir):
+        assets.setdefault(item['audio_name'], item['audio'])
+        assets.setdefault(item['image_name'], item['image'])
+    return assets
+
+
+def build_manifest(db_path: str = None, asset_dir: str = ASSET_DIR, workers: int = None,
+                   force: bool = False) -> Dict:
+    """Hash and header-check every referenced asset whose size/mtime changed, in parallel."""
+    print("\n=== Building asset manifest ===")
+    started = time.perf_counter()
+    init_manifest_table(db_path)
+    assets = referenced_assets(db_path, asset_dir)
+    with get_db_connection(db_path) as conn:
+        known = {name: (size, mtime) for name, size, mtime in conn.execute('SELECT name, size, mtime FROM asset_manifest')}
+
+    jobs = []
+    missing = []
+    for name, path in assets.items():
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            missing.append(name)
+            continue
+        if force or known.get(name) != (stat.st_size, stat.st_mtime):
+            jobs.append((name, path))
+    print(f"{len(jobs)} of {len(assets)} assets changed since the last check")
+
+    checked = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool, get_db_connection(db_path) as conn:
+        conn.executemany(
+            "INSERT OR REPLACE INTO asset_manifest (name, kind, size, mtime, hash, status, detail, checked_at) "
+            "VALUES (?, ?, NULL, NULL, NULL, 'missing', 'file not found', ?)",
+            [(name, os.path.splitext(name)[1].lstrip('.'), time.time()) for name in missing]
+        )
+        futures = [pool.submit(_check_job, job) for job in jobs]
+        for future in as_completed(futures):
+            name, result, error = future.result()
+            if error:
+                result = {'kind': None, 'size': None, 'mtime': None, 'hash': None, 'status': 'unreadable', 'detail': error}
+            store_check(conn, name, result)
+            checked += 1
+            if checked % 1000 == 0:
+                conn.commit()
+                print(f"Checked {checked}/{len(jobs)} assets")
+        # Drop entries for names the catalog no longer references
+        stale = [name for name in known if name not in assets]
+        conn.executemany('DELETE FROM asset_manifest WHERE name = ?', [(name,) for name in stale])
+        conn.commit()
+
+    report = manifest_report(db_path, asset_dir)
+    report.update({'checked': checked, 'elapsed_s': round(time.perf_counter() - started, 1)})
+    print(f"Manifest complete: {checked} checked in {report['elapsed_s']}s")
+    _print_report(report)
+    return report
+
+
+def manifest_report(db_path: str = None, asset_dir: str = ASSET_DIR) -> Dict:
+    """Missing and corrupt referenced assets, plus files in asset_dir nothing references."""
+    assets = referenced_assets(db_path, asset_dir)
+    with get_db_connection(db_path) as conn:
+        rows = conn.execute("SELECT name, status, detail FROM asset_manifest WHERE status != 'ok'").fetchall()
+    on_disk = {entry.name for entry in os.scandir(asset_dir) if entry.is_file()} if os.path.isdir(asset_dir) else set()
+    return {
+        'referenced': len(assets),
+        'missing': sorted(name for name, status, _ in rows if status == 'missing'),
+        'corrupt': sorted(f"{name}: {detail}" for name, status, detail in rows if status != 'missing'),
+        # Only the top level: variants/, atlas/ and similar are derived outputs
+        'orphaned': sorted(on_disk - set(assets)),
+    }
+
+
+def quick_check(db_path: str = None, asset_dir: str = ASSET_DIR, aya_data: List[Dict] = None) -> Dict:
+    """Startup check: stat every referenced asset against the manifest without reading any file.
+
+    Reports files that are missing, changed since the manifest was built (so
+    they are unverified) and already known to be corrupt.
+    """
+    started = time.perf_counter()
+    assets = referenced_assets(db_path, asset_dir, aya_data)
+    manifest = {}
+    with get_db_connection(db_path) as conn:
+        # Before the first build everything present counts as unverified
+        if conn.execute("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'asset_manifest'").fetchone():
+            manifest = {name: (size, mtime, status) for name, size, mtime, status
+                        in conn.execute('SELECT name, size, mtime, status FROM asset_manifest')}
+
+    missing, changed, corrupt = [], [], []
+    for name, path in assets.items():
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            missing.append(name)
+            continue
+        entry = manifest.get(name)
+        if entry is None or entry[:2] != (stat.st_size, stat.st_mtime):
+            changed.append(name)
+        elif entry[2] != 'ok':
+            corrupt.append(name)
+    return {
+        'referenced': len(assets),
+        'missing': missing,
+        'unverified': changed,
+        'corrupt': corrupt,
+        'elapsed_ms': round((time.perf_counter() - started) * 1000, 1),
+    }
+
+
+def _print_report(report: Dict) -> None:
+    for key, value in report.items():
+        if isinstance(value, list):
+            print(f"{key}: {len(value)}")
+            for entry in value[:20]:
+                print(f"  {entry}")
+            if len(value) > 20:
+                print(f"  ... and {len(value) - 20} more")
+        else:
+            print(f"{key}: {value}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build and check the integrity manifest of the catalog assets.")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument('--force', action='store_true', help="Re-check every asset")
+    parser.add_argument('--quick', action='store_true', help="Only stat files against the existing manifest")
+    args = parser.parse_args()
+    if args.quick:
+        _print_report(quick_check())
+    else:
+        build_manifest(workers=args.workers, force=args.force)
+
+
+if __name__ == "__main__":
+    main()
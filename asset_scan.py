@@ -0,0 +1,25 @@
+# File: asset_scan.py
+import os
+from typing import List, Dict, Tuple
+
+
+def catalog_files(aya_data: List[Dict], key: str = 'audio') -> Dict[str, str]:
+    """Map each distinct catalog file name to its path, in catalog order."""
+    files = {}
+    for item in aya_data:
+        files.setdefault(os.path.basename(item[key]), item[key])
+    return files
+
+
+def changed_files(files: Dict[str, str], scanned: Dict[str, Tuple[int, float]]) -> List[Tuple[str, str, int, float]]:
+    """Return (name, path, size, mtime) for files whose size/mtime differ from the last scan."""
+    changed = []
+    for name, path in files.items():
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            print(f"Warning: File {path} not found")
+            continue
+        if scanned.get(name) != (stat.st_size, stat.st_mtime):
+            changed.append((name, path, stat.st_size, stat.st_mtime))
+    return changed
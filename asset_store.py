@@ -0,0 +1,284 @@
+# File: asset_store.py
+import argparse
+import base64
+import hashlib
+import mmap
+import os
+import random
+import shutil
+import struct
+import time
+from typing import Dict, Iterator, Optional
+from db_functions import ASSET_DIR
+
+PACK_MAGIC = b'QPAK'
+PACK_VERSION = 1
+# magic, version, slot_count, entry_count, names_offset, data_offset
+HEADER = struct.Struct('<4sIIIQQ')
+# name hash, data offset, data length, name offset (in names blob), name length
+SLOT = struct.Struct('<QQQII')
+
+
+def _name_hash(name: str) -> int:
+    """Stable non-zero 64-bit hash; zero marks an empty slot."""
+    digest = hashlib.blake2b(name.encode('utf-8'), digest_size=8).digest()
+    return int.from_bytes(digest, 'little') | 1
+
+
+class DirectoryAssetStore:
+    """Assets as plain files under a directory (the q_files layout)."""
+
+    is_local = True
+
+    def __init__(self, root: str = ASSET_DIR):
+        self.root = root
+
+    def name_for(self, path: str) -> str:
+        """Store name of a file path under the root, with '/' separators."""
+        return os.path.relpath(path, self.root).replace(os.sep, '/')
+
+    def local_path(self, name: str) -> Optional[str]:
+        return os.path.join(self.root, *name.split('/'))
+
+    def exists(self, name: str) -> bool:
+        return os.path.isfile(self.local_path(name))
+
+    def read(self, name: str) -> bytes:
+        with open(self.local_path(name), 'rb') as f:
+            return f.read()
+
+    def read_base64(self, name: str) -> str:
+        return base64.b64encode(self.read(name)).decode('ascii')
+
+    def names(self) -> Iterator[str]:
+        for directory, _, files in os.walk(self.root):
+            for file_name in files:
+                yield self.name_for(os.path.join(directory, file_name))
+
+    def close(self) -> None:
+        pass
+
+
+class PackAssetStore:
+    """Assets stored back to back in one pack file behind a memory-mapped hash index.
+
+    The header is an open-addressing table of fixed-size slots, so a lookup
+    hashes the name and probes a few slots in the mapping without reading or
+    parsing the whole index. Reads return memoryviews into the mapping.
+    """
+
+    is_local = False
+
+    def __init__(self, pack_path: str):
+        self.pack_path = pack_path
+        self.file = open(pack_path, 'rb')
+        self.map = mmap.mmap(self.file.fileno(), 0, access=mmap.ACCESS_READ)
+        self.view = memoryview(self.map)
+        magic, version, self.slot_count, self.entry_count, self.names_offset, self.data_offset = \
+            HEADER.unpack_from(self.map, 0)
+        if magic != PACK_MAGIC or version != PACK_VERSION:
+            raise ValueError(f"{pack_path} is not a version {PACK_VERSION} asset pack")
+        self.mask = self.slot_count - 1
+
+    def name_for(self, path: str) -> str:
+        return os.path.relpath(path, ASSET_DIR).replace(os.sep, '/')
+
+    def local_path(self, name: str) -> Optional[str]:
+        return None
+
+    def _find(self, name: str) -> Optional[tuple]:
+        name_hash = _name_hash(name)
+        encoded = name.encode('utf-8')
+        slot = name_hash & self.mask
+        while True:
+            stored_hash, offset, length, name_offset, name_length = \
+                SLOT.unpack_from(self.map, HEADER.size + slot * SLOT.size)
+            if stored_hash == 0:
+                return None
+            if stored_hash == name_hash:
+                start = self.names_offset + name_offset
+                if self.view[start:start + name_length] == encoded:
+                    return offset, length
+            slot = (slot + 1) & self.mask
+
+    def exists(self, name: str) -> bool:
+        return self._find(name) is not None
+
+    def read(self, name: str) -> memoryview:
+        """Zero-copy view into the pack; copy it (bytes(...)) to keep the data past close()."""
+        found = self._find(name)
+        if found is None:
+            raise FileNotFoundError(f"{name} not in {self.pack_path}")
+        offset, length = found
+        return self.view[self.data_offset + offset:self.data_offset + offset + length]
+
+    def read_base64(self, name: str) -> str:
+        return base64.b64encode(self.read(name)).decode('ascii')
+
+    def names(self) -> Iterator[str]:
+        for slot in range(self.slot_count):
+            stored_hash, _, _, name_offset, name_length = SLOT.unpack_from(self.map, HEADER.size + slot * SLOT.size)
+            if stored_hash:
+                start = self.names_offset + name_offset
+                yield bytes(self.view[start:start + name_length]).decode('utf-8')
+
+    def close(self) -> None:
+        """Close the pack; views still held from read() keep the mapping alive until they are dropped."""
+        self.view.release()
+        try:
+            self.map.close()
+        except BufferError:
+            # Exported views pin the mapping; it is unmapped when the last of them is garbage collected
+            pass
+        self.file.close()
+
+
+def open_asset_store(pack_path: str = None, root: str = ASSET_DIR, content_addressed: bool = False,
+                     db_path: str = None):
+    """Pack store when a pack file is given, the content store when asked, otherwise the flat directory.
+
+    db_path is the catalog whose asset_refs the content store resolves names through.
+    """
+    if pack_path:
+        return PackAssetStore(pack_path)
+    if content_addressed:
+        # Imported lazily: content_store depends on the catalog tables
+        from content_store import ContentAddressedStore
+        return ContentAddressedStore(db_path=db_path)
+    return DirectoryAssetStore(root)
+
+
+def write_pack(source_dir: str, pack_path: str) -> Dict:
+    """Pack every file under source_dir into pack_path."""
+    print(f"\n=== Packing {source_dir} into {pack_path} ===")
+    started = time.perf_counter()
+    source = DirectoryAssetStore(source_dir)
+    names = sorted(source.names())
+    slot_count = 1
+    while slot_count < max(2 * len(names), 1):
+        slot_count <<= 1
+
+    slots = [(0, 0, 0, 0, 0)] * slot_count
+    names_blob = bytearray()
+    offset = 0
+    layout = []
+    for name in names:
+        encoded = name.encode('utf-8')
+        length = os.path.getsize(source.local_path(name))
+        name_hash = _name_hash(name)
+        slot = name_hash & (slot_count - 1)
+        while slots[slot][0]:
+            slot = (slot + 1) & (slot_count - 1)
+        slots[slot] = (name_hash, offset, length, len(names_blob), len(encoded))
+        names_blob += encoded
+        layout.append(name)
+        offset += length
+
+    names_offset = HEADER.size + slot_count * SLOT.size
+    data_offset = names_offset + len(names_blob)
+    temp_path = pack_path + '.tmp'
+    with open(temp_path, 'wb') as out:
+        out.write(HEADER.pack(PACK_MAGIC, PACK_VERSION, slot_count, len(names), names_offset, data_offset))
+        for slot in slots:
+            out.write(SLOT.pack(*slot))
+        out.write(names_blob)
+        for name in layout:
+            with open(source.local_path(name), 'rb') as f:
+                shutil.copyfileobj(f, out, 1024 * 1024)
+    os.replace(temp_path, pack_path)
+
+    elapsed = time.perf_counter() - started
+    print(f"Packed {len(names)} files ({offset / 1024 / 1024:.1f} MB) in {elapsed:.1f}s")
+    return {'files': len(names), 'bytes': offset, 'elapsed_s': elapsed}
+
+
+def unpack(pack_path: str, output_dir: str) -> int:
+    """Write every asset in a pack back out as files."""
+    print(f"\n=== Unpacking {pack_path} into {output_dir} ===")
+    store = PackAssetStore(pack_path)
+    count = 0
+    for name in store.names():
+        path = DirectoryAssetStore(output_dir).local_path(name)
+        os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(store.read(name))
+        count += 1
+    store.close()
+    print(f"Unpacked {count} files")
+    return count
+
+
+def _drop_from_page_cache(path: str) -> None:
+    """Best-effort eviction of a file's pages so the next read goes to disk."""
+    if not hasattr(os, 'posix_fadvise'):
+        return
+    fd = os.open(path, os.O_RDONLY)
+    try:
+        os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_DONTNEED)
+    finally:
+        os.close(fd)
+
+
+def benchmark(source_dir: str, pack_path: str, samples: int = 500, seed: int = 0) -> Dict:
+    """Time random asset reads from the directory and the pack, cold then warm.
+
+    Cold runs evict the files from the page cache with posix_fadvise first;
+    that needs clean pages and is a no-op on platforms without it.
+    """
+    directory = DirectoryAssetStore(source_dir)
+    names = sorted(directory.names())
+    chosen = random.Random(seed).sample(names, min(samples, len(names)))
+    report = {'samples': len(chosen)}
+
+    def timed_reads(store):
+        started = time.perf_counter()
+        total = 0
+        for name in chosen:
+            total += len(store.read(name))
+        return time.perf_counter() - started, total
+
+    for label in ('cold', 'warm'):
+        if label == 'cold':
+            for name in chosen:
+                _drop_from_page_cache(directory.local_path(name))
+        elapsed, total = timed_reads(directory)
+        report[f'directory_{label}_ms'] = round(elapsed * 1000, 2)
+
+        if label == 'cold':
+            _drop_from_page_cache(pack_path)
+        started = time.perf_counter()
+        pack = PackAssetStore(pack_path)
+        open_time = time.perf_counter() - started
+        elapsed, _ = timed_reads(pack)
+        pack.close()
+        report[f'pack_{label}_ms'] = round((open_time + elapsed) * 1000, 2)
+    report['bytes_read'] = total
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack, unpack and benchmark asset storage backends.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    pack_parser = subparsers.add_parser('pack', help="Pack a directory into one file")
+    pack_parser.add_argument('source_dir', nargs='?', default=ASSET_DIR)
+    pack_parser.add_argument('pack_path')
+    unpack_parser = subparsers.add_parser('unpack', help="Extract a pack into a directory")
+    unpack_parser.add_argument('pack_path')
+    unpack_parser.add_argument('output_dir')
+    bench_parser = subparsers.add_parser('bench', help="Compare cold/warm reads from directory and pack")
+    bench_parser.add_argument('source_dir')
+    bench_parser.add_argument('pack_path')
+    bench_parser.add_argument('--samples', type=int, default=500)
+    args = parser.parse_args()
+
+    if args.command == 'pack':
+        write_pack(args.source_dir, args.pack_path)
+    elif args.command == 'unpack':
+        unpack(args.pack_path, args.output_dir)
+    else:
+        for key, value in benchmark(args.source_dir, args.pack_path, args.samples).items():
+            print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
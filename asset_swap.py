@@ -0,0 +1,247 @@
+# File: asset_swap.py
+import argparse
+import json
+import os
+import shutil
+import time
+import uuid
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import List, Dict, Tuple
+from db_functions import get_db_connection, ASSET_DIR
+from content_store import hash_file
+
+STAGING_DIR = '.swap_staging'
+JOURNAL_DIR = '.swap_journal'
+BACKUP_DIR = '.swap_backup'
+
+
+def read_change_set(csv_path: str) -> Dict[str, List[str]]:
+    """Parse split.csv-style lines ("old.mp3 , new_1.mp3") into old name -> replacements in order."""
+    changes = {}
+    with open(csv_path, 'r', encoding='utf-8-sig') as f:
+        for line in f:
+            parts = [part.strip() for part in line.strip().split(',')]
+            if len(parts) != 2 or not all(parts):
+                if line.strip():
+                    print(f"Skipping invalid line: {line.strip()}")
+                continue
+            changes.setdefault(parts[0], []).append(parts[1])
+    return changes
+
+
+def _write_journal(path: str, journal: Dict) -> None:
+    """Replace the journal atomically so a crash leaves either the old or the new state."""
+    temp_path = path + '.tmp'
+    with open(temp_path, 'w', encoding='utf-8') as f:
+        json.dump(journal, f, indent=1)
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(temp_path, path)
+
+
+def _stage_one(source_path: str, staged_path: str) -> Tuple[int, str]:
+    source_hash = hash_file(source_path)
+    shutil.copy2(source_path, staged_path)
+    staged_hash = hash_file(staged_path)
+    if staged_hash != source_hash:
+        raise IOError(f"hash mismatch staging {source_path}: {source_hash} != {staged_hash}")
+    return os.path.getsize(staged_path), staged_hash
+
+
+def pending_swaps(dest_dir: str = ASSET_DIR) -> List[str]:
+    """Journals of swaps that were interrupted before they committed."""
+    journal_dir = os.path.join(dest_dir, JOURNAL_DIR)
+    if not os.path.isdir(journal_dir):
+        return []
+    pending = []
+    for name in sorted(os.listdir(journal_dir)):
+        if name.endswith('.json'):
+            with open(os.path.join(journal_dir, name), encoding='utf-8') as f:
+                if json.load(f)['state'] != 'committed':
+                    pending.append(os.path.join(journal_dir, name))
+    return pending
+
+
+def apply_swap(changes: Dict[str, List[str]], source_dir: str, dest_dir: str = ASSET_DIR,
+               db_path: str = None, workers: int = 8) -> Dict:
+    """Stage, verify and commit a change set, updating the catalog in one transaction.
+
+    Replaced files are moved aside into a backup directory, so a failure at
+    any point (or a later `rollback`) restores the previous library and
+    catalog from the journal.
+    """
+    print(f"\n=== Applying asset swap from {source_dir} into {dest_dir} ===")
+    pending = pending_swaps(dest_dir)
+    if pending:
+        raise RuntimeError(f"Unfinished swap {pending[0]}; run rollback on it first")
+
+    swap_id = time.strftime('%Y%m%d-%H%M%S-') + uuid.uuid4().hex[:6]
+    staging = os.path.join(dest_dir, STAGING_DIR, swap_id)
+    backup = os.path.join(dest_dir, BACKUP_DIR, swap_id)
+    journal_path = os.path.join(dest_dir, JOURNAL_DIR, swap_id + '.json')
+    for directory in (staging, backup, os.path.dirname(journal_path)):
+        os.makedirs(directory, exist_ok=True)
+
+    new_names = list(dict.fromkeys(name for names in changes.values() for name in names))
+    removed_names = [name for name in changes if name not in set(new_names)]
+    journal = {
+        'id': swap_id,
+        'state': 'staging',
+        'staging': staging,
+        'backup': backup,
+        'added': new_names,
+        'removed': removed_names,
+        'catalog': [],
+    }
+    _write_journal(journal_path, journal)
+
+    # 1. Copy every replacement into staging in parallel and verify it
+    started = time.perf_counter()
+    staged_bytes = 0
+    try:
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            futures = {pool.submit(_stage_one, os.path.join(source_dir, name), os.path.join(staging, name)): name
+                       for name in new_names}
+            for future in as_completed(futures):
+                size, _ = future.result()
+                staged_bytes += size
+    except Exception:
+        shutil.rmtree(staging, ignore_errors=True)
+        shutil.rmtree(backup, ignore_errors=True)
+        os.remove(journal_path)
+        raise
+    stage_s = time.perf_counter() - started
+    print(f"Staged and verified {len(new_names)} files ({staged_bytes / 1024 / 1024:.1f} MB) in {stage_s:.1f}s")
+
+    # 2. Move files aside and the staged ones in, then update the catalog in one transaction
+    started = time.perf_counter()
+    journal['state'] = 'committing'
+    _write_journal(journal_path, journal)
+    try:
+        # Whatever sits in the backup directory was moved aside; rollback restores it from there
+        for name in removed_names + new_names:
+            target = os.path.join(dest_dir, name)
+            if os.path.exists(target):
+                os.replace(target, os.path.join(backup, name))
+        for name in new_names:
+            os.replace(os.path.join(staging, name), os.path.join(dest_dir, name))
+
+        with get_db_connection(db_path) as conn:
+            rows = [row for row in conn.execute('SELECT rowid, audio, aya_suffix FROM all_aya') if row[1] in changes]
+            updates = []
+            unsplit = 0
+            for rowid, audio, suffix in rows:
+                replacements = changes[audio]
+                # Split parts are numbered from 1 in aya_suffix; unsplit rows take the first part
+                if not suffix or suffix > len(replacements):
+                    unsplit += 1
+                replacement = replacements[min(max(suffix or 1, 1), len(replacements)) - 1]
+                updates.append((replacement, rowid))
+                journal['catalog'].append([rowid, audio])
+            _write_journal(journal_path, journal)
+            conn.executemany('UPDATE all_aya SET audio = ? WHERE rowid = ?', updates)
+            conn.commit()
+    except Exception:
+        print(f"Swap {swap_id} failed, rolling back")
+        rollback(journal_path, db_path)
+        raise
+
+    journal['state'] = 'committed'
+    _write_journal(journal_path, journal)
+    shutil.rmtree(staging, ignore_errors=True)
+    commit_s = time.perf_counter() - started
+
+    report = {
+        'id': swap_id,
+        'added': len(new_names),
+        'removed': len(removed_names),
+        'catalog_rows': len(updates),
+        'unmatched_rows': unsplit,
+        'staged_mb_s': round(staged_bytes / 1024 / 1024 / stage_s, 1) if stage_s else 0.0,
+        'stage_s': round(stage_s, 2),
+        'commit_s': round(commit_s, 2),
+        'journal': journal_path,
+    }
+    print(f"Swap {swap_id} committed: {len(new_names)} added, {len(removed_names)} removed, "
+          f"{len(updates)} catalog rows updated in {commit_s:.2f}s")
+    if unsplit:
+        print(f"Warning: {unsplit} catalog rows had no matching split part and point at the first one")
+    return report
+
+
+def rollback(journal_path: str, db_path: str = None) -> None:
+    """Undo a swap from its journal: restore moved-aside files and catalog rows.
+
+    Safe to run again after a crash part-way through a rollback.
+    """
+    with open(journal_path, encoding='utf-8') as f:
+        journal = json.load(f)
+    dest_dir = os.path.dirname(os.path.dirname(journal_path))
+    print(f"\n=== Rolling back swap {journal['id']} ===")
+
+    if journal['catalog']:
+        with get_db_connection(db_path) as conn:
+            conn.executemany('UPDATE all_aya SET audio = ? WHERE rowid = ?',
+                             [(audio, rowid) for rowid, audio in journal['catalog']])
+            conn.commit()
+
+    restored = 0
+    if journal['state'] != 'staging':
+        for name in journal['added']:
+            # Gone from staging means it was moved into the library by this swap
+            target = os.path.join(dest_dir, name)
+            if not os.path.exists(os.path.join(journal['staging'], name)) and os.path.exists(target):
+                os.remove(target)
+        if os.path.isdir(journal['backup']):
+            for name in os.listdir(journal['backup']):
+                os.replace(os.path.join(journal['backup'], name), os.path.join(dest_dir, name))
+                restored += 1
+
+    shutil.rmtree(journal['staging'], ignore_errors=True)
+    shutil.rmtree(journal['backup'], ignore_errors=True)
+    os.remove(journal_path)
+    print(f"Restored {restored} files and {len(journal['catalog'])} catalog rows")
+
+
+def prune_backups(dest_dir: str = ASSET_DIR) -> int:
+    """Delete backups and journals of committed swaps; they can no longer be rolled back."""
+    journal_dir = os.path.join(dest_dir, JOURNAL_DIR)
+    pruned = 0
+    for name in os.listdir(journal_dir) if os.path.isdir(journal_dir) else []:
+        path = os.path.join(journal_dir, name)
+        with open(path, encoding='utf-8') as f:
+            journal = json.load(f)
+        if journal['state'] == 'committed':
+            shutil.rmtree(journal['backup'], ignore_errors=True)
+            os.remove(path)
+            pruned += 1
+    print(f"Pruned {pruned} committed swaps")
+    return pruned
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Apply a file change set to q_files and the catalog atomically.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    apply_parser = subparsers.add_parser('apply', help="Apply a split.csv-style change set")
+    apply_parser.add_argument('csv_path')
+    apply_parser.add_argument('source_dir', help="Directory holding the replacement files")
+    apply_parser.add_argument('--dest', default=ASSET_DIR)
+    apply_parser.add_argument('--workers', type=int, default=8, help="Copy threads")
+    rollback_parser = subparsers.add_parser('rollback', help="Undo a swap from its journal")
+    rollback_parser.add_argument('journal_path')
+    prune_parser = subparsers.add_parser('prune', help="Delete backups of committed swaps")
+    prune_parser.add_argument('--dest', default=ASSET_DIR)
+    args = parser.parse_args()
+
+    if args.command == 'apply':
+        report = apply_swap(read_change_set(args.csv_path), args.source_dir, args.dest, workers=args.workers)
+        for key, value in report.items():
+            print(f"{key}: {value}")
+    elif args.command == 'rollback':
+        rollback(args.journal_path)
+    else:
+        prune_backups(args.dest)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+# File: audio_features.py
+import numpy as np
+from functools import lru_cache
+from typing import NamedTuple
+from pydub import AudioSegment
+
+DEFAULT_SAMPLE_RATE = 16000
+FRAME_MS = 25
+HOP_MS = 10
+
+
+class DTWResult(NamedTuple):
+    cost: float
+    normalized_cost: float
+    path_x: np.ndarray
+    path_y: np.ndarray
+    step_costs: np.ndarray
+
+
+def load_audio(path: str, sample_rate: int = DEFAULT_SAMPLE_RATE) -> np.ndarray:
+    """Decode an audio file to mono float32 samples in [-1, 1]."""
+    segment = AudioSegment.from_file(path)
+    segment = segment.set_channels(1).set_frame_rate(sample_rate)
+    samples = np.asarray(segment.get_array_of_samples(), dtype=np.float32)
+    return samples / float(1 << (8 * segment.sample_width - 1))
+
+
+def frame_signal(samples: np.ndarray, frame_len: int, hop: int) -> np.ndarray:
+    """Return a read-only (n_frames, frame_len) strided view over the samples."""
+    if len(samples) < frame_len:
+        samples = np.pad(samples, (0, frame_len - len(samples)))
+    n_frames = 1 + (len(samples) - frame_len) // hop
+    return np.lib.stride_tricks.as_strided(
+        samples,
+        shape=(n_frames, frame_len),
+        strides=(samples.strides[0] * hop, samples.strides[0]),
+        writeable=False,
+    )
+
+
+def frame_energy_db(samples: np.ndarray, sample_rate: int = DEFAULT_SAMPLE_RATE,
+                    frame_ms: int = FRAME_MS, hop_ms: int = HOP_MS) -> np.ndarray:
+    """Short-time RMS energy in dBFS, one value per hop."""
+    frame_len = int(sample_rate * frame_ms / 1000)
+    hop = int(sample_rate * hop_ms / 1000)
+    frames = frame_signal(np.ascontiguousarray(samples, dtype=np.float32), frame_len, hop)
+    rms = np.sqrt(np.einsum('ij,ij->i', frames, frames) / frame_len)
+    return 20.0 * np.log10(np.maximum(rms, 1e-6))
+
+
+@lru_cache(maxsize=8)
+def mel_filterbank(sample_rate: int, n_fft: int, n_mels: int) -> np.ndarray:
+    """Triangular mel filterbank of shape (n_mels, n_fft // 2 + 1)."""
+    def hz_to_mel(hz):
+        return 2595.0 * np.log10(1.0 + hz / 700.0)
+
+    def mel_to_hz(mel):
+        return 700.0 * (10.0 ** (mel / 2595.0) - 1.0)
+
+    mel_points = np.linspace(hz_to_mel(0.0), hz_to_mel(sample_rate / 2.0), n_mels + 2)
+    bins = np.floor((n_fft + 1) * mel_to_hz(mel_points) / sample_rate).astype(int)
+    fbank = np.zeros((n_mels, n_fft // 2 + 1))
+    for m in range(1, n_mels + 1):
+        left, centre, right = bins[m - 1], bins[m], bins[m + 1]
+        if centre > left:
+            fbank[m - 1, left:centre] = (np.arange(left, centre) - left) / (centre - left)
+        if right > centre:
+            fbank[m - 1, centre:right] = (right - np.arange(centre, right)) / (right - centre)
+    return fbank
+
+
+@lru_cache(maxsize=8)
+def dct_matrix(n_mels: int, n_mfcc: int) -> np.ndarray:
+    """Orthonormal DCT-II basis of shape (n_mels, n_mfcc)."""
+    k = np.arange(n_mfcc)[None, :]
+    n = np.arange(n_mels)[:, None]
+    basis = np.cos(np.pi * k * (2 * n + 1) / (2 * n_mels)) * np.sqrt(2.0 / n_mels)
+    basis[:, 0] /= np.sqrt(2.0)
+    return basis
+
+
+def mfcc(samples: np.ndarray, sample_rate: int = DEFAULT_SAMPLE_RATE, n_mfcc: int = 13,
+         n_mels: int = 26, frame_ms: int = FRAME_MS, hop_ms: int = HOP_MS,
+         normalize: bool = True) -> np.ndarray:
+    """Compute MFCCs (n_frames, n_mfcc - 1), dropping c0 and applying per-utterance CMVN."""
+    frame_len = int(sample_rate * frame_ms / 1000)
+    hop = int(sample_rate * hop_ms / 1000)
+    n_fft = 1 << (frame_len - 1).bit_length()
+
+    emphasized = np.append(samples[:1], samples[1:] - 0.97 * samples[:-1]).astype(np.float32)
+    frames = frame_signal(emphasized, frame_len, hop) * np.hamming(frame_len).astype(np.float32)
+    power = np.abs(np.fft.rfft(frames, n=n_fft)) ** 2 / n_fft
+    mel_energy = power @ mel_filterbank(sample_rate, n_fft, n_mels).T
+    features = np.log(np.maximum(mel_energy, 1e-10)) @ dct_matrix(n_mels, n_mfcc)
+    features = features[:, 1:]
+
+    if normalize:
+        features = features - features.mean(axis=0)
+        features = features / np.maximum(features.std(axis=0), 1e-8)
+    return features
+
+
+def mfcc_chunked(samples: np.ndarray, sample_rate: int = DEFAULT_SAMPLE_RATE, chunk_s: int = 60,
+                 **kwargs) -> np.ndarray:
+    """Un-normalized MFCCs for long recordings, computed in chunks to bound memory."""
+    frame_len = int(sample_rate * kwargs.get('frame_ms', FRAME_MS) / 1000)
+    hop = int(sample_rate * kwargs.get('hop_ms', HOP_MS) / 1000)
+    chunk_frames = max(1, chunk_s * sample_rate // hop)
+    parts = []
+    for start in range(0, max(1, len(samples) - frame_len + hop), chunk_frames * hop):
+        chunk = samples[start:start + chunk_frames * hop + frame_len - hop]
+        parts.append(mfcc(chunk, sample_rate, normalize=False, **kwargs))
+    return np.concatenate(parts)
+
+
+def banded_dtw(x: np.ndarray, y: np.ndarray, radius: float = 0.1, band: int = None) -> DTWResult:
+    """Align two feature sequences with a Sakoe-Chiba banded DTW.
+
+    The band half-width is radius * the longer sequence, or an absolute
+    number of frames when band is given (for long recordings). Each row is
+    solved in one vectorised pass: the horizontal recurrence
+    D[j] = min(e[j], c[j] + D[j-1]) is rewritten as a running minimum over
+    prefix sums, so the only Python-level loop is over rows. Only the band
+    is stored (as int8 back-pointers), so memory is O(n * band).
+    """
+    x = np.asarray(x, dtype=np.float64)
+    y = np.asarray(y, dtype=np.float64)
+    n, m = len(x), len(y)
+    if n == 0 or m == 0:
+        raise ValueError("Cannot align an empty feature sequence")
+
+    half = band if band is not None else int(np.ceil(radius * max(n, m)))
+    half = max(half, int(np.ceil(m / n)) + 1)
+    centre = np.round(np.arange(n) * ((m - 1) / max(n - 1, 1))).astype(np.int64)
+    lo = np.clip(centre - half, 0, m - 1)
+    hi = np.clip(centre + half + 1, 1, m)
+    lo[0] = 0
+    hi[-1] = m
+    width = int((hi - lo).max())
+
+    xx = np.einsum('ij,ij->i', x, x)
+    yy = np.einsum('ij,ij->i', y, y)
+    steps = np.zeros((n, width), dtype=np.int8)  # 0 = diagonal, 1 = up, 2 = left
+
+    def row_costs(i):
+        cols = slice(lo[i], hi[i])
+        sq = xx[i] + yy[cols] - 2.0 * (y[cols] @ x[i])
+        return np.sqrt(np.maximum(sq, 0.0))
+
+    c = row_costs(0)
+    prev = np.cumsum(c)
+    steps[0, :len(c)] = 2
+
+    for i in range(1, n):
+        c = row_costs(i)
+        w = len(c)
+        row_lo, prev_lo, prev_hi = lo[i], lo[i - 1], hi[i - 1]
+
+        up = np.full(w, np.inf)
+        start, stop = max(row_lo, prev_lo), min(row_lo + w, prev_hi)
+        if stop > start:
+            up[start - row_lo:stop - row_lo] = prev[start - prev_lo:stop - prev_lo]
+        diag = np.full(w, np.inf)
+        start, stop = max(row_lo, prev_lo + 1), min(row_lo + w, prev_hi + 1)
+        if stop > start:
+            diag[start - row_lo:stop - row_lo] = prev[start - prev_lo - 1:stop - prev_lo - 1]
+
+        from_up = up < diag
+        e = c + np.where(from_up, up, diag)
+        prefix = np.cumsum(c)
+        offset = e - prefix
+        running = np.minimum.accumulate(offset)
+        from_left = offset > running
+        prev = np.where(from_left, prefix + running, e)
+        steps[i, :w] = np.where(from_left, 2, from_up.astype(np.int8))
+
+    total = float(prev[m - 1 - lo[n - 1]])
+
+    path_x, path_y = [n - 1], [m - 1]
+    i, j = n - 1, m - 1
+    while i > 0 or j > 0:
+        step = steps[i, j - lo[i]]
+        if step == 0:
+            i, j = i - 1, j - 1
+        elif step == 1:
+            i -= 1
+        else:
+            j -= 1
+        path_x.append(i)
+        path_y.append(j)
+
+    path_x = np.array(path_x[::-1])
+    path_y = np.array(path_y[::-1])
+    step_costs = np.linalg.norm(x[path_x] - y[path_y], axis=1)
+    return DTWResult(total, total / len(path_x), path_x, path_y, step_costs)
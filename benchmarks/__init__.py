@@ -0,0 +1,9 @@
+# File: benchmarks/__init__.py
+from .synthetic import generate_catalog, write_assets, SCALES, REAL_ROWS
+
+__all__ = [
+    'generate_catalog',
+    'write_assets',
+    'SCALES',
+    'REAL_ROWS'
+]
@@ -0,0 +1,213 @@
+# File: benchmarks/run.py
+import argparse
+import contextlib
+import json
+import os
+import platform
+import random
+import subprocess
+import sys
+import time
+from typing import Callable, Dict, List
+
+from benchmarks.synthetic import SCALES, DATA_DIR, catalog_path, generate_catalog, write_assets
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+RESULTS_DIR = os.path.join('benchmarks', 'results')
+REPEAT = 10
+COLD_RUNS = 3
+REGRESSION = 0.10  # --compare flags a p50 this much slower
+
+# Runs in a fresh interpreter: imports plus building a headless app, as on a cold start
+COLD_START = '''
+import contextlib, os, sys, time
+started = time.perf_counter()
+with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+    from headless import HeadlessSession
+    HeadlessSession(sys.argv[1])
+print((time.perf_counter() - started) * 1000)
+'''
+
+
+def summarize(samples_ms: List[float]) -> Dict:
+    ordered = sorted(samples_ms)
+    return {
+        'n': len(ordered),
+        'min_ms': round(ordered[0], 3),
+        'p50_ms': round(ordered[len(ordered) // 2], 3),
+        'p95_ms': round(ordered[min(len(ordered) - 1, int(len(ordered) * 0.95))], 3),
+        'mean_ms': round(sum(ordered) / len(ordered), 3),
+        'max_ms': round(ordered[-1], 3),
+    }
+
+
+def measure(fn: Callable[[], object], repeat: int) -> Dict:
+    """Time repeat calls of fn, each on its own."""
+    samples = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        samples.append((time.perf_counter() - started) * 1000)
+    return summarize(samples)
+
+
+@contextlib.contextmanager
+def quiet():
+    """The app prints as it goes; keep that out of the timings and the report."""
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        yield
+
+
+def bench_startup_cold(db_path: str, runs: int) -> Dict:
+    """New interpreter per run: process wall time, and import + app construction inside it."""
+    process, in_process = [], []
+    for _ in range(runs):
+        started = time.perf_counter()
+        output = subprocess.run([sys.executable, '-c', COLD_START, os.path.abspath(db_path)], cwd=ROOT,
+                                capture_output=True, text=True, check=True).stdout
+        process.append((time.perf_counter() - started) * 1000)
+        in_process.append(float(output.strip().splitlines()[-1]))
+    return {'startup_cold_process': summarize(process), 'startup_cold': summarize(in_process)}
+
+
+def bench_core(db_path: str, repeat: int, seed: int = 0) -> Dict:
+    """Everything measured inside this process against one catalog."""
+    from headless import HeadlessSession
+    from app import QuranApp
+    from db_functions import load_aya_data, update_current_aya, update_speed
+
+    rng = random.Random(seed)
+    results = {}
+    with quiet():
+        HeadlessSession(db_path)  # imports and the page cache are warm from here on
+        results['startup_warm'] = measure(lambda: HeadlessSession(db_path), repeat)
+        results['load_aya_data'] = measure(lambda: load_aya_data(db_path), repeat)
+
+        session = HeadlessSession(db_path, persist_position=True)
+        app = session.app
+        aya_data = app.aya_data
+        results['build_sura_map'] = measure(lambda: QuranApp.build_sura_map(aya_data), repeat)
+
+        # Uniform over the whole catalog, so later reciters' rows are looked up as often as the first's
+        targets = [(item['sura_name'], item['aya']) for item in rng.choices(aya_data, k=repeat)]
+        lookups = iter(targets)
+        results['find_aya_index'] = measure(lambda: app.find_aya_index(*next(lookups)), repeat)
+
+        # A navigation transition: DB write, player swap and state flush, up to the new player loading
+        def step(move):
+            move()
+            session.clock.advance(session.backend.load_ms)
+        results['navigate_next'] = measure(lambda: step(app.next_item), repeat)
+        results['navigate_prev'] = measure(lambda: step(app.prev_item), repeat)
+        jumps = iter(rng.randrange(len(aya_data)) for _ in range(repeat))
+        results['navigate_jump'] = measure(lambda: step(lambda: app.go_to_index(next(jumps))), repeat)
+
+        ids = iter(rng.choice(aya_data)['id'] for _ in range(repeat))
+        results['db_write_current_aya'] = measure(lambda: update_current_aya(next(ids), db_path), repeat)
+        speeds = iter(rng.choice((0.75, 1.0, 1.25, 1.5)) for _ in range(repeat))
+        results['db_write_speed'] = measure(lambda: update_speed(next(speeds), db_path), repeat)
+    return results
+
+
+def bench_asset_check(db_path: str, asset_dir: str, repeat: int) -> Dict:
+    """The startup integrity check: one stat per referenced file."""
+    from asset_manifest import quick_check
+    with quiet():
+        return {'asset_quick_check': measure(lambda: quick_check(db_path, asset_dir), repeat)}
+
+
+def run(scales=SCALES, repeat: int = REPEAT, cold_runs: int = COLD_RUNS, data_dir: str = DATA_DIR,
+        regenerate: bool = False, assets: bool = False) -> Dict:
+    results = {}
+    catalogs = {}
+    for scale in scales:
+        db_path = catalog_path(scale, data_dir)
+        if regenerate or not os.path.exists(db_path):
+            print(f"Generating the {scale}x catalog")
+            with quiet():
+                catalogs[f"{scale}x"] = generate_catalog(db_path, scale)
+        print(f"Benchmarking the {scale}x catalog")
+        scale_results = bench_core(db_path, repeat)
+        scale_results.update(bench_startup_cold(db_path, cold_runs))
+        if assets:
+            asset_dir = os.path.join(data_dir, f"q_files_{scale}x")
+            write_assets(asset_dir, db_path)
+            scale_results.update(bench_asset_check(db_path, asset_dir, repeat))
+        results[f"{scale}x"] = scale_results
+    return {'meta': run_metadata(repeat, cold_runs), 'catalogs': catalogs, 'results': results}
+
+
+def run_metadata(repeat: int, cold_runs: int) -> Dict:
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=ROOT, capture_output=True,
+                                text=True).stdout.strip() or None
+    except OSError:
+        commit = None
+    return {
+        'time': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'repeat': repeat,
+        'cold_runs': cold_runs,
+    }
+
+
+def compare(old: Dict, new: Dict, threshold: float = REGRESSION) -> List[str]:
+    """p50 of every benchmark both runs have, flagging changes beyond threshold."""
+    lines = [f"{'benchmark':<34} {'old p50':>10} {'new p50':>10} {'change':>8}"]
+    for scale, benchmarks in new['results'].items():
+        for name, summary in benchmarks.items():
+            previous = old['results'].get(scale, {}).get(name)
+            if not previous:
+                continue
+            before, after = previous['p50_ms'], summary['p50_ms']
+            change = (after - before) / before if before else 0.0
+            flag = '  slower' if change > threshold else '  faster' if change < -threshold else ''
+            lines.append(f"{scale + ' ' + name:<34} {before:>10.3f} {after:>10.3f} {change:>+8.1%}{flag}")
+    return lines
+
+
+def format_results(report: Dict) -> List[str]:
+    lines = []
+    for scale, benchmarks in report['results'].items():
+        lines.append(f"{scale}:")
+        for name, summary in benchmarks.items():
+            lines.append(f"  {name:<24} p50 {summary['p50_ms']:>10.3f}ms  p95 {summary['p95_ms']:>10.3f}ms  "
+                         f"min {summary['min_ms']:>10.3f}ms  (n={summary['n']})")
+    return lines
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark startup, catalog loading, lookups, navigation and DB writes "
+                                                 "on synthetic catalogs.")
+    parser.add_argument('--scale', type=int, action='append', help=f"Catalog size as a multiple of the real one "
+                                                                   f"(default {SCALES})")
+    parser.add_argument('--repeat', type=int, default=REPEAT, help="Samples per benchmark")
+    parser.add_argument('--cold-runs', type=int, default=COLD_RUNS, help="Fresh interpreters for the cold start")
+    parser.add_argument('--data-dir', default=DATA_DIR, help="Where the generated catalogs are kept")
+    parser.add_argument('--regenerate', action='store_true', help="Rebuild the catalogs even if they exist")
+    parser.add_argument('--assets', action='store_true', help="Also generate asset trees and time the startup asset check")
+    parser.add_argument('--output', help=f"Results file (default {RESULTS_DIR}/<time>.json)")
+    parser.add_argument('--compare', nargs=2, metavar=('OLD', 'NEW'), help="Compare two results files and exit")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0], encoding='utf-8') as f:
+            old = json.load(f)
+        with open(args.compare[1], encoding='utf-8') as f:
+            new = json.load(f)
+        print('\n'.join(compare(old, new)))
+        return
+
+    report = run(args.scale or SCALES, args.repeat, args.cold_runs, args.data_dir, args.regenerate, args.assets)
+    output = args.output or os.path.join(RESULTS_DIR, time.strftime('%Y%m%d-%H%M%S.json'))
+    os.makedirs(os.path.dirname(output) or '.', exist_ok=True)
+    with open(output, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=1)
+    print('\n'.join(format_results(report)))
+    print(f"Results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
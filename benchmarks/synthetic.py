@@ -0,0 +1,181 @@
+# File: benchmarks/synthetic.py
+import argparse
+import csv
+import os
+import random
+import struct
+import time
+import zlib
+from collections import Counter
+from typing import List, Dict
+
+from catalog_import import AYA_COUNTS, CATALOG_COLUMNS, CATALOG_CSV, read_catalog, import_catalog
+from db_functions import get_db_connection
+
+REAL_ROWS = 9677  # rows in the shipped catalog: 6236 ayas, the long ones split into segments
+SCALES = (1, 10, 100)
+DATA_DIR = os.path.join('benchmarks', 'data')
+
+# Smallest files asset_manifest's header checks accept: one MPEG frame, a 1x1 PNG
+MP3_PLACEHOLDER = b'\xff\xfb\x90\x64' + bytes(413)
+
+
+def _png_chunk(kind: bytes, data: bytes) -> bytes:
+    return struct.pack('>I', len(data)) + kind + data + struct.pack('>I', zlib.crc32(kind + data))
+
+
+PNG_PLACEHOLDER = (b'\x89PNG\r\n\x1a\n' + _png_chunk(b'IHDR', struct.pack('>IIBBBBB', 1, 1, 8, 0, 0, 0, 0))
+                   + _png_chunk(b'IDAT', zlib.compress(b'\x00\x00')) + _png_chunk(b'IEND', b''))
+
+
+def base_rows(csv_path: str = CATALOG_CSV, seed: int = 0) -> List[Dict[str, str]]:
+    """The real catalog's rows, or a synthetic stand-in of the same shape without the CSV.
+
+    The stand-in has every aya of AYA_COUNTS and splits randomly chosen
+    ones into segments (aya_suffix 1..n) until it has REAL_ROWS rows.
+    """
+    if os.path.exists(csv_path):
+        return [row for _, row in read_catalog(csv_path)]
+    rng = random.Random(seed)
+    ayas = [(sura, aya) for sura, count in enumerate(AYA_COUNTS, 1) for aya in range(1, count + 1)]
+    extra = Counter(rng.choices(range(len(ayas)), k=REAL_ROWS - len(ayas)))
+    rows = []
+    for position, (sura, aya) in enumerate(ayas):
+        suffixes = range(1, extra[position] + 2) if extra[position] else [0]
+        for suffix in suffixes:
+            stem = f"{sura:03d}{aya:03d}" + (f"_{suffix}" if suffix else '')
+            rows.append({'id': str(len(rows) + 1), 'audio': f"{stem}.mp3", 'image': f"{sura}_{aya}.png",
+                         'sura': str(sura), 'aya': str(aya), 'aya_suffix': str(suffix),
+                         'sura_name': f"Sura {sura}"})
+    return rows
+
+
+def scaled_rows(rows: List[Dict[str, str]], scale: int) -> List[Dict[str, str]]:
+    """scale copies of the catalog, one per reciter.
+
+    Copies after the first take their audio from a reciter subfolder and
+    name their suras '<sura> (<reciter>)', so each reciter gets its own
+    dropdown entries; images are shared, as every reciter shows the same page.
+    """
+    scaled = []
+    for copy in range(scale):
+        reciter = reciter_name(copy)
+        for row in rows:
+            scaled.append(dict(row, id=str(len(scaled) + 1),
+                               audio=f"{reciter}/{row['audio']}" if copy else row['audio'],
+                               sura_name=f"{row['sura_name']} ({reciter})" if copy else row['sura_name']))
+    return scaled
+
+
+def reciter_name(copy: int) -> str:
+    return f"reciter{copy:03d}"
+
+
+def _write_analysis(db_path: str, rows: List[Dict[str, str]], seed: int) -> Dict:
+    """Pause points, trims and reciter segments for every audio file, as the analysis tools would store them."""
+    from pause_analysis import init_pause_tables
+    from silence_trim import init_trim_table
+    from sura_segmenter import init_segment_table
+    init_pause_tables(db_path)
+    init_trim_table(db_path)
+    init_segment_table(db_path)
+
+    rng = random.Random(seed)
+    scans, pauses, trims, segments = [], [], [], []
+    offsets = {}  # (reciter, sura) -> running position in the full-sura recording
+    for row in rows:
+        audio = row['audio']
+        duration = rng.randint(3000, 30000)
+        scans.append((audio, len(MP3_PLACEHOLDER), 0.0, duration, 0.0))
+        for rank in range(rng.randint(0, 4)):
+            position = rng.randint(duration // 5, duration * 4 // 5)
+            pauses.append((audio, rank, position, position - 100, position + 100, round(rng.uniform(25, 45), 1)))
+        lead, tail = rng.randint(0, 400), rng.randint(0, 600)
+        trims.append((audio, 0, 0, duration, lead, duration - tail, len(MP3_PLACEHOLDER), 0.0))
+        if '/' in audio:
+            reciter = audio.split('/', 1)[0]
+            start = offsets.get((reciter, row['sura']), 0)
+            offsets[(reciter, row['sura'])] = start + duration
+            confidence = round(rng.uniform(0.3, 1.0), 3)
+            segments.append((reciter, audio, f"{reciter}/sura_{int(row['sura']):03d}.mp3", start, start + duration,
+                             confidence, int(confidence < 0.5)))
+
+    with get_db_connection(db_path) as conn:
+        conn.executemany('INSERT OR REPLACE INTO aya_pause_scan VALUES (?, ?, ?, ?, ?)', scans)
+        conn.executemany('INSERT OR REPLACE INTO aya_pause_points VALUES (?, ?, ?, ?, ?, ?)', pauses)
+        conn.executemany('INSERT OR REPLACE INTO aya_trim VALUES (?, ?, ?, ?, ?, ?, ?, ?)', trims)
+        conn.executemany('INSERT OR REPLACE INTO reciter_segments VALUES (?, ?, ?, ?, ?, ?, ?)', segments)
+        conn.commit()
+    return {'pause_points': len(pauses), 'trims': len(trims), 'reciter_segments': len(segments)}
+
+
+def generate_catalog(db_path: str, scale: int = 1, analysis: bool = True, csv_path: str = CATALOG_CSV,
+                     seed: int = 0) -> Dict:
+    """Build a catalog database of scale x REAL_ROWS rows at db_path, replacing any there.
+
+    The rows go through catalog_import like a real catalog, so the
+    database has the same schema, indexes and sura_meta.
+    """
+    started = time.perf_counter()
+    for path in (db_path, db_path + '-journal'):
+        if os.path.exists(path):
+            os.remove(path)
+    os.makedirs(os.path.dirname(db_path) or '.', exist_ok=True)
+    rows = scaled_rows(base_rows(csv_path, seed), scale)
+    staging = db_path + '.csv'
+    with open(staging, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=CATALOG_COLUMNS)
+        writer.writeheader()
+        writer.writerows(rows)
+    try:
+        import_catalog(staging, db_path)
+    finally:
+        os.remove(staging)
+    report = {'db': db_path, 'scale': scale, 'rows': len(rows), 'reciters': scale}
+    if analysis:
+        report.update(_write_analysis(db_path, rows, seed))
+    report['elapsed_s'] = round(time.perf_counter() - started, 3)
+    return report
+
+
+def write_assets(root: str, db_path: str) -> Dict:
+    """Placeholder files for every audio and image the catalog refers to, under root.
+
+    They pass asset_manifest's header checks, so startup checks and scans
+    do the same work as on real assets, only with smaller reads.
+    """
+    with get_db_connection(db_path) as conn:
+        names = conn.execute('SELECT audio, image FROM all_aya').fetchall()
+    written = 0
+    for name in {name for pair in names for name in pair}:
+        path = os.path.join(root, name)
+        if os.path.exists(path):
+            continue
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with open(path, 'wb') as f:
+            f.write(MP3_PLACEHOLDER if name.endswith('.mp3') else PNG_PLACEHOLDER)
+        written += 1
+    return {'assets_dir': root, 'files': written}
+
+
+def catalog_path(scale: int, data_dir: str = DATA_DIR) -> str:
+    return os.path.join(data_dir, f"aya_{scale}x.db")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate synthetic catalogs (and asset trees) for the benchmarks.")
+    parser.add_argument('--scale', type=int, action='append', help=f"Multiple of the real catalog (default {SCALES})")
+    parser.add_argument('--data-dir', default=DATA_DIR)
+    parser.add_argument('--no-analysis', action='store_true', help="Skip pause, trim and reciter segment rows")
+    parser.add_argument('--assets', action='store_true', help="Also write placeholder files under <data-dir>/q_files_<scale>x")
+    args = parser.parse_args()
+    for scale in args.scale or SCALES:
+        db_path = catalog_path(scale, args.data_dir)
+        report = generate_catalog(db_path, scale, analysis=not args.no_analysis)
+        if args.assets:
+            report.update(write_assets(os.path.join(args.data_dir, f"q_files_{scale}x"), db_path))
+        print(report)
+
+
+if __name__ == "__main__":
+    main()
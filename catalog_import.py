@@ -0,0 +1,219 @@
+# File: catalog_import.py
+import argparse
+import csv
+import os
+import time
+from typing import List, Dict, Iterator, Tuple
+from db_functions import get_db_connection, ASSET_DIR
+
+CATALOG_CSV = os.path.join('archive', 'data_wrangling', 'sqlite.csv')
+BATCH_SIZE = 5000
+MAX_REPORTED_ERRORS = 20
+
+# Number of ayas in each sura, 1-114 (6236 in total)
+AYA_COUNTS = (
+    7, 286, 200, 176, 120, 165, 206, 75, 129, 109, 123, 111, 43, 52, 99, 128, 111, 110, 98, 135,
+    112, 78, 118, 64, 77, 227, 93, 88, 69, 60, 34, 30, 73, 54, 45, 83, 182, 88, 75, 85,
+    54, 53, 89, 59, 37, 35, 38, 29, 18, 45, 60, 49, 62, 55, 78, 96, 29, 22, 24, 13,
+    14, 11, 11, 18, 12, 12, 30, 52, 52, 44, 28, 28, 20, 56, 40, 31, 50, 40, 46, 42,
+    29, 19, 36, 25, 22, 17, 19, 26, 30, 20, 15, 21, 11, 8, 8, 19, 5, 8, 8, 11,
+    11, 8, 3, 9, 5, 4, 7, 3, 6, 3, 5, 4, 5, 6,
+)
+
+CATALOG_COLUMNS = ('id', 'audio', 'image', 'sura', 'aya', 'aya_suffix', 'sura_name')
+
+
+def read_catalog(csv_path: str) -> Iterator[Tuple[int, Dict[str, str]]]:
+    """Yield (line number, row) from the catalog CSV one row at a time; tolerates a UTF-8 BOM."""
+    with open(csv_path, newline='', encoding='utf-8-sig') as f:
+        reader = csv.DictReader(f)
+        missing = [column for column in CATALOG_COLUMNS if column not in (reader.fieldnames or ())]
+        if missing:
+            raise ValueError(f"{csv_path} is missing columns: {', '.join(missing)}")
+        for row in reader:
+            yield reader.line_num, row
+
+
+def validate_row(row: Dict[str, str], asset_dir: str = None) -> Tuple[tuple, List[str]]:
+    """Convert one CSV row to a catalog tuple and list what is wrong with it."""
+    errors = []
+    values = {}
+    for column in ('id', 'sura', 'aya', 'aya_suffix'):
+        try:
+            values[column] = int((row[column] or '').strip() or (0 if column == 'aya_suffix' else ''))
+        except ValueError:
+            errors.append(f"{column} '{row[column]}' is not an integer")
+    for column in ('audio', 'image', 'sura_name'):
+        values[column] = (row[column] or '').strip()
+        if not values[column]:
+            errors.append(f"{column} is empty")
+    if errors:
+        return None, errors
+
+    if values['id'] < 1:
+        errors.append(f"id {values['id']} must be positive")
+    if not 1 <= values['sura'] <= len(AYA_COUNTS):
+        errors.append(f"sura {values['sura']} out of range 1-{len(AYA_COUNTS)}")
+    elif not 1 <= values['aya'] <= AYA_COUNTS[values['sura'] - 1]:
+        errors.append(f"aya {values['aya']} out of range 1-{AYA_COUNTS[values['sura'] - 1]} for sura {values['sura']}")
+    if values['aya_suffix'] < 0:
+        errors.append(f"aya_suffix {values['aya_suffix']} is negative")
+    if asset_dir:
+        for column in ('audio', 'image'):
+            if not os.path.isfile(os.path.join(asset_dir, values[column])):
+                errors.append(f"{column} {values[column]} not found in {asset_dir}")
+    return tuple(values[column] for column in CATALOG_COLUMNS), errors
+
+
+def _ensure_catalog_schema(conn) -> None:
+    """Create all_aya with its primary key, migrating a table that lost it (e.g. to pandas to_sql)."""
+    columns = conn.execute('PRAGMA table_info(all_aya)').fetchall()
+    if columns and any(column[1] == 'id' and column[5] for column in columns):
+        return
+    extra = [f"{column[1]} {column[2]}" for column in columns if column[1] not in CATALOG_COLUMNS]
+    conn.execute(f'''
+        CREATE TABLE all_aya_new (
+            id INTEGER PRIMARY KEY,
+            audio TEXT NOT NULL,
+            image TEXT NOT NULL,
+            sura INTEGER NOT NULL,
+            aya INTEGER NOT NULL,
+            aya_suffix INTEGER NOT NULL DEFAULT 0,
+            sura_name TEXT NOT NULL{''.join(', ' + column for column in extra)}
+        )
+    ''')
+    if columns:
+        print("Migrating all_aya to a table with a primary key")
+        names = ', '.join(column[1] for column in columns)
+        # Rows are copied in rowid order, so the last duplicate of an id wins as it did at read time
+        conn.execute(f'INSERT OR REPLACE INTO all_aya_new ({names}) SELECT {names} FROM all_aya WHERE id IS NOT NULL ORDER BY rowid')
+        conn.execute('DROP TABLE all_aya')
+    conn.execute('ALTER TABLE all_aya_new RENAME TO all_aya')
+
+
+def _column_names(conn) -> set:
+    return {column[1] for column in conn.execute('PRAGMA table_info(all_aya)')}
+
+
+def _rebuild_sura_meta(conn) -> None:
+    conn.execute('''
+        CREATE TABLE IF NOT EXISTS sura_meta (
+            sura INTEGER PRIMARY KEY,
+            sura_name TEXT,
+            first_id INTEGER,
+            last_id INTEGER,
+            aya_count INTEGER,
+            rows INTEGER
+        )
+    ''')
+    conn.execute('DELETE FROM sura_meta')
+    conn.execute('''
+        INSERT INTO sura_meta (sura, sura_name, first_id, last_id, aya_count, rows)
+        SELECT sura, MIN(sura_name), MIN(id), MAX(id), MAX(aya), COUNT(*) FROM all_aya GROUP BY sura
+    ''')
+
+
+def import_catalog(csv_path: str = CATALOG_CSV, db_path: str = None, asset_dir: str = None,
+                   batch_size: int = BATCH_SIZE, skip_invalid: bool = False) -> Dict:
+    """Stream the catalog CSV into all_aya, validating every row, in one transaction.
+
+    Rows are upserted by id and ids missing from the CSV are deleted, so
+    running it twice leaves the same catalog. A row pointing at another file
+    loses its content hash until content_store.py ingests again. Invalid
+    rows abort the import unless skip_invalid is set. asset_dir, when
+    given, also requires every referenced file to exist.
+    """
+    print(f"\n=== Importing catalog from {csv_path} ===")
+    started = time.perf_counter()
+    rows = errors = 0
+    seen_ids = set()
+    problems = []
+
+    with get_db_connection(db_path) as conn:
+        conn.execute('BEGIN IMMEDIATE')
+        _ensure_catalog_schema(conn)
+        conn.execute('CREATE TEMP TABLE imported_ids (id INTEGER PRIMARY KEY)')
+        # Content hashes (content_store.py) describe the old file once a row points at another one
+        derived = ''.join(
+            f", {column}_hash = CASE WHEN {column} IS excluded.{column} THEN {column}_hash END"
+            for column in ('audio', 'image') if f"{column}_hash" in _column_names(conn)
+        )
+        upsert = f'''
+            INSERT INTO all_aya (id, audio, image, sura, aya, aya_suffix, sura_name) VALUES (?, ?, ?, ?, ?, ?, ?)
+            ON CONFLICT(id) DO UPDATE SET audio = excluded.audio, image = excluded.image, sura = excluded.sura,
+                aya = excluded.aya, aya_suffix = excluded.aya_suffix, sura_name = excluded.sura_name{derived}
+            WHERE (audio, image, sura, aya, aya_suffix, sura_name) IS NOT
+                  (excluded.audio, excluded.image, excluded.sura, excluded.aya, excluded.aya_suffix, excluded.sura_name)
+        '''
+        batch = []
+        for line, row in read_catalog(csv_path):
+            values, row_errors = validate_row(row, asset_dir)
+            if values and values[0] in seen_ids:
+                row_errors.append(f"duplicate id {values[0]}")
+            if row_errors:
+                errors += 1
+                if len(problems) < MAX_REPORTED_ERRORS:
+                    problems.append(f"line {line}: {'; '.join(row_errors)}")
+                continue
+            seen_ids.add(values[0])
+            batch.append(values)
+            if len(batch) >= batch_size:
+                conn.executemany(upsert, batch)
+                conn.executemany('INSERT INTO imported_ids (id) VALUES (?)', [(v[0],) for v in batch])
+                rows += len(batch)
+                batch = []
+        if batch:
+            conn.executemany(upsert, batch)
+            conn.executemany('INSERT INTO imported_ids (id) VALUES (?)', [(v[0],) for v in batch])
+            rows += len(batch)
+
+        for problem in problems:
+            print(f"Invalid row, {problem}")
+        if errors and not skip_invalid:
+            conn.rollback()
+            raise ValueError(f"{errors} invalid rows in {csv_path}; nothing was imported")
+        if not rows:
+            conn.rollback()
+            raise ValueError(f"No valid rows in {csv_path}")
+
+        deleted = conn.execute('DELETE FROM all_aya WHERE id NOT IN (SELECT id FROM imported_ids)').rowcount
+        conn.execute('DROP TABLE imported_ids')
+        conn.execute('CREATE INDEX IF NOT EXISTS all_aya_sura_aya ON all_aya (sura, aya, aya_suffix)')
+        conn.execute('CREATE INDEX IF NOT EXISTS all_aya_audio ON all_aya (audio)')
+        conn.execute('CREATE INDEX IF NOT EXISTS all_aya_image ON all_aya (image)')
+        conn.execute('REINDEX all_aya')
+        _rebuild_sura_meta(conn)
+
+        # Keep the reading position unless it no longer points at a catalog row
+        conn.execute('CREATE TABLE IF NOT EXISTS current_aya (current_aya INTEGER, speed REAL DEFAULT 1.0)')
+        if conn.execute('SELECT COUNT(*) FROM current_aya').fetchone()[0] == 0:
+            conn.execute('INSERT INTO current_aya (current_aya, speed) VALUES (1, 1.0)')
+        conn.execute('UPDATE current_aya SET current_aya = 1 WHERE current_aya NOT IN (SELECT id FROM all_aya)')
+        conn.commit()
+        conn.execute('ANALYZE all_aya')
+
+    elapsed = time.perf_counter() - started
+    report = {
+        'rows': rows,
+        'deleted': deleted,
+        'invalid': errors,
+        'elapsed_s': round(elapsed, 3),
+        'rows_per_s': round(rows / elapsed) if elapsed else 0,
+    }
+    print(f"Catalog import complete: {rows} rows ({report['rows_per_s']} rows/s), {deleted} deleted, {errors} invalid skipped")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Build the all_aya catalog from sqlite.csv.")
+    parser.add_argument('csv_path', nargs='?', default=CATALOG_CSV)
+    parser.add_argument('--check-assets', action='store_true', help=f"Require every referenced file to exist in {ASSET_DIR}")
+    parser.add_argument('--skip-invalid', action='store_true', help="Import the valid rows instead of aborting")
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    args = parser.parse_args()
+    import_catalog(args.csv_path, asset_dir=ASSET_DIR if args.check_assets else None,
+                   batch_size=args.batch_size, skip_invalid=args.skip_invalid)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,352 @@
+# File: catalog_watcher.py
+import argparse
+import ctypes
+import ctypes.util
+import hashlib
+import os
+import select
+import sqlite3
+import struct
+import threading
+import time
+import traceback
+from typing import List, Dict, Callable
+from db_functions import get_db_connection, load_aya_data, DB_PATH, ASSET_DIR
+
+POLL_INTERVAL_S = 2.0
+SETTLE_S = 0.5            # wait for a burst of file events (e.g. an asset swap) to finish
+IGNORED_SUFFIXES = ('.tmp', '.part')
+
+ADDED, CHANGED, REMOVED = 'added', 'changed', 'removed'
+
+# inotify constants from <sys/inotify.h>
+IN_CLOSE_WRITE = 0x008
+IN_MOVED_FROM = 0x040
+IN_MOVED_TO = 0x080
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_Q_OVERFLOW = 0x4000
+IN_NONBLOCK = 0o4000
+IN_CLOEXEC = 0o2000000
+EVENT = struct.Struct('iIII')
+
+
+def _ignored(name: str) -> bool:
+    return name.startswith('.') or name.endswith(IGNORED_SUFFIXES)
+
+
+class PollingWatcher:
+    """Detects changes by rescanning the directory and diffing size/mtime against the last scan."""
+
+    def __init__(self, directory: str = ASSET_DIR, interval_s: float = POLL_INTERVAL_S):
+        self.directory = directory
+        self.interval_s = interval_s
+        self.index = self._scan()
+
+    def _scan(self) -> Dict[str, tuple]:
+        index = {}
+        for entry in os.scandir(self.directory):
+            if not _ignored(entry.name) and entry.is_file():
+                stat = entry.stat()
+                index[entry.name] = (stat.st_size, stat.st_mtime_ns)
+        return index
+
+    def poll(self, timeout: float = None) -> Dict[str, str]:
+        time.sleep(self.interval_s if timeout is None else min(timeout, self.interval_s))
+        index = self._scan()
+        changes = {name: REMOVED for name in self.index.keys() - index.keys()}
+        for name, stamp in index.items():
+            old = self.index.get(name)
+            if old is None:
+                changes[name] = ADDED
+            elif old != stamp:
+                changes[name] = CHANGED
+        self.index = index
+        return changes
+
+    def close(self) -> None:
+        pass
+
+
+class InotifyWatcher:
+    """Linux inotify on the asset directory through libc, without extra dependencies."""
+
+    MASK = IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+
+    def __init__(self, directory: str = ASSET_DIR):
+        self.directory = directory
+        self.libc = ctypes.CDLL(ctypes.util.find_library('c'), use_errno=True)
+        self.fd = self.libc.inotify_init1(IN_NONBLOCK | IN_CLOEXEC)
+        if self.fd < 0:
+            raise OSError(ctypes.get_errno(), "inotify_init1 failed")
+        if self.libc.inotify_add_watch(self.fd, os.fsencode(directory), self.MASK) < 0:
+            os.close(self.fd)
+            raise OSError(ctypes.get_errno(), f"inotify_add_watch failed for {directory}")
+        self.overflowed = False
+
+    @staticmethod
+    def available() -> bool:
+        if not hasattr(select, 'select') or not ctypes.util.find_library('c'):
+            return False
+        return hasattr(ctypes.CDLL(ctypes.util.find_library('c')), 'inotify_init1')
+
+    def _read(self, changes: Dict[str, str]) -> None:
+        try:
+            data = os.read(self.fd, 64 * 1024)
+        except BlockingIOError:
+            return
+        offset = 0
+        while offset < len(data):
+            _, mask, _, length = EVENT.unpack_from(data, offset)
+            name = data[offset + EVENT.size:offset + EVENT.size + length].rstrip(b'\0').decode('utf-8', 'replace')
+            offset += EVENT.size + length
+            if mask & IN_Q_OVERFLOW:
+                self.overflowed = True
+            elif not name or _ignored(name):
+                continue
+            elif mask & (IN_DELETE | IN_MOVED_FROM):
+                # A file created and gone within one burst (a temp file renamed away) is no change
+                if changes.get(name) == ADDED:
+                    del changes[name]
+                else:
+                    changes[name] = REMOVED
+            elif mask & IN_CREATE:
+                changes.setdefault(name, ADDED)
+            else:
+                changes[name] = ADDED if changes.get(name) in (ADDED, REMOVED) else CHANGED
+
+    def poll(self, timeout: float = None) -> Dict[str, str]:
+        changes = {}
+        ready, _, _ = select.select([self.fd], [], [], timeout)
+        if not ready:
+            return changes
+        self._read(changes)
+        # Keep collecting until the directory has been quiet for SETTLE_S
+        while select.select([self.fd], [], [], SETTLE_S)[0]:
+            self._read(changes)
+        # Files only created but never closed after writing are still being written elsewhere
+        return {name: kind for name, kind in changes.items() if kind != ADDED or os.path.exists(os.path.join(self.directory, name))}
+
+    def close(self) -> None:
+        os.close(self.fd)
+
+
+def open_watcher(directory: str = ASSET_DIR, polling: bool = False):
+    """inotify where the platform has it, otherwise the polling scan."""
+    if not polling and InotifyWatcher.available():
+        try:
+            return InotifyWatcher(directory)
+        except OSError as e:
+            print(f"inotify unavailable ({e}), falling back to polling")
+    return PollingWatcher(directory)
+
+
+def _existing_tables(conn) -> set:
+    return {row[0] for row in conn.execute("SELECT name FROM sqlite_master WHERE type = 'table'")}
+
+
+def refresh_assets(changes: Dict[str, str], db_path: str = None, asset_dir: str = ASSET_DIR) -> Dict:
+    """Bring the derived tables up to date for changed catalog files only.
+
+    Audio files get their pause analysis and silence trim redone, and every
+    file its manifest entry and all_aya content hash, for whichever of those
+    tables exist. Removed files lose their derived rows. Files the catalog
+    doesn't reference are only reported as unreferenced: adding all_aya rows
+    (ids, sura names, splitting an aya into segments) is catalog_import's job,
+    and the watcher reloads the rows once it has run.
+    """
+    from pause_analysis import analyze_file, store_analysis
+    from silence_trim import scan_file, store_trim
+    from asset_manifest import check_file, store_check
+
+    with get_db_connection(db_path) as conn:
+        tables = _existing_tables(conn)
+        columns = {row[1] for row in conn.execute('PRAGMA table_info(all_aya)')}
+        referenced_audio = {row[0] for row in conn.execute('SELECT DISTINCT audio FROM all_aya')}
+        referenced_images = {row[0] for row in conn.execute('SELECT DISTINCT image FROM all_aya')}
+
+    report = {'audio': [], 'image': [], 'removed': [], 'unreferenced': [], 'failed': []}
+    for name, kind in sorted(changes.items()):
+        is_audio = name in referenced_audio
+        if not is_audio and name not in referenced_images:
+            report['unreferenced'].append(name)
+            continue
+        path = os.path.join(asset_dir, name)
+        try:
+            with get_db_connection(db_path) as conn:
+                if kind == REMOVED or not os.path.exists(path):
+                    if 'aya_pause_points' in tables:
+                        conn.execute('DELETE FROM aya_pause_points WHERE audio = ?', (name,))
+                        conn.execute('DELETE FROM aya_pause_scan WHERE audio = ?', (name,))
+                    if 'aya_trim' in tables:
+                        conn.execute('DELETE FROM aya_trim WHERE audio = ?', (name,))
+                    if 'asset_manifest' in tables:
+                        conn.execute("UPDATE asset_manifest SET status = 'missing', detail = 'file not found', "
+                                     "size = NULL, mtime = NULL, checked_at = ? WHERE name = ?", (time.time(), name))
+                    conn.commit()
+                    report['removed'].append(name)
+                    continue
+
+                stat = os.stat(path)
+                check = check_file(path)
+                if 'asset_manifest' in tables:
+                    store_check(conn, name, check)
+                if is_audio and 'audio_hash' in columns:
+                    conn.execute('UPDATE all_aya SET audio_hash = ? WHERE audio = ?', (check['hash'], name))
+                if not is_audio and 'image_hash' in columns:
+                    conn.execute('UPDATE all_aya SET image_hash = ? WHERE image = ?', (check['hash'], name))
+                # Record the manifest first so a file that fails to decode below still shows as checked
+                conn.commit()
+                if is_audio and 'aya_pause_scan' in tables:
+                    store_analysis(conn, name, stat.st_size, stat.st_mtime, analyze_file(path))
+                if is_audio and 'aya_trim' in tables:
+                    store_trim(conn, name, stat.st_size, stat.st_mtime, scan_file(path))
+                conn.commit()
+            report['audio' if is_audio else 'image'].append(name)
+        except Exception as e:
+            print(f"Error refreshing {name}: {e}")
+            report['failed'].append(name)
+    return report
+
+
+def reconcile(db_path: str = None, asset_dir: str = ASSET_DIR) -> Dict[str, str]:
+    """Changes between asset_dir and the size/mtime stamps the derived tables recorded.
+
+    For a full resync when file events were lost: a file is changed when
+    its stamp in asset_manifest, aya_pause_scan or aya_trim (whichever
+    exist) differs, added when it has none, and removed when the manifest
+    saw it on disk and it is gone.
+    """
+    on_disk = {}
+    for entry in os.scandir(asset_dir):
+        if not _ignored(entry.name) and entry.is_file():
+            stat = entry.stat()
+            on_disk[entry.name] = (stat.st_size, stat.st_mtime)
+    stamps = {}
+    with get_db_connection(db_path) as conn:
+        tables = _existing_tables(conn)
+        for table, column in (('asset_manifest', 'name'), ('aya_pause_scan', 'audio'), ('aya_trim', 'audio')):
+            if table in tables:
+                for name, size, mtime in conn.execute(
+                        f'SELECT {column}, size, mtime FROM {table} WHERE size IS NOT NULL'):
+                    stamps.setdefault(name, set()).add((size, mtime))
+        manifest = {row[0] for row in conn.execute('SELECT name FROM asset_manifest WHERE size IS NOT NULL')} \
+            if 'asset_manifest' in tables else set()
+
+    changes = {}
+    for name, stamp in on_disk.items():
+        recorded = stamps.get(name)
+        if not recorded:
+            changes[name] = ADDED
+        elif recorded != {stamp}:
+            changes[name] = CHANGED
+    for name in manifest - on_disk.keys():
+        if '/' not in name:
+            changes[name] = REMOVED
+    return changes
+
+
+def load_derived(audio_names: List[str], db_path: str = None) -> Dict:
+    """Pause points and trim offsets of the given files, in the shapes the app keeps them."""
+    pause_points, trim_offsets = {}, {}
+    with get_db_connection(db_path) as conn:
+        tables = _existing_tables(conn)
+        for name in audio_names:
+            if 'aya_pause_points' in tables:
+                points = tuple(row[0] for row in conn.execute(
+                    'SELECT position_ms FROM aya_pause_points WHERE audio = ? ORDER BY position_ms', (name,)))
+                if points:
+                    pause_points[name] = points
+            if 'aya_trim' in tables:
+                for segment, start_ms, end_ms in conn.execute(
+                        'SELECT segment, trim_start_ms, trim_end_ms FROM aya_trim WHERE audio = ?', (name,)):
+                    trim_offsets[(name, segment)] = (start_ms, end_ms)
+    return {'pause_points': pause_points, 'trim_offsets': trim_offsets}
+
+
+def catalog_signature(conn) -> str:
+    digest = hashlib.sha1()
+    for row in conn.execute('SELECT id, audio, image, sura, aya, aya_suffix, sura_name FROM all_aya ORDER BY id'):
+        digest.update(repr(row).encode('utf-8'))
+    return digest.hexdigest()
+
+
+class CatalogWatcher:
+    """Background thread that keeps the derived tables and a running app in step with q_files.
+
+    on_refresh gets each refresh_assets() report; on_catalog gets freshly
+    loaded aya data when the all_aya rows themselves change (e.g. after
+    catalog_import or asset_swap).
+    """
+
+    def __init__(self, on_refresh: Callable[[Dict], None] = None, on_catalog: Callable[[List[Dict]], None] = None,
+                 db_path: str = None, asset_dir: str = ASSET_DIR, polling: bool = False):
+        self.on_refresh = on_refresh
+        self.on_catalog = on_catalog
+        self.db_path = db_path
+        self.asset_dir = asset_dir
+        self.watcher = open_watcher(asset_dir, polling)
+        self.stop_event = threading.Event()
+        self.thread = None
+
+    def start(self) -> None:
+        print(f"Watching {self.asset_dir} with {type(self.watcher).__name__}")
+        self.thread = threading.Thread(target=self._run, daemon=True)
+        self.thread.start()
+
+    def stop(self) -> None:
+        self.stop_event.set()
+
+    def _run(self) -> None:
+        # A connection of our own: PRAGMA data_version only moves for other connections' commits
+        monitor = sqlite3.connect(self.db_path or DB_PATH, check_same_thread=False)
+        data_version = monitor.execute('PRAGMA data_version').fetchone()[0]
+        signature = catalog_signature(monitor)
+        try:
+            while not self.stop_event.is_set():
+                changes = self.watcher.poll(timeout=POLL_INTERVAL_S)
+                if getattr(self.watcher, 'overflowed', False):
+                    # The kernel dropped events: poll from here on and resync whatever changed meanwhile
+                    print("inotify queue overflowed; switching to polling and reconciling")
+                    self.watcher.close()
+                    self.watcher = PollingWatcher(self.asset_dir)
+                    changes.update(reconcile(self.db_path, self.asset_dir))
+                if changes:
+                    started = time.perf_counter()
+                    report = refresh_assets(changes, self.db_path, self.asset_dir)
+                    print(f"Refreshed {len(report['audio'])} audio, {len(report['image'])} images, "
+                          f"{len(report['removed'])} removed in {time.perf_counter() - started:.2f}s")
+                    if self.on_refresh:
+                        self.on_refresh(report)
+
+                version = monitor.execute('PRAGMA data_version').fetchone()[0]
+                if version != data_version:
+                    data_version = version
+                    new_signature = catalog_signature(monitor)
+                    if new_signature != signature:
+                        signature = new_signature
+                        if self.on_catalog:
+                            self.on_catalog(load_aya_data(self.db_path))
+        except Exception:
+            print(f"Catalog watcher stopped: {traceback.format_exc()}")
+        finally:
+            monitor.close()
+            self.watcher.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Keep the derived catalog tables up to date as q_files changes.")
+    parser.add_argument('--dir', default=ASSET_DIR)
+    parser.add_argument('--poll', action='store_true', help="Use the polling scan even where inotify exists")
+    args = parser.parse_args()
+    watcher = CatalogWatcher(on_refresh=lambda report: print(report), db_path=None, asset_dir=args.dir, polling=args.poll)
+    watcher.start()
+    try:
+        while watcher.thread.is_alive():
+            watcher.thread.join(1.0)
+    except KeyboardInterrupt:
+        watcher.stop()
+
+
+if __name__ == "__main__":
+    main()
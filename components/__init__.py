@@ -2,7 +2,7 @@
 from .navigation_controls import build_navigation_controls
 from .selection_panel import build_selection_panel
 from .audio_player import create_audio_player
-from .image_display import create_image_display
+from .image_display import create_image_display, create_atlas_image_display
 from .status_bar import create_status_bar
 
 __all__ = [
@@ -10,5 +10,6 @@ __all__ = [
     'build_selection_panel',
     'create_audio_player',
     'create_image_display',
+    'create_atlas_image_display',
     'create_status_bar'
 ]
\ No newline at end of file
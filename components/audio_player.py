@@ -1,6 +1,7 @@
 import flet_audio as fta
+from playback_core import PlaybackLogic
 
-class MainAudioPlayer(fta.Audio):
+class MainAudioPlayer(PlaybackLogic, fta.Audio):
     def __init__(
         self,
         initial_src,
@@ -11,11 +12,13 @@ class MainAudioPlayer(fta.Audio):
         on_seek_complete,
         volume=1.0,
         balance=0,
-        playback_rate=1.0
+        playback_rate=1.0,
+        src_base64=None
     ):
         """Initialize and configure an audio player."""
         super().__init__(
             src=initial_src,
+            src_base64=src_base64,
             autoplay=False,
             volume=volume,
             balance=balance,
@@ -27,47 +30,7 @@ class MainAudioPlayer(fta.Audio):
             playback_rate=playback_rate,
         )
         self.last_volume_update = 0
-
-    def handle_audio_position_changed(self, aya_duration, play_begining_of_aya_is_true, audio_volume):
-        """Handle audio position changes and volume fading."""
-        if aya_duration and play_begining_of_aya_is_true:
-            current_position = float(self.get_current_position())
-            thirty_percent = aya_duration * 0.3
-            sixty_percent = aya_duration * 0.6
-
-            print(f"[DEBUG] Position: {current_position:.2f}/{aya_duration:.2f} (30%={thirty_percent:.2f}, 60%={sixty_percent:.2f})")
-
-            if current_position > sixty_percent:
-                self.pause()
-                play_begining_of_aya_is_true = False
-                audio_volume = 1.0
-                self.volume = audio_volume
-                self.update()
-                print("[DEBUG] Stopped at 60%, reset flag to False and volume to 1.0")
-            elif current_position > thirty_percent:
-                if current_position - self.last_volume_update >= 0.1:
-                    self.last_volume_update = current_position
-
-                    fade_position = current_position - thirty_percent
-                    fade_period = sixty_percent - thirty_percent
-
-                    print(f"[DEBUG] Current volume before fade: {audio_volume:.3f}")
-                    fade_progress = fade_position / fade_period
-                    fade_factor = (1 - fade_progress) ** 2
-                    audio_volume = max(0.0, min(1.0, fade_factor))
-                    self.volume = audio_volume
-                    self.update()
-                    print(f"[DEBUG] Volume decreased to: {audio_volume:.3f}")
-
-    def play_current(self, audio_volume=1.0, speed=1):
-        """Play the current audio with passed volume."""
-        print("Playing current audio")
-        if self:
-            self.volume = audio_volume
-            print(self.playback_rate)
-            self.playback_rate = speed
-            self.update()
-            self.play()
+        self.start_offset = 0  # ms to seek past leading silence when playback starts
 
 def create_audio_player(
     initial_src,
@@ -78,7 +41,8 @@ def create_audio_player(
     on_seek_complete,
     volume=1.0,
     balance=0,
-    playback_rate=1.0
+    playback_rate=1.0,
+    src_base64=None
 ):
     """Factory function to create and return a MainAudioPlayer instance."""
     return MainAudioPlayer(
@@ -91,7 +55,8 @@ def create_audio_player(
         volume=volume,
         balance=balance,
         
-        playback_rate=playback_rate
+        playback_rate=playback_rate,
+        src_base64=src_base64
     )
     
 # Example usage:
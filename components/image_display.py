@@ -15,3 +15,30 @@ def create_image_display(initial_src, width=400, height=400):
     
     image.update_source = update_source
     return image
+
+
+def create_atlas_image_display(height=300):
+    """Show one aya by cropping its rectangle out of a sura atlas image.
+
+    The atlas keeps the same src while navigating within a sura, so the
+    client decodes it once and only the offsets change per aya.
+    """
+    atlas_image = ft.Image(src="", fit=ft.ImageFit.FILL, left=0, top=0)
+    view = ft.Container(
+        content=ft.Stack([atlas_image]),
+        height=height,
+        clip_behavior=ft.ClipBehavior.HARD_EDGE,
+    )
+
+    def show(entry):
+        atlas, x, y, width, rect_height, atlas_width, atlas_height = entry
+        scale = height / rect_height
+        atlas_image.src = atlas
+        atlas_image.width = atlas_width * scale
+        atlas_image.height = atlas_height * scale
+        atlas_image.left = -x * scale
+        atlas_image.top = -y * scale
+        view.width = width * scale
+
+    view.show = show
+    return view
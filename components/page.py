@@ -1,23 +1,18 @@
 #components\page.py
 import flet as ft
 import traceback
-from pynput import keyboard
+from components.image_display import create_atlas_image_display
+from state import page_flush
 
 def create_page(app, page: ft.Page):
     """Create and configure the main application page"""
     
-    # Setup keyboard listener
-    def on_key_press(key):
-        try:
-            if key == keyboard.Key.right:
-                app.next_item_and_play()
-            elif key == keyboard.Key.left:
-                prev_item()
-        except Exception as e:
-            print(f"Error processing key event: {e}")
-    
-    keyboard_listener = keyboard.Listener(on_press=on_key_press)
-    keyboard_listener.start()
+    # Key and ring events and watcher updates run on the page's event loop, not their own threads
+    loop = getattr(page, 'loop', None)
+    if loop:
+        app.ui_dispatch = loop.call_soon_threadsafe
+        app.input_bus.dispatch = loop.call_soon_threadsafe
+    app.input_bus.start_listener()
     print("\n=== Starting Quran Audio Image App ===")
     page.title = "Quran Audio Image App"
     page.vertical_alignment = "center"
@@ -34,8 +29,12 @@ def create_page(app, page: ft.Page):
     try:
         
 
+        def status_for(item):
+            suffix_display = f" - {item['aya_suffix']}" if item['aya_suffix'] else ""
+            return f"Surah {item['sura_name']} - Ayah {item['aya']}{suffix_display}"
+
         status_text = ft.Text(
-            f"Surah {app.aya_data[app.current_index]['sura_name']} - Ayah {app.aya_data[app.current_index]['aya']}", 
+            status_for(app.aya_data[app.current_index]),
             size=16,
             weight="bold"
         )
@@ -43,72 +42,118 @@ def create_page(app, page: ft.Page):
         speed_text = ft.Text(f"Speed: {app.speed}x", size=14)
 
         def update_speed(change):
-            current_rate = app.speed
-            new_rate = round(current_rate + change, 1)
-            # Ensure speed stays within reasonable bounds
-            new_rate = max(0.5, min(2.0, new_rate))
-            app.update_speed(new_rate)
-            speed_text.value = f"Speed: {new_rate}x"
-            page.update()
+            app.record_intent('speed', change)
+            app.change_speed(change)
 
         # Create dropdowns
         sura_dropdown = app.build_sura_dropdown()
         aya_dropdown = app.build_aya_dropdown(app.aya_data[app.current_index]['sura_name'])
 
+        def toggle_play_beginning(e):
+            app.record_intent('play_beginning', not app.play_begining_of_aya_is_true)
+            app.toggle_play_beginning_of_aya(e)
+
+        play_beginning_switch = ft.Switch(label="Play beginning of aya", value=app.play_begining_of_aya_is_true,
+                                          on_change=toggle_play_beginning)
+
         page.overlay.append(app.audio_player)
 
         img_display = ft.Image(
             src=app.aya_data[app.current_index]['image'],
             width=None,
-            height=300,
+            height=app.image_display_height,
             fit=ft.ImageFit.CONTAIN,
         )
 
-        def update_content():
-            """Update the UI content"""
-            print(f"\n=== Updating content for index {app.current_index} ===")
-            speed_text.value = f"Speed: {app.speed}x"
-
-            # Update image and text
-            img_display.src = app.aya_data[app.current_index]['image']
-            suffix = app.aya_data[app.current_index]['aya_suffix']
-            suffix_display = f" - {suffix}" if suffix else ""
-            status_text.value = f"Surah {app.aya_data[app.current_index]['sura_name']} - Ayah {app.aya_data[app.current_index]['aya']}{suffix_display}"
-
-            # Update dropdown selections
-            sura_dropdown.value = app.aya_data[app.current_index]['sura_name']
-            aya_dropdown.value = str(app.aya_data[app.current_index]['aya'])
-
-            # Update database
-            app.update_current_aya(app.aya_data[app.current_index]['id'])
-
-            # Dispose of the old audio player if it exists
-            if hasattr(app, 'audio_player') and app.audio_player:
-                page.overlay.remove(app.audio_player)
-                app.audio_player._dispose()
-                #page.update()
-
-            # Create and configure the new audio player
-            app.audio_player = app.setup_audio_player(app.aya_data[app.current_index]['audio'])
-            app.audio_player.playback_rate = app.speed
-            page.overlay.append(app.audio_player)
-
-            # Update the page and audio player
-            page.update()
-            app.audio_player.update()
+        atlas_display = create_atlas_image_display(app.image_display_height)
+
+        def show_image():
+            """Point the image at the current aya, from the sura atlas or the in-memory cache when enabled.
+
+            Returns the controls that changed.
+            """
+            entry = app.atlas_entry_for(app.aya_data[app.current_index])
+            use_atlas = entry is not None
+            controls = [atlas_display] if use_atlas else [img_display]
+            if atlas_display.visible != use_atlas or img_display.visible == use_atlas:
+                atlas_display.visible = use_atlas
+                img_display.visible = not use_atlas
+                controls = [atlas_display, img_display]
+            if use_atlas:
+                atlas_display.show(entry)
+                return controls
+
+            # Inline bytes from the cache mean the client doesn't make a separate file fetch per aya
+            img_display.src, img_display.src_base64 = app.image_payload(app.current_index)
+            return controls
+
+        show_image()
+        shown_sura = {'name': app.aya_data[app.current_index]['sura_name']}
+
+        def show_aya(navigation, changed):
+            """Load the aya at the current index; returns the controls to send."""
+            print(f"\n=== Updating content for index {navigation['index']} ===")
+            item = app.aya_data[navigation['index']]
+            if app.tracer:
+                app.tracer.mark('render')
+            controls = show_image()
+
+            status = status_for(item)
+            if status_text.value != status:
+                status_text.value = status
+                controls.append(status_text)
+
+            # Update dropdown selections, and the ayah range when the sura changed
+            if shown_sura['name'] != item['sura_name']:
+                shown_sura['name'] = item['sura_name']
+                aya_dropdown.options = [
+                    ft.dropdown.Option(text=str(i))
+                    for i in range(1, app.sura_map[item['sura_name']]['last_aya'] + 1)
+                ]
+                controls.append(aya_dropdown)
+            if sura_dropdown.value != item['sura_name']:
+                sura_dropdown.value = item['sura_name']
+                controls.append(sura_dropdown)
+            if aya_dropdown.value != str(item['aya']):
+                aya_dropdown.value = str(item['aya'])
+                controls.append(aya_dropdown)
+
+            # The new player joins the overlay, which only a page update sends
+            if app.load_aya(navigation['index'], page.overlay):
+                controls.append(page)
             print("Content update complete")
+            return controls
+
+        def show_speed(playback, changed):
+            speed_text.value = f"Speed: {playback['speed']}x"
+            return [speed_text, app.audio_player] if app.audio_player else [speed_text]
+
+        def show_play_beginning(playback, changed):
+            if play_beginning_switch.value == playback['play_beginning']:
+                return []
+            play_beginning_switch.value = playback['play_beginning']
+            return [play_beginning_switch]
+
+        def show_target(index):
+            """Follow a navigation burst in the status text without loading anything."""
+            status_text.value = status_for(app.aya_data[index])
+            page.update(status_text)
+
+        def update_content():
+            """Reload the current aya, e.g. after its audio or image changed."""
+            app.state.touch('navigation', 'index')
+
+        # Each change renders only what depends on it, in one round trip per commit
+        app.state.flush = page_flush(page)
+        app.state.subscribe('navigation', show_aya, fields=['index'])
+        app.state.subscribe('playback', show_speed, fields=['speed'])
+        app.state.subscribe('playback', show_play_beginning, fields=['play_beginning'])
+        app.navigation.preview = show_target
 
         def on_sura_change(e):
             """Handle surah selection change"""
-            selected_sura = sura_dropdown.value
-            # Update ayah dropdown with new range
-            aya_dropdown.options = [
-                ft.dropdown.Option(text=str(i)) 
-                for i in range(1, app.sura_map[selected_sura]['last_aya'] + 1)
-            ]
-            aya_dropdown.value = "1"
-            go_to_selection(None)
-            page.update()
+            app.record_intent('sura', sura_dropdown.value)
+            app.select_aya(sura_dropdown.value, 1)
 
         def on_aya_change(e):
             """Handle ayah selection change"""
@@ -119,16 +164,18 @@ def create_page(app, page: ft.Page):
             if not sura_dropdown.value or not aya_dropdown.value:
                 return
 
-            new_index = app.find_aya_index(sura_dropdown.value, int(aya_dropdown.value))
-            if new_index is not None:
-                app.current_index = new_index
-                update_content()
+            app.record_intent('aya', sura_dropdown.value, int(aya_dropdown.value))
+            app.select_aya(sura_dropdown.value, int(aya_dropdown.value))
 
         def prev_item(e=None):
             """Move to previous item without playing"""
-            app.current_index = (app.current_index - 1) % len(app.aya_data)
-            print(f"Moving to previous item, new index: {app.current_index}")
-            update_content()
+            app.record_intent('previous')
+            app.prev_item()
+
+        def play(e=None):
+            """Play the current aya from its start"""
+            app.record_intent('play')
+            app.play()
 
         # Store update_content method on app instance for use in callbacks
         app.update_content = update_content
@@ -154,7 +201,7 @@ def create_page(app, page: ft.Page):
                         horizontal_alignment=ft.CrossAxisAlignment.CENTER,
                     ),
                     ft.Column(
-                        [img_display],
+                        [img_display, atlas_display],
                         col={"xs": 12, "sm": 12, "md": 12, "lg": 12, "xl": 12},
                         horizontal_alignment=ft.CrossAxisAlignment.CENTER,
                     ),
@@ -170,9 +217,9 @@ def create_page(app, page: ft.Page):
                                     ft.IconButton(
                                         icon=ft.icons.PLAY_ARROW,
                                         icon_size=24,
-                                        on_click=lambda e: app.audio_player.play_current(speed=app.speed),
+                                        on_click=play,
                                     ),
-                                    ft.Switch(label="Play beginning of aya", value=False, on_change=lambda e: app.toggle_play_beginning_of_aya(e))
+                                    play_beginning_switch
                                 ],
                                 alignment=ft.MainAxisAlignment.CENTER,
                             ),
@@ -0,0 +1,264 @@
+# File: content_store.py
+import argparse
+import base64
+import hashlib
+import os
+import shutil
+import stat
+import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from typing import Dict, Iterator, Optional
+from db_functions import get_db_connection, ASSET_DIR
+
+CAS_DIR = 'cas'
+HASH_CHUNK = 1024 * 1024
+
+
+def init_content_tables(db_path: str = None) -> None:
+    """Create the blob/reference tables and the hash columns on all_aya if missing."""
+    with get_db_connection(db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS asset_blobs (
+            hash TEXT PRIMARY KEY,
+            bytes INTEGER,
+            stored_at REAL
+        );
+        ''')
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS asset_refs (
+            name TEXT PRIMARY KEY,
+            hash TEXT,
+            size INTEGER,
+            mtime REAL
+        );
+        ''')
+        columns = {row[1] for row in cursor.execute('PRAGMA table_info(all_aya)')}
+        for column in ('audio_hash', 'image_hash'):
+            if column not in columns:
+                cursor.execute(f'ALTER TABLE all_aya ADD COLUMN {column} TEXT')
+        conn.commit()
+
+
+def hash_file(path: str) -> str:
+    """SHA-1 of a file, read in chunks so large recordings don't load at once."""
+    digest = hashlib.sha1()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(HASH_CHUNK), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def blob_path(root: str, content_hash: str) -> str:
+    return os.path.join(root, content_hash[:2], content_hash[2:])
+
+
+class ContentAddressedStore:
+    """Assets stored once per distinct content under cas/ab/cdef..., looked up through asset_refs.
+
+    Blob paths carry no extension, so clients that detect the format by
+    extension can't play them: is_local is False and audio is sent inline.
+    """
+
+    is_local = False
+
+    def __init__(self, root: str = CAS_DIR, db_path: str = None):
+        self.root = root
+        with get_db_connection(db_path) as conn:
+            self.refs = dict(conn.execute('SELECT name, hash FROM asset_refs'))
+
+    def name_for(self, path: str) -> str:
+        return os.path.relpath(path, ASSET_DIR).replace(os.sep, '/')
+
+    def local_path(self, name: str) -> Optional[str]:
+        content_hash = self.refs.get(name)
+        return blob_path(self.root, content_hash) if content_hash else None
+
+    def exists(self, name: str) -> bool:
+        return name in self.refs
+
+    def read(self, name: str) -> bytes:
+        path = self.local_path(name)
+        if path is None:
+            raise FileNotFoundError(f"{name} has no content in {self.root}")
+        with open(path, 'rb') as f:
+            return f.read()
+
+    def read_base64(self, name: str) -> str:
+        return base64.b64encode(self.read(name)).decode('ascii')
+
+    def names(self) -> Iterator[str]:
+        return iter(self.refs)
+
+    def close(self) -> None:
+        pass
+
+
+def _scan_sources(source_dir: str) -> Dict[str, tuple]:
+    """Map store name -> (path, size, mtime) for every file under source_dir."""
+    sources = {}
+    for directory, _, files in os.walk(source_dir):
+        for file_name in files:
+            path = os.path.join(directory, file_name)
+            stat = os.stat(path)
+            name = os.path.relpath(path, source_dir).replace(os.sep, '/')
+            sources[name] = (path, stat.st_size, stat.st_mtime)
+    return sources
+
+
+def _hash_job(name, path, size, mtime):
+    return name, path, size, mtime, hash_file(path)
+
+
+def import_assets(source_dir: str = ASSET_DIR, root: str = CAS_DIR, db_path: str = None,
+                  workers: int = 8, link: bool = False) -> Dict:
+    """Store every file under source_dir by content and point the catalog at the hashes.
+
+    Files whose size/mtime match their last import are not rehashed. Names that
+    disappeared from source_dir lose their reference; run gc() to drop the blobs.
+    link hard-links blobs to the sources instead of copying them. A linked blob
+    shares the source's inode, so it is made read-only (the source with it) and
+    rehashed; a source that changed since it was hashed is skipped until the next import.
+    """
+    print(f"\n=== Importing {source_dir} into content store {root} ===")
+    started = time.perf_counter()
+    init_content_tables(db_path)
+    sources = _scan_sources(source_dir)
+    with get_db_connection(db_path) as conn:
+        known = {name: (size, mtime) for name, size, mtime in conn.execute('SELECT name, size, mtime FROM asset_refs')}
+        stored = set(row[0] for row in conn.execute('SELECT hash FROM asset_blobs'))
+
+    jobs = [(name, path, size, mtime) for name, (path, size, mtime) in sources.items()
+            if known.get(name) != (size, mtime)]
+    print(f"{len(jobs)} of {len(sources)} files changed since the last import")
+
+    hashed_bytes = new_blobs = new_bytes = duplicates = 0
+    with ThreadPoolExecutor(max_workers=workers) as pool, get_db_connection(db_path) as conn:
+        futures = [pool.submit(_hash_job, *job) for job in jobs]
+        for future in as_completed(futures):
+            name, path, size, mtime, content_hash = future.result()
+            hashed_bytes += size
+            if content_hash in stored:
+                duplicates += 1
+            else:
+                target = blob_path(root, content_hash)
+                os.makedirs(os.path.dirname(target), exist_ok=True)
+                if not os.path.exists(target):
+                    temp_path = f"{target}.{os.getpid()}.tmp"
+                    if link:
+                        os.link(path, temp_path)
+                        mode = stat.S_IMODE(os.stat(temp_path).st_mode)
+                        os.chmod(temp_path, mode & ~(stat.S_IWUSR | stat.S_IWGRP | stat.S_IWOTH))
+                        if hash_file(temp_path) != content_hash:
+                            os.remove(temp_path)
+                            print(f"Warning: {name} changed while importing; it is stored on the next import")
+                            continue
+                    else:
+                        shutil.copyfile(path, temp_path)
+                    os.replace(temp_path, target)
+                conn.execute('INSERT OR IGNORE INTO asset_blobs (hash, bytes, stored_at) VALUES (?, ?, ?)',
+                             (content_hash, size, time.time()))
+                stored.add(content_hash)
+                new_blobs += 1
+                new_bytes += size
+            conn.execute('INSERT OR REPLACE INTO asset_refs (name, hash, size, mtime) VALUES (?, ?, ?, ?)',
+                         (name, content_hash, size, mtime))
+
+        removed = [name for name in known if name not in sources]
+        conn.executemany('DELETE FROM asset_refs WHERE name = ?', [(name,) for name in removed])
+        conn.execute('UPDATE all_aya SET audio_hash = (SELECT hash FROM asset_refs WHERE name = all_aya.audio)')
+        conn.execute('UPDATE all_aya SET image_hash = (SELECT hash FROM asset_refs WHERE name = all_aya.image)')
+        conn.commit()
+
+    elapsed = time.perf_counter() - started
+    report = storage_report(db_path)
+    report.update({
+        'hashed_files': len(jobs),
+        'new_blobs': new_blobs,
+        'new_bytes': new_bytes,
+        'duplicates': duplicates,
+        'dropped_refs': len(removed),
+        'elapsed_s': round(elapsed, 1),
+        'hash_mb_s': round(hashed_bytes / 1024 / 1024 / elapsed, 1) if elapsed else 0.0,
+    })
+    print(f"Import complete: {new_blobs} new blobs, {duplicates} duplicates, "
+          f"{len(removed)} dropped references in {report['elapsed_s']}s ({report['hash_mb_s']} MB/s hashed)")
+    print(f"Deduplication saves {report['dedup_saved_bytes'] / 1024 / 1024:.1f} MB")
+    return report
+
+
+def gc(root: str = CAS_DIR, db_path: str = None, dry_run: bool = False) -> Dict:
+    """Delete blobs that no asset name or catalog row references any more."""
+    print(f"\n=== Collecting unreferenced blobs in {root} ===")
+    init_content_tables(db_path)
+    with get_db_connection(db_path) as conn:
+        referenced = set(row[0] for row in conn.execute('SELECT hash FROM asset_refs'))
+        referenced.update(row[0] for row in conn.execute('SELECT audio_hash FROM all_aya WHERE audio_hash IS NOT NULL'))
+        referenced.update(row[0] for row in conn.execute('SELECT image_hash FROM all_aya WHERE image_hash IS NOT NULL'))
+
+        removed = reclaimed = 0
+        for directory, _, files in os.walk(root):
+            for file_name in files:
+                if os.path.basename(directory) + file_name in referenced:
+                    continue
+                path = os.path.join(directory, file_name)
+                reclaimed += os.path.getsize(path)
+                removed += 1
+                if not dry_run:
+                    os.remove(path)
+        if not dry_run:
+            conn.execute('''
+                DELETE FROM asset_blobs WHERE hash NOT IN (
+                    SELECT hash FROM asset_refs
+                    UNION SELECT audio_hash FROM all_aya WHERE audio_hash IS NOT NULL
+                    UNION SELECT image_hash FROM all_aya WHERE image_hash IS NOT NULL
+                )
+            ''')
+            conn.commit()
+
+    action = "Would remove" if dry_run else "Removed"
+    print(f"{action} {removed} blobs, reclaiming {reclaimed / 1024 / 1024:.1f} MB")
+    return {'removed': removed, 'reclaimed_bytes': reclaimed}
+
+
+def storage_report(db_path: str = None) -> Dict:
+    """Logical bytes referenced by name vs bytes actually stored."""
+    with get_db_connection(db_path) as conn:
+        logical, names = conn.execute('SELECT COALESCE(SUM(size), 0), COUNT(*) FROM asset_refs').fetchone()
+        stored, blobs = conn.execute('SELECT COALESCE(SUM(bytes), 0), COUNT(*) FROM asset_blobs').fetchone()
+    return {
+        'names': names,
+        'blobs': blobs,
+        'logical_bytes': logical,
+        'stored_bytes': stored,
+        'dedup_saved_bytes': max(0, logical - stored),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Content-addressed, deduplicated storage for the aya assets.")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    import_parser = subparsers.add_parser('import', help="Store a directory by content")
+    import_parser.add_argument('source_dir', nargs='?', default=ASSET_DIR)
+    import_parser.add_argument('--root', default=CAS_DIR)
+    import_parser.add_argument('--workers', type=int, default=8, help="Hashing threads")
+    import_parser.add_argument('--link', action='store_true', help="Hard-link blobs instead of copying; "
+                                                                       "makes the sources read-only")
+    gc_parser = subparsers.add_parser('gc', help="Delete unreferenced blobs")
+    gc_parser.add_argument('--root', default=CAS_DIR)
+    gc_parser.add_argument('--dry-run', action='store_true')
+    subparsers.add_parser('report', help="Show logical vs stored size")
+    args = parser.parse_args()
+
+    if args.command == 'import':
+        import_assets(args.source_dir, args.root, workers=args.workers, link=args.link)
+    elif args.command == 'gc':
+        gc(args.root, dry_run=args.dry_run)
+    else:
+        init_content_tables()
+        for key, value in storage_report().items():
+            print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -5,12 +5,15 @@ import traceback
 from typing import List, Dict, Iterator
 from contextlib import contextmanager
 
+DB_PATH = 'aya.db'
+ASSET_DIR = 'q_files'
+
 @contextmanager
-def get_db_connection() -> Iterator[sqlite3.Connection]:
+def get_db_connection(db_path: str = None) -> Iterator[sqlite3.Connection]:
     """Context manager for handling database connections."""
     conn = None
     try:
-        conn = sqlite3.connect('aya.db')
+        conn = sqlite3.connect(db_path or DB_PATH)
         conn.execute("PRAGMA foreign_keys = ON")  # Enable foreign key support
         yield conn
     except Exception as e:
@@ -23,10 +26,10 @@ def get_db_connection() -> Iterator[sqlite3.Connection]:
         if conn:
             conn.close()
 
-def init_db() -> None:
+def init_db(db_path: str = None) -> None:
     """Initialize the database and create tables if they don't exist."""
     print("\n=== Initializing Database ===")
-    with get_db_connection() as conn:
+    with get_db_connection(db_path) as conn:
         try:
             cursor = conn.cursor()
             
@@ -39,7 +42,7 @@ def init_db() -> None:
             
             create_all_aya_sql = '''
             CREATE TABLE IF NOT EXISTS all_aya (
-                id INTEGER,
+                id INTEGER PRIMARY KEY,
                 audio TEXT,
                 image TEXT,
                 sura INTEGER,
@@ -76,10 +79,15 @@ def init_db() -> None:
             conn.rollback()
             raise
 
-def load_aya_data() -> List[Dict]:
-    """Load aya data from SQLite database."""
+def load_aya_data(db_path: str = None, asset_dir: str = None) -> List[Dict]:
+    """Load aya data from SQLite database.
+
+    'audio'/'image' are file paths under asset_dir; 'audio_name'/'image_name'
+    are the catalog names an asset store looks them up by.
+    """
+    asset_dir = asset_dir or ASSET_DIR
     print("\n=== Loading aya data ===")
-    with get_db_connection() as conn:
+    with get_db_connection(db_path) as conn:
         try:
             cursor = conn.cursor()
             
@@ -98,8 +106,10 @@ def load_aya_data() -> List[Dict]:
             
             result = [{
                 'id': row[0],
-                'audio': os.path.abspath(os.path.join('q_files', row[1])),
-                'image': os.path.join('q_files', row[2]),
+                'audio': os.path.abspath(os.path.join(asset_dir, row[1])),
+                'image': os.path.join(asset_dir, row[2]),
+                'audio_name': row[1],
+                'image_name': row[2],
                 'sura': row[3],
                 'aya': row[4],
                 'aya_suffix': row[5],
@@ -115,11 +125,75 @@ def load_aya_data() -> List[Dict]:
             if conn:
                 conn.close()
 
-def get_current_aya() -> int:
+def load_pause_points(db_path: str = None) -> Dict[str, tuple]:
+    """Load analyzed pause cut points (ms) per audio file, sorted by position."""
+    print("\n=== Loading pause points ===")
+    pause_points = {}
+    try:
+        with get_db_connection(db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT audio, position_ms FROM aya_pause_points ORDER BY audio, position_ms')
+            for audio, position_ms in cursor.fetchall():
+                pause_points.setdefault(audio, []).append(position_ms)
+    except sqlite3.OperationalError:
+        # Pause analysis has not been run yet; fall back to fixed fractions
+        print("No pause analysis found in database")
+        return {}
+    print(f"Loaded pause points for {len(pause_points)} files")
+    return {audio: tuple(points) for audio, points in pause_points.items()}
+
+def load_trim_offsets(db_path: str = None) -> Dict[tuple, tuple]:
+    """Load silence trim offsets (ms) keyed by (audio, segment); segment 0 is the whole file."""
+    print("\n=== Loading trim offsets ===")
+    try:
+        with get_db_connection(db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT audio, segment, trim_start_ms, trim_end_ms FROM aya_trim')
+            trim_offsets = {(row[0], row[1]): (row[2], row[3]) for row in cursor.fetchall()}
+    except sqlite3.OperationalError:
+        # Silence scan has not been run yet; play files untrimmed
+        print("No trim offsets found in database")
+        return {}
+    print(f"Loaded trim offsets for {len(trim_offsets)} segments")
+    return trim_offsets
+
+def load_image_variants(db_path: str = None) -> Dict[str, list]:
+    """Load rendered image variants as image name -> [(height, format, path, bytes)]."""
+    print("\n=== Loading image variants ===")
+    variants = {}
+    try:
+        with get_db_connection(db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT image, height, format, path, bytes FROM aya_image_variants')
+            for image, height, fmt, path, size in cursor.fetchall():
+                variants.setdefault(image, []).append((height, fmt, path, size))
+    except sqlite3.OperationalError:
+        # Variant pipeline has not been run yet; serve the source images
+        print("No image variants found in database")
+        return {}
+    print(f"Loaded image variants for {len(variants)} images")
+    return variants
+
+def load_image_atlas(db_path: str = None) -> Dict[str, tuple]:
+    """Load atlas rectangles as image name -> (atlas, x, y, width, height, atlas_width, atlas_height)."""
+    print("\n=== Loading image atlas index ===")
+    try:
+        with get_db_connection(db_path) as conn:
+            cursor = conn.cursor()
+            cursor.execute('SELECT image, atlas, x, y, width, height, atlas_width, atlas_height FROM aya_image_atlas')
+            atlas = {row[0]: row[1:] for row in cursor.fetchall()}
+    except sqlite3.OperationalError:
+        # Atlases have not been built yet; show individual images
+        print("No image atlas found in database")
+        return {}
+    print(f"Loaded atlas rectangles for {len(atlas)} images")
+    return atlas
+
+def get_current_aya(db_path: str = None) -> int:
     """Get the current aya from the database."""
     print("\n=== Getting current aya ===")
     try:
-        with get_db_connection() as conn:
+        with get_db_connection(db_path) as conn:
             cursor = conn.cursor()
 
             cursor.execute('SELECT current_aya FROM current_aya LIMIT 1')
@@ -142,11 +216,11 @@ def get_current_aya() -> int:
         if conn:
             conn.close()
 
-def get_speed() -> float:
+def get_speed(db_path: str = None) -> float:
     """Get the current speed from the database."""
     print("\n=== Getting current speed ===")
     try:
-        with get_db_connection() as conn:
+        with get_db_connection(db_path) as conn:
             cursor = conn.cursor()
 
             cursor.execute('SELECT speed FROM current_aya LIMIT 1')
@@ -169,10 +243,10 @@ def get_speed() -> float:
         if conn:
             conn.close()
 
-def update_speed(speed: float) -> None:
+def update_speed(speed: float, db_path: str = None) -> None:
     """Update the speed in the database."""
     print(f"\n=== Updating speed to {speed} ===")
-    with get_db_connection() as conn:
+    with get_db_connection(db_path) as conn:
         try:
             cursor = conn.cursor()
             
@@ -195,10 +269,10 @@ def update_speed(speed: float) -> None:
             conn.rollback()
             raise
 
-def update_current_aya(aya_id: int) -> None:
+def update_current_aya(aya_id: int, db_path: str = None) -> None:
     """Update the current aya in the database."""
     print(f"\n=== Updating current aya to {aya_id} ===")
-    with get_db_connection() as conn:
+    with get_db_connection(db_path) as conn:
         try:
             cursor = conn.cursor()
             
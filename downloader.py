@@ -0,0 +1,323 @@
+# File: downloader.py
+import argparse
+import asyncio
+import csv
+import http.client
+import os
+import random
+import shutil
+import tempfile
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import ThreadingHTTPServer, SimpleHTTPRequestHandler
+from typing import List, Dict, NamedTuple, Optional
+from urllib.parse import urlparse
+from db_functions import get_db_connection, ASSET_DIR
+from content_store import hash_file
+
+AUDIO_BASE_URL = 'https://everyayah.com/data/Menshawi_32kbps/'
+IMAGE_BASE_URL = 'https://everyayah.com/data/images_png/'
+MANIFEST_CSV = os.path.join('archive', 'data_wrangling', 'quran_download.csv')
+CONCURRENCY = 8
+REQUESTS_PER_SECOND = 10.0   # per host
+MAX_ATTEMPTS = 5
+BACKOFF_BASE_S = 0.5
+CHUNK = 64 * 1024
+TIMEOUT_S = 30
+
+
+class DownloadJob(NamedTuple):
+    url: str
+    path: str
+    sha1: Optional[str] = None
+
+
+class RetryableError(Exception):
+    pass
+
+
+def init_ledger_table(db_path: str = None) -> None:
+    """Create the download ledger table if it doesn't exist."""
+    with get_db_connection(db_path) as conn:
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS download_ledger (
+            url TEXT PRIMARY KEY,
+            path TEXT,
+            status TEXT,
+            bytes INTEGER,
+            sha1 TEXT,
+            attempts INTEGER,
+            error TEXT,
+            updated_at REAL
+        );
+        ''')
+        conn.commit()
+
+
+def jobs_from_csv(csv_path: str = MANIFEST_CSV, output_dir: str = ASSET_DIR, audio_base: str = AUDIO_BASE_URL,
+                  image_base: str = IMAGE_BASE_URL, checksums: Dict[str, str] = None) -> List[DownloadJob]:
+    """One job per distinct audio/image name in quran_download.csv."""
+    checksums = checksums or {}
+    jobs = {}
+    with open(csv_path, newline='', encoding='utf-8-sig') as f:
+        for row in csv.DictReader(f):
+            for column, base in (('audio', audio_base), ('image', image_base)):
+                name = (row.get(column) or '').strip()
+                if name and name not in jobs:
+                    jobs[name] = DownloadJob(base.rstrip('/') + '/' + name, os.path.join(output_dir, name),
+                                             checksums.get(name))
+    return list(jobs.values())
+
+
+def read_checksums(path: str) -> Dict[str, str]:
+    """Parse `sha1sum` output ("<hash>  <name>") into name -> hash."""
+    checksums = {}
+    with open(path, encoding='utf-8') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) == 2:
+                checksums[os.path.basename(parts[1].lstrip('*'))] = parts[0].lower()
+    return checksums
+
+
+class HostRateLimiter:
+    """Spaces request starts to each host at least 1/rate seconds apart."""
+
+    def __init__(self, rate: float = REQUESTS_PER_SECOND):
+        self.interval = 1.0 / rate if rate else 0.0
+        self.next_slot = {}
+        self.locks = {}
+
+    async def wait(self, url: str) -> None:
+        host = urlparse(url).netloc
+        lock = self.locks.setdefault(host, asyncio.Lock())
+        async with lock:
+            now = time.monotonic()
+            slot = max(now, self.next_slot.get(host, 0.0))
+            self.next_slot[host] = slot + self.interval
+        if slot > now:
+            await asyncio.sleep(slot - now)
+
+
+def _fetch(job: DownloadJob) -> int:
+    """Blocking download of one job into path.part, resuming a partial file with a Range request.
+
+    Returns the final size; raises RetryableError for transient failures.
+    """
+    part_path = job.path + '.part'
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    request = urllib.request.Request(job.url, headers={'Range': f'bytes={offset}-'} if offset else {})
+    try:
+        with urllib.request.urlopen(request, timeout=TIMEOUT_S) as response:
+            if offset and response.status != 206:
+                offset = 0  # server ignored the range: start over
+            if response.status == 206:
+                total = int(response.headers.get('Content-Range', '*/0').rsplit('/', 1)[1])
+            else:
+                total = int(response.headers.get('Content-Length') or -1)
+            with open(part_path, 'ab' if offset else 'wb') as out:
+                shutil.copyfileobj(response, out, CHUNK)
+    except urllib.error.HTTPError as e:
+        if e.code == 416 and offset:
+            # Already have every byte; verify below
+            total = offset
+        elif e.code in (408, 429) or e.code >= 500:
+            raise RetryableError(f"HTTP {e.code}")
+        else:
+            raise
+    except (urllib.error.URLError, http.client.HTTPException, ConnectionError, TimeoutError) as e:
+        raise RetryableError(str(e))
+
+    size = os.path.getsize(part_path)
+    if total >= 0 and size != total:
+        # Keep the partial file so the next attempt resumes after it
+        raise RetryableError(f"got {size} of {total} bytes")
+    if job.sha1 and hash_file(part_path) != job.sha1:
+        os.remove(part_path)
+        raise RetryableError("checksum mismatch")
+    os.replace(part_path, job.path)
+    return size
+
+
+async def _download_one(job: DownloadJob, semaphore: asyncio.Semaphore, limiter: HostRateLimiter,
+                        max_attempts: int, backoff_s: float) -> Dict:
+    last_error = None
+    for attempt in range(1, max_attempts + 1):
+        async with semaphore:
+            await limiter.wait(job.url)
+            try:
+                size = await asyncio.to_thread(_fetch, job)
+                return {'url': job.url, 'path': job.path, 'status': 'done', 'bytes': size,
+                        'sha1': await asyncio.to_thread(hash_file, job.path), 'attempts': attempt, 'error': None}
+            except RetryableError as e:
+                last_error = str(e)
+            except Exception as e:
+                return {'url': job.url, 'path': job.path, 'status': 'failed', 'bytes': None, 'sha1': None,
+                        'attempts': attempt, 'error': str(e)}
+        # Exponential backoff with jitter, outside the semaphore so other files keep going
+        await asyncio.sleep(backoff_s * 2 ** (attempt - 1) * random.uniform(0.5, 1.5))
+    return {'url': job.url, 'path': job.path, 'status': 'failed', 'bytes': None, 'sha1': None,
+            'attempts': max_attempts, 'error': last_error}
+
+
+async def download_all(jobs: List[DownloadJob], db_path: str = None, concurrency: int = CONCURRENCY,
+                       rate: float = REQUESTS_PER_SECOND, max_attempts: int = MAX_ATTEMPTS,
+                       backoff_s: float = BACKOFF_BASE_S) -> Dict:
+    """Download every job that the ledger doesn't already record as done and present on disk."""
+    print(f"\n=== Downloading {len(jobs)} files ===")
+    started = time.perf_counter()
+    init_ledger_table(db_path)
+    with get_db_connection(db_path) as conn:
+        done = {url: (path, size) for url, path, size in
+                conn.execute("SELECT url, path, bytes FROM download_ledger WHERE status = 'done'")}
+    todo = [job for job in jobs
+            if job.url not in done or not os.path.exists(job.path) or os.path.getsize(job.path) != done[job.url][1]]
+    print(f"{len(jobs) - len(todo)} already downloaded, {len(todo)} to fetch")
+    for job in todo:
+        os.makedirs(os.path.dirname(job.path) or '.', exist_ok=True)
+
+    semaphore = asyncio.Semaphore(concurrency)
+    limiter = HostRateLimiter(rate)
+    tasks = [asyncio.create_task(_download_one(job, semaphore, limiter, max_attempts, backoff_s)) for job in todo]
+    fetched = failed = total_bytes = retries = 0
+    with get_db_connection(db_path) as conn:
+        for completed in asyncio.as_completed(tasks):
+            result = await completed
+            conn.execute(
+                'INSERT OR REPLACE INTO download_ledger (url, path, status, bytes, sha1, attempts, error, updated_at) '
+                'VALUES (:url, :path, :status, :bytes, :sha1, :attempts, :error, :updated_at)',
+                dict(result, updated_at=time.time())
+            )
+            retries += result['attempts'] - 1
+            if result['status'] == 'done':
+                fetched += 1
+                total_bytes += result['bytes']
+            else:
+                failed += 1
+                print(f"Failed to download {result['url']}: {result['error']}")
+            if (fetched + failed) % 100 == 0:
+                conn.commit()
+                print(f"Downloaded {fetched + failed}/{len(todo)}")
+        conn.commit()
+
+    elapsed = time.perf_counter() - started
+    report = {
+        'fetched': fetched,
+        'failed': failed,
+        'skipped': len(jobs) - len(todo),
+        'retries': retries,
+        'bytes': total_bytes,
+        'elapsed_s': round(elapsed, 2),
+        'mb_s': round(total_bytes / 1024 / 1024 / elapsed, 2) if elapsed else 0.0,
+    }
+    print(f"Download complete: {fetched} fetched, {failed} failed, {retries} retries in {report['elapsed_s']}s")
+    return report
+
+
+class FlakyFileHandler(SimpleHTTPRequestHandler):
+    """Static file handler with Range support that adds latency and injects failures."""
+
+    latency_s = 0.0
+    failure_rate = 0.0
+    truncate_rate = 0.0
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        time.sleep(self.latency_s)
+        if random.random() < self.failure_rate:
+            self.send_error(503, "injected failure")
+            return
+        path = self.translate_path(self.path)
+        if not os.path.isfile(path):
+            self.send_error(404)
+            return
+        size = os.path.getsize(path)
+        start = 0
+        range_header = self.headers.get('Range')
+        if range_header:
+            start = int(range_header.split('=', 1)[1].split('-', 1)[0])
+            if start >= size:
+                self.send_error(416)
+                return
+            self.send_response(206)
+            self.send_header('Content-Range', f'bytes {start}-{size - 1}/{size}')
+        else:
+            self.send_response(200)
+        self.send_header('Content-Length', str(size - start))
+        self.end_headers()
+        with open(path, 'rb') as f:
+            f.seek(start)
+            body = f.read()
+        if random.random() < self.truncate_rate:
+            # Drop the connection part-way through so the client has to resume
+            body = body[:len(body) // 2]
+            self.close_connection = True
+        self.wfile.write(body)
+
+
+def serve_test_files(directory: str, latency_s: float = 0.02, failure_rate: float = 0.2,
+                     truncate_rate: float = 0.2) -> ThreadingHTTPServer:
+    """Start a local stand-in server for directory on a free port, in a daemon thread."""
+    handler = type('Handler', (FlakyFileHandler,), {
+        'latency_s': latency_s, 'failure_rate': failure_rate, 'truncate_rate': truncate_rate,
+        '__init__': lambda self, *args, **kwargs: FlakyFileHandler.__init__(self, *args, directory=directory, **kwargs),
+    })
+    server = ThreadingHTTPServer(('127.0.0.1', 0), handler)
+    threading.Thread(target=server.serve_forever, daemon=True).start()
+    return server
+
+
+def self_test(files: int = 60, concurrency: int = CONCURRENCY) -> Dict:
+    """Download random files from a flaky local server and check they arrive intact."""
+    with tempfile.TemporaryDirectory() as work:
+        source = os.path.join(work, 'source')
+        os.makedirs(source)
+        checksums = {}
+        for i in range(files):
+            name = f"{i + 1:06d}.mp3"
+            with open(os.path.join(source, name), 'wb') as f:
+                f.write(os.urandom(random.randint(1, 200) * 1024))
+            checksums[name] = hash_file(os.path.join(source, name))
+        server = serve_test_files(source)
+        base = f"http://127.0.0.1:{server.server_address[1]}/"
+        jobs = [DownloadJob(base + name, os.path.join(work, 'out', name), digest) for name, digest in checksums.items()]
+        db_path = os.path.join(work, 'ledger.db')
+        try:
+            report = asyncio.run(download_all(jobs, db_path, concurrency, rate=200.0, max_attempts=8, backoff_s=0.05))
+            rerun = asyncio.run(download_all(jobs, db_path, concurrency, rate=200.0))
+        finally:
+            server.shutdown()
+        intact = sum(hash_file(job.path) == job.sha1 for job in jobs if os.path.exists(job.path))
+    report.update({'intact': intact, 'rerun_fetched': rerun['fetched']})
+    print(f"Self test: {intact}/{files} intact, re-run fetched {rerun['fetched']}")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Download the aya audio and images listed in quran_download.csv.")
+    parser.add_argument('--csv', default=MANIFEST_CSV)
+    parser.add_argument('--output', default=ASSET_DIR)
+    parser.add_argument('--audio-base', default=AUDIO_BASE_URL)
+    parser.add_argument('--image-base', default=IMAGE_BASE_URL)
+    parser.add_argument('--checksums', help="sha1sum-format file to verify downloads against")
+    parser.add_argument('--concurrency', type=int, default=CONCURRENCY)
+    parser.add_argument('--rate', type=float, default=REQUESTS_PER_SECOND, help="Requests per second per host")
+    parser.add_argument('--self-test', action='store_true', help="Run against a local flaky server instead")
+    args = parser.parse_args()
+
+    if args.self_test:
+        report = self_test(concurrency=args.concurrency)
+    else:
+        checksums = read_checksums(args.checksums) if args.checksums else None
+        jobs = jobs_from_csv(args.csv, args.output, args.audio_base, args.image_base, checksums)
+        report = asyncio.run(download_all(jobs, concurrency=args.concurrency, rate=args.rate))
+    for key, value in report.items():
+        print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,310 @@
+# File: headless.py
+import argparse
+import contextlib
+import hashlib
+import heapq
+import itertools
+import json
+import os
+import time
+from typing import Callable, Dict
+
+from app import QuranApp
+from db_functions import update_current_aya
+from playback_core import PlaybackLogic
+from state import page_flush
+
+LOAD_MS = 40  # simulated time between creating a player and its loaded event
+TICK_MS = 1000  # simulated interval between position events while playing
+
+
+class VirtualClock:
+    """Simulated time in ms; scheduled callbacks run in order as the clock advances."""
+
+    def __init__(self):
+        self.now_ms = 0.0
+        self.timers = []  # (due ms, sequence, callback) heap
+        self.sequence = itertools.count()
+        self.cancelled = set()
+        self.fired = 0
+
+    def call_later(self, delay_ms: float, callback: Callable[[], None]) -> int:
+        handle = next(self.sequence)
+        heapq.heappush(self.timers, (self.now_ms + delay_ms, handle, callback))
+        return handle
+
+    def cancel(self, handle: int) -> None:
+        self.cancelled.add(handle)
+
+    def advance(self, ms: float) -> None:
+        """Move the clock forward by ms, running every callback that falls due on the way."""
+        end = self.now_ms + ms
+        while self.timers and self.timers[0][0] <= end:
+            due, handle, callback = heapq.heappop(self.timers)
+            if handle in self.cancelled:
+                self.cancelled.discard(handle)
+                continue
+            self.now_ms = due
+            self.fired += 1
+            callback()
+        self.now_ms = end
+
+
+class SimulatedEvent:
+    def __init__(self, data):
+        self.data = data
+
+
+class SimulatedAudioPlayer(PlaybackLogic):
+    """Stand-in for MainAudioPlayer that plays on a VirtualClock instead of in the client.
+
+    Fires the same on_loaded / on_position_changed / on_state_changed events
+    with the same e.data strings, so the app reacts exactly as it would to
+    the Flet player.
+    """
+
+    def __init__(self, clock: VirtualClock, duration_ms: int, initial_src=None, on_loaded=None,
+                 on_duration_changed=None, on_position_changed=None, on_state_changed=None,
+                 on_seek_complete=None, volume=1.0, balance=0, playback_rate=1.0, src_base64=None,
+                 load_ms: float = LOAD_MS, tick_ms: float = TICK_MS):
+        self.clock = clock
+        self.src = initial_src
+        self.duration_ms = duration_ms
+        self.on_loaded = on_loaded
+        self.on_position_changed = on_position_changed
+        self.on_state_changed = on_state_changed
+        self.volume = volume
+        self.playback_rate = playback_rate
+        self.tick_ms = tick_ms
+        self.position_ms = 0.0
+        self.state = 'stopped'
+        self.loaded = False
+        self.disposed = False
+        self.updates = 0
+        self.ticker = None
+        clock.call_later(load_ms, self._load)
+
+    def _load(self):
+        if self.disposed:
+            return
+        self.loaded = True
+        if self.on_loaded:
+            self.on_loaded(SimulatedEvent(None))
+
+    def _set_state(self, state):
+        self.state = state
+        if self.on_state_changed:
+            self.on_state_changed(SimulatedEvent(state))
+
+    def _schedule_tick(self):
+        self.ticker = self.clock.call_later(self.tick_ms, self._tick)
+
+    def _tick(self):
+        self.ticker = None
+        if self.disposed or self.state != 'playing':
+            return
+        self.position_ms = min(self.duration_ms, self.position_ms + self.tick_ms * self.playback_rate)
+        if self.position_ms >= self.duration_ms:
+            self._set_state('completed')
+            return
+        if self.on_position_changed:
+            self.on_position_changed(SimulatedEvent(str(int(self.position_ms))))
+        # The handler may have paused, disposed or restarted the player
+        if self.state == 'playing' and not self.disposed and self.ticker is None:
+            self._schedule_tick()
+
+    def play(self):
+        self.position_ms = 0.0
+        self.resume()
+
+    def resume(self):
+        if self.disposed or self.state == 'playing':
+            return
+        self._set_state('playing')
+        if self.ticker is None:
+            self._schedule_tick()
+
+    def pause(self):
+        if self.state == 'playing':
+            self._set_state('paused')
+
+    def seek(self, position_ms):
+        self.position_ms = float(position_ms)
+
+    def get_duration(self):
+        return self.duration_ms if self.loaded else None
+
+    def get_current_position(self):
+        return int(self.position_ms)
+
+    def update(self):
+        self.updates += 1
+
+    def _dispose(self):
+        self.disposed = True
+        if self.ticker is not None:
+            self.clock.cancel(self.ticker)
+            self.ticker = None
+
+
+class SimulatedAudioBackend:
+    """Creates SimulatedAudioPlayers; pass create_player as QuranApp's player_factory."""
+
+    def __init__(self, clock: VirtualClock, durations: Dict[str, int] = None, load_ms: float = LOAD_MS,
+                 tick_ms: float = TICK_MS):
+        self.clock = clock
+        self.durations = durations or {}  # audio file name -> ms
+        self.load_ms = load_ms
+        self.tick_ms = tick_ms
+        self.players = 0
+
+    def duration_for(self, src) -> int:
+        """Known duration, or a stable pseudo-random 3-30s derived from the file name."""
+        name = os.path.basename(src or '')
+        if name in self.durations:
+            return self.durations[name]
+        digest = hashlib.blake2b(name.encode('utf-8'), digest_size=4).digest()
+        return 3000 + int.from_bytes(digest, 'little') % 27000
+
+    def create_player(self, initial_src, **kwargs) -> SimulatedAudioPlayer:
+        self.players += 1
+        return SimulatedAudioPlayer(self.clock, self.duration_for(initial_src), initial_src, load_ms=self.load_ms,
+                                    tick_ms=self.tick_ms, **kwargs)
+
+
+class FakePage:
+    """The parts of ft.Page the app uses, counting the update round trips it would send."""
+
+    def __init__(self):
+        self.overlay = []
+        self.controls = []
+        self.loop = None
+        self.title = ''
+        self.updates = 0
+        self.controls_sent = 0
+
+    def add(self, *controls):
+        self.controls.extend(controls)
+
+    def update(self, *controls):
+        self.updates += 1
+        self.controls_sent += len(controls) or 1
+
+
+class ImmediateNavigation:
+    """NavigationScheduler without the worker thread: every intent loads at once.
+
+    Keeps simulations deterministic; bursts are not coalesced.
+    """
+
+    def __init__(self, apply: Callable[[int], None]):
+        self.apply = apply
+        self.preview = None
+        self.intents = 0
+
+    def request(self, index: int) -> None:
+        self.intents += 1
+        self.apply(index)
+
+    def step(self, delta: int, current: int, count: int) -> None:
+        self.request((current + delta) % count)
+
+    def is_stale(self) -> bool:
+        return False
+
+    def stats(self) -> Dict:
+        return {'intents': self.intents, 'loads': self.intents}
+
+
+class HeadlessSession:
+    """QuranApp driven by a fake page and simulated audio on a virtual clock.
+
+    The app's own playback logic runs unchanged: auto-advance on
+    "completed", trimmed stops, the play-beginning fade and speed changes;
+    only the client side is simulated. Time only passes in run(), so hours
+    of listening take as long as the event handling itself.
+
+    The position is kept in memory and written once when run() ends,
+    instead of a database commit per aya; persist_position=True writes it
+    on every navigation, as the app does.
+    """
+
+    def __init__(self, db_path: str = None, durations: Dict[str, int] = None, load_ms: float = LOAD_MS,
+                 tick_ms: float = TICK_MS, persist_position: bool = False):
+        self.clock = VirtualClock()
+        self.backend = SimulatedAudioBackend(self.clock, durations, load_ms, tick_ms)
+        self.position = None  # aya id navigated to and not saved yet
+        self.app = QuranApp(db_path=db_path, player_factory=self.backend.create_player, check_assets=False,
+                            save_position=None if persist_position else self.defer_position)
+        self.app.navigation = ImmediateNavigation(self.app.load_index)
+        self.page = FakePage()
+        self.page.overlay.append(self.app.audio_player)
+        self.app.state.flush = page_flush(self.page)
+        self.app.state.subscribe('navigation', self.show_aya, fields=['index'])
+        self.app.update_content = lambda: self.app.state.touch('navigation', 'index')
+        self.completed = 0
+
+    def show_aya(self, navigation, changed):
+        return [self.page] if self.app.load_aya(navigation['index'], self.page.overlay) else []
+
+    def defer_position(self, aya_id: int) -> None:
+        self.position = aya_id
+
+    def save_position(self) -> None:
+        """Write the deferred position to the database."""
+        if self.position is not None:
+            update_current_aya(self.position, self.app.db_path)
+            self.position = None
+
+    def play(self) -> None:
+        """Press play, as the page's play button does."""
+        self.app.play()
+
+    def run(self, hours: float, quiet: bool = True) -> Dict:
+        """Listen continuously for the given simulated hours and report what it cost."""
+        started_index = self.app.current_index
+        players_before = self.backend.players
+        started = time.perf_counter()
+        with open(os.devnull, 'w') as devnull, \
+                (contextlib.redirect_stdout(devnull) if quiet else contextlib.nullcontext()):
+            if not self.app.is_playing:
+                self.clock.advance(self.backend.load_ms)
+                self.play()
+            self.clock.advance(hours * 3600 * 1000)
+            self.save_position()
+        elapsed = time.perf_counter() - started
+        ayas = self.backend.players - players_before
+        return {
+            'simulated_hours': hours,
+            'wall_s': round(elapsed, 3),
+            'speedup': round(hours * 3600 / elapsed) if elapsed else None,
+            'ayas_played': ayas,
+            'ayas_per_s': round(ayas / elapsed) if elapsed else None,
+            'events': self.clock.fired,
+            'page_updates': self.page.updates,
+            'start_index': started_index,
+            'end_index': self.app.current_index,
+            'state': self.app.state.stats()['by_slice'],
+        }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Run the app headless: simulated playback on a virtual clock.")
+    parser.add_argument('--hours', type=float, default=100.0, help="Simulated listening time")
+    parser.add_argument('--db', help="Catalog database (default aya.db)")
+    parser.add_argument('--tick-ms', type=float, default=TICK_MS, help="Simulated position event interval")
+    parser.add_argument('--speed', type=float, help="Playback speed to listen at")
+    parser.add_argument('--play-beginning', action='store_true', help="Listen in play-beginning-of-aya mode")
+    args = parser.parse_args()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        session = HeadlessSession(args.db, tick_ms=args.tick_ms)
+        if args.speed:
+            session.app.update_speed(args.speed)
+        if args.play_beginning:
+            session.app.toggle_play_beginning_of_aya(None)
+    report = session.run(args.hours)
+    print(json.dumps(report, indent=1))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,15 +1,168 @@
+import argparse
+import json
+import struct
+import threading
+import time
+from typing import List, Dict, Tuple
+
 import flet as ft
 from pynput import keyboard
-import platform
-import time
+from input_bus import key_name
+
+RING_CAPACITY = 4096
+FRAME_RATE = 20  # UI refreshes per second at most, however fast events arrive
+RAW_LINES = 50
+HISTORY_LINES = 10
+
+PRESS, RELEASE = 0, 1
+KIND_NAMES = ('PRESS', 'RELEASE')
+
+# Common mappings for media keys
+KEY_MAPPINGS = {
+    'Key.media_play_pause': 'Play/Pause',
+    'Key.media_next': 'Next',
+    'Key.media_previous': 'Previous',
+    'Key.page_up': 'Page Up',
+    'Key.page_down': 'Page Down',
+    'Key.media_volume_up': 'Volume Up',
+    'Key.media_volume_down': 'Volume Down',
+}
+
+# Binary capture: header, then one record per event followed by its key name in UTF-8
+CAPTURE_MAGIC = b'HIDE'
+CAPTURE_VERSION = 1
+HEADER = struct.Struct('<4sII')  # magic, version, record count
+RECORD = struct.Struct('<QddBiiH')  # seq, monotonic, wall time, kind, vk, scan code, name length
+
+# seq, monotonic time, wall time, kind, key name, vk, scan code (-1 when unknown)
+EventRecord = Tuple[int, float, float, int, str, int, int]
+
+
+class EventRing:
+    """Fixed-capacity ring of key event records; the oldest are overwritten when full."""
+
+    def __init__(self, capacity: int = RING_CAPACITY):
+        self.capacity = capacity
+        self.slots = [None] * capacity
+        self.total = 0  # events ever appended; also the next sequence number
+        self.lock = threading.Lock()
+
+    def append(self, kind: int, name: str, vk: int = None, scan_code: int = None) -> EventRecord:
+        with self.lock:
+            record = (self.total, time.monotonic(), time.time(), kind, name,
+                      -1 if vk is None else vk, -1 if scan_code is None else scan_code)
+            self.slots[self.total % self.capacity] = record
+            self.total += 1
+            return record
+
+    def records(self, after_seq: int = -1) -> List[EventRecord]:
+        """Records still in the ring with seq > after_seq, oldest first."""
+        with self.lock:
+            first = max(self.total - self.capacity, after_seq + 1, 0)
+            return [self.slots[seq % self.capacity] for seq in range(first, self.total)]
+
+    def latest(self, count: int, kind: int = None, after_seq: int = -1) -> List[EventRecord]:
+        """Up to count newest records (optionally of one kind) with seq > after_seq, newest first."""
+        found = []
+        with self.lock:
+            seq = self.total - 1
+            oldest = max(self.total - self.capacity, after_seq + 1, 0)
+            while seq >= oldest and len(found) < count:
+                record = self.slots[seq % self.capacity]
+                if kind is None or record[3] == kind:
+                    found.append(record)
+                seq -= 1
+        return found
+
+    @property
+    def overwritten(self) -> int:
+        return max(0, self.total - self.capacity)
+
+    def __len__(self) -> int:
+        return min(self.total, self.capacity)
+
+
+def export_jsonl(records: List[EventRecord], path: str) -> int:
+    with open(path, 'w', encoding='utf-8') as f:
+        for seq, monotonic, wall, kind, name, vk, scan_code in records:
+            f.write(json.dumps({'seq': seq, 'monotonic': monotonic, 'time': wall, 'kind': KIND_NAMES[kind],
+                                'key': name, 'vk': vk, 'scan_code': scan_code}) + '\n')
+    return len(records)
+
+
+def export_binary(records: List[EventRecord], path: str) -> int:
+    """Write records in the compact capture format read back by read_binary."""
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(CAPTURE_MAGIC, CAPTURE_VERSION, len(records)))
+        for seq, monotonic, wall, kind, name, vk, scan_code in records:
+            encoded = name.encode('utf-8')
+            f.write(RECORD.pack(seq, monotonic, wall, kind, vk, scan_code, len(encoded)))
+            f.write(encoded)
+    return len(records)
+
+
+def read_binary(path: str) -> List[EventRecord]:
+    with open(path, 'rb') as f:
+        data = f.read()
+    magic, version, count = HEADER.unpack_from(data, 0)
+    if magic != CAPTURE_MAGIC or version != CAPTURE_VERSION:
+        raise ValueError(f"{path} is not a version {CAPTURE_VERSION} HID capture")
+    records = []
+    offset = HEADER.size
+    for _ in range(count):
+        seq, monotonic, wall, kind, vk, scan_code, length = RECORD.unpack_from(data, offset)
+        offset += RECORD.size
+        name = data[offset:offset + length].decode('utf-8')
+        offset += length
+        records.append((seq, monotonic, wall, kind, name, vk, scan_code))
+    return records
+
+
+def summarize(records: List[EventRecord]) -> Dict:
+    """Press counts per key and the spread of time between presses."""
+    presses = [record for record in records if record[3] == PRESS]
+    per_key = {}
+    for record in presses:
+        per_key[record[4]] = per_key.get(record[4], 0) + 1
+    gaps = sorted((b[1] - a[1]) * 1000 for a, b in zip(presses, presses[1:]))
+    report = {'events': len(records), 'presses': len(presses), 'per_key': per_key}
+    if gaps:
+        report.update({
+            'gap_min_ms': round(gaps[0], 2),
+            'gap_p50_ms': round(gaps[len(gaps) // 2], 2),
+            'gap_p95_ms': round(gaps[min(len(gaps) - 1, int(len(gaps) * 0.95))], 2),
+        })
+    return report
+
+
+def _format(record: EventRecord) -> str:
+    seq, monotonic, wall, kind, name, vk, scan_code = record
+    timestamp = time.strftime("%H:%M:%S", time.localtime(wall))
+    return (f"[{timestamp}] {KIND_NAMES[kind]}: Key: {name}, "
+            f"Virtual Key: {vk if vk >= 0 else None}, Scan Code: {scan_code if scan_code >= 0 else None}")
+
 
 class KeyboardInputHandler:
-    def __init__(self, page: ft.Page):
+    """Monitor for ring/keyboard events.
+
+    The listener thread only appends to a ring buffer; a refresh thread
+    redraws the bounded views at most FRAME_RATE times a second, so rapid
+    input costs one page update per frame instead of one per event.
+    """
+
+    def __init__(self, page: ft.Page, capacity: int = RING_CAPACITY, frame_rate: int = FRAME_RATE):
         self.page = page
         self.page.title = "Bluetooth Ring Input Handler"
-        self.raw_events = []
+        self.ring = EventRing(capacity)
+        self.frame_s = 1 / frame_rate
+        self.raw_cleared_seq = -1
+        self.history_cleared_seq = -1
+        self.shown_seq = -1  # newest event on screen
+        self.redraw = threading.Event()
+        self.frames = 0
         self.setup_ui()
         self.setup_keyboard_listener()
+        threading.Thread(target=self.refresh_loop, daemon=True).start()
 
     def setup_ui(self):
         # Raw HID event display
@@ -32,22 +185,36 @@ class KeyboardInputHandler:
             padding=20,
             height=200
         )
-        
+        self.capture_text = ft.Text("", size=12)
+
         # Clear buttons
         self.clear_history_btn = ft.ElevatedButton(
             "Clear History",
             on_click=self.clear_history
         )
-        
+
         self.clear_raw_btn = ft.ElevatedButton(
             "Clear Raw Events",
             on_click=self.clear_raw_events
         )
 
+        # Export buttons
+        self.export_jsonl_btn = ft.ElevatedButton(
+            "Export JSONL",
+            on_click=lambda e: self.export('jsonl')
+        )
+
+        self.export_binary_btn = ft.ElevatedButton(
+            "Export Binary",
+            on_click=lambda e: self.export('bin')
+        )
+
         # Button row
         button_row = ft.Row([
             self.clear_history_btn,
-            self.clear_raw_btn
+            self.clear_raw_btn,
+            self.export_jsonl_btn,
+            self.export_binary_btn
         ])
 
         # Main layout
@@ -67,7 +234,8 @@ class KeyboardInputHandler:
                     border_radius=10,
                     padding=10
                 ),
-                button_row
+                button_row,
+                self.capture_text
             ])
         )
 
@@ -78,94 +246,85 @@ class KeyboardInputHandler:
         )
         self.keyboard_listener.start()
 
-    def on_key_press(self, key):
+    def record(self, kind, key):
         try:
-            # Get timestamp
-            timestamp = time.strftime("%H:%M:%S", time.localtime())
-            
-            # Get detailed key information
-            key_str = str(key)
-            vk = getattr(key, 'vk', None)
-            scan_code = getattr(key, 'scan_code', None)
-            
-            # Create detailed event string
-            event_details = (
-                f"[{timestamp}] PRESS: "
-                f"Key: {key_str}, "
-                f"Virtual Key: {vk}, "
-                f"Scan Code: {scan_code}\n"
-            )
-            
-            # Update raw events text field
-            current_text = self.raw_event_text.value
-            self.raw_event_text.value = event_details + current_text
-            
-            # Common mappings for media keys
-            key_mappings = {
-                'Key.media_play_pause': 'Play/Pause',
-                'Key.media_next': 'Next',
-                'Key.media_previous': 'Previous',
-                'Key.page_up': 'Page Up',
-                'Key.page_down': 'Page Down',
-                'Key.volume_up': 'Volume Up',
-                'Key.volume_down': 'Volume Down'
-            }
-            
-            # Get friendly name if available
-            event_name = key_mappings.get(key_str, key_str)
-            
-            # Add event to list
-            self.event_list.controls.insert(
-                0,
-                ft.Text(f"[{timestamp}] Pressed: {event_name}")
-            )
-            
-            # Update the current event text
-            self.event_text.value = f"Last Input: {event_name}"
-            
-            # Keep only last 10 events in the list
-            if len(self.event_list.controls) > 10:
-                self.event_list.controls.pop()
-            
-            # Update the UI
-            self.page.update()
-            
+            self.ring.append(kind, key_name(key), getattr(key, 'vk', None), getattr(key, 'scan_code', None))
+            self.redraw.set()
         except Exception as e:
             print(f"Error processing key event: {e}")
 
+    def on_key_press(self, key):
+        self.record(PRESS, key)
+
     def on_key_release(self, key):
-        try:
-            timestamp = time.strftime("%H:%M:%S", time.localtime())
-            key_str = str(key)
-            vk = getattr(key, 'vk', None)
-            scan_code = getattr(key, 'scan_code', None)
-            
-            event_details = (
-                f"[{timestamp}] RELEASE: "
-                f"Key: {key_str}, "
-                f"Virtual Key: {vk}, "
-                f"Scan Code: {scan_code}\n"
-            )
-            
-            current_text = self.raw_event_text.value
-            self.raw_event_text.value = event_details + current_text
-            self.page.update()
-            
-        except Exception as e:
-            print(f"Error processing key release event: {e}")
+        self.record(RELEASE, key)
 
-    def clear_history(self, e):
-        self.event_list.controls.clear()
-        self.event_text.value = "Waiting for input..."
+    def refresh_loop(self):
+        """Redraw at most once per frame, and only when something changed."""
+        while True:
+            self.redraw.wait()
+            started = time.monotonic()
+            self.redraw.clear()
+            try:
+                self.render()
+            except Exception as e:
+                print(f"Error refreshing the event views: {e}")
+            time.sleep(max(0.0, self.frame_s - (time.monotonic() - started)))
+
+    def render(self):
+        raw = self.ring.latest(RAW_LINES, after_seq=self.raw_cleared_seq)
+        self.raw_event_text.value = ''.join(_format(record) + '\n' for record in raw) or "Waiting for HID events...\n"
+
+        history = self.ring.latest(HISTORY_LINES, PRESS, after_seq=self.history_cleared_seq)
+        self.event_list.controls = [
+            ft.Text(f"[{time.strftime('%H:%M:%S', time.localtime(record[2]))}] Pressed: "
+                    f"{KEY_MAPPINGS.get(record[4], record[4])}")
+            for record in history
+        ]
+        self.event_text.value = (f"Last Input: {KEY_MAPPINGS.get(history[0][4], history[0][4])}"
+                                 if history else "Waiting for input...")
+        self.capture_text.value = (f"{self.ring.total} events captured, {len(self.ring)} buffered, "
+                                   f"{self.ring.overwritten} overwritten, {self.frames + 1} redraws")
+        self.frames += 1
         self.page.update()
 
-    def clear_raw_events(self, e):
-        self.raw_event_text.value = "Waiting for HID events...\n"
+    def export(self, fmt):
+        """Write every buffered event to hid_events_<time>.<fmt> for offline analysis."""
+        path = time.strftime(f"hid_events_%Y%m%d-%H%M%S.{fmt}")
+        records = self.ring.records()
+        count = export_jsonl(records, path) if fmt == 'jsonl' else export_binary(records, path)
+        self.capture_text.value = f"Exported {count} events to {path}"
         self.page.update()
 
+    def clear_history(self, e):
+        self.history_cleared_seq = self.ring.total - 1
+        self.redraw.set()
+
+    def clear_raw_events(self, e):
+        self.raw_cleared_seq = self.ring.total - 1
+        self.redraw.set()
+
 async def main(page: ft.Page):
     app = KeyboardInputHandler(page)
 
+
+def cli():
+    parser = argparse.ArgumentParser(description="Monitor ring/keyboard input, or summarize an exported capture.")
+    parser.add_argument('--read', metavar='CAPTURE', help="Summarize a .bin or .jsonl capture instead of monitoring")
+    args = parser.parse_args()
+    if not args.read:
+        ft.app(target=main, view=ft.AppView.FLET_APP)
+        return
+    if args.read.endswith('.jsonl'):
+        with open(args.read, encoding='utf-8') as f:
+            rows = [json.loads(line) for line in f]
+        records = [(row['seq'], row['monotonic'], row['time'], KIND_NAMES.index(row['kind']), row['key'],
+                    row['vk'], row['scan_code']) for row in rows]
+    else:
+        records = read_binary(args.read)
+    for key, value in summarize(records).items():
+        print(f"{key}: {value}")
+
 # Run the application
 if __name__ == "__main__":
-    ft.app(target=main, view=ft.AppView.FLET_APP)
\ No newline at end of file
+    cli()
@@ -0,0 +1,177 @@
+# File: image_atlas.py
+import argparse
+import hashlib
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Dict
+from PIL import Image
+from db_functions import get_db_connection, load_aya_data
+from image_variants import file_hash
+
+ATLAS_DIR = os.path.join('q_files', 'atlas')
+ATLAS_MAX_WIDTH = 4096
+ATLAS_MAX_HEIGHT = 8192
+ATLAS_PADDING = 2
+ATLAS_IMAGE_HEIGHT = 300   # aya images are scaled to the display height before packing
+
+
+def init_atlas_tables(db_path: str = None) -> None:
+    """Create the atlas index tables if they don't exist."""
+    with get_db_connection(db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS aya_image_atlas (
+            image TEXT PRIMARY KEY,
+            sura INTEGER,
+            atlas TEXT,
+            x INTEGER,
+            y INTEGER,
+            width INTEGER,
+            height INTEGER,
+            atlas_width INTEGER,
+            atlas_height INTEGER
+        );
+        ''')
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS aya_atlas_builds (
+            sura INTEGER PRIMARY KEY,
+            sources_hash TEXT,
+            built_at REAL
+        );
+        ''')
+        conn.commit()
+
+
+def shelf_pack(sizes: List[tuple], max_width: int = ATLAS_MAX_WIDTH, max_height: int = ATLAS_MAX_HEIGHT,
+               padding: int = ATLAS_PADDING) -> List[tuple]:
+    """Place (width, height) boxes on shelves; returns (page, x, y) per box in input order."""
+    order = sorted(range(len(sizes)), key=lambda i: sizes[i][1], reverse=True)
+    placements = [None] * len(sizes)
+    page = x = y = shelf_height = 0
+    for i in order:
+        width, height = sizes[i]
+        if x and x + width > max_width:
+            x, y, shelf_height = 0, y + shelf_height + padding, 0
+        if y and y + height > max_height:
+            page, x, y, shelf_height = page + 1, 0, 0, 0
+        placements[i] = (page, x, y)
+        x += width + padding
+        shelf_height = max(shelf_height, height)
+    return placements
+
+
+def build_sura_atlas(sura: int, image_paths: List[str], output_dir: str = ATLAS_DIR,
+                     image_height: int = ATLAS_IMAGE_HEIGHT) -> List[Dict]:
+    """Pack one sura's aya images into atlas pages and return the rectangle index."""
+    images = []
+    for path in image_paths:
+        with Image.open(path) as source:
+            source = source.convert('RGBA')
+            if image_height and source.size[1] != image_height:
+                width = max(1, round(source.size[0] * image_height / source.size[1]))
+                source = source.resize((width, image_height), Image.LANCZOS)
+            images.append(source)
+
+    placements = shelf_pack([image.size for image in images])
+    pages = {}
+    for image, (page, x, y) in zip(images, placements):
+        width, height = pages.get(page, (0, 0))
+        pages[page] = (max(width, x + image.size[0]), max(height, y + image.size[1]))
+
+    canvases = {page: Image.new('RGBA', size, (255, 255, 255, 0)) for page, size in pages.items()}
+    for image, (page, x, y) in zip(images, placements):
+        canvases[page].paste(image, (x, y))
+
+    atlas_paths = {}
+    for page, canvas in canvases.items():
+        atlas_paths[page] = os.path.join(output_dir, f"sura_{sura:03d}_{page}.png")
+        canvas.save(atlas_paths[page], format='PNG', optimize=True)
+
+    return [{
+        'image': os.path.basename(path),
+        'sura': sura,
+        'atlas': atlas_paths[page],
+        'x': x,
+        'y': y,
+        'width': image.size[0],
+        'height': image.size[1],
+        'atlas_width': pages[page][0],
+        'atlas_height': pages[page][1],
+    } for path, image, (page, x, y) in zip(image_paths, images, placements)]
+
+
+def _atlas_job(job):
+    sura, paths, sources_hash, output_dir, image_height = job
+    try:
+        return sura, sources_hash, build_sura_atlas(sura, paths, output_dir, image_height), None
+    except Exception:
+        return sura, sources_hash, None, traceback.format_exc()
+
+
+def build_atlases(db_path: str = None, output_dir: str = ATLAS_DIR, image_height: int = ATLAS_IMAGE_HEIGHT,
+                  workers: int = None, force: bool = False) -> Dict:
+    """Build atlases for every sura whose images changed since the last run, in parallel."""
+    print("\n=== Building sura image atlases ===")
+    started = time.perf_counter()
+    init_atlas_tables(db_path)
+    os.makedirs(output_dir, exist_ok=True)
+
+    suras = {}
+    for item in load_aya_data(db_path):
+        paths = suras.setdefault(item['sura'], [])
+        if item['image'] not in paths:
+            paths.append(item['image'])
+
+    with get_db_connection(db_path) as conn:
+        built = {row[0]: row[1] for row in conn.execute('SELECT sura, sources_hash FROM aya_atlas_builds')}
+
+    jobs = []
+    for sura, paths in suras.items():
+        digest = hashlib.sha1(f"{image_height}".encode('utf-8'))
+        for path in paths:
+            digest.update(file_hash(path).encode('ascii'))
+        sources_hash = digest.hexdigest()
+        if force or built.get(sura) != sources_hash:
+            jobs.append((sura, paths, sources_hash, output_dir, image_height))
+    print(f"{len(jobs)} of {len(suras)} suras need atlases")
+
+    done = failed = pages = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool, get_db_connection(db_path) as conn:
+        futures = [pool.submit(_atlas_job, job) for job in jobs]
+        for future in as_completed(futures):
+            sura, sources_hash, rows, error = future.result()
+            if error:
+                failed += 1
+                print(f"Error building atlas for sura {sura}: {error}")
+                continue
+            conn.execute('DELETE FROM aya_image_atlas WHERE sura = ?', (sura,))
+            conn.executemany(
+                'INSERT OR REPLACE INTO aya_image_atlas (image, sura, atlas, x, y, width, height, atlas_width, atlas_height) '
+                'VALUES (:image, :sura, :atlas, :x, :y, :width, :height, :atlas_width, :atlas_height)',
+                rows
+            )
+            conn.execute('INSERT OR REPLACE INTO aya_atlas_builds (sura, sources_hash, built_at) VALUES (?, ?, ?)',
+                         (sura, sources_hash, time.time()))
+            conn.commit()
+            done += 1
+            pages += len({row['atlas'] for row in rows})
+
+    elapsed = time.perf_counter() - started
+    print(f"Atlas build complete: {done} suras ({pages} atlas files), {failed} failed in {elapsed:.1f}s")
+    return {'suras': done, 'atlas_files': pages, 'failed': failed, 'elapsed_s': elapsed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Pack each sura's aya images into atlas images.")
+    parser.add_argument('--height', type=int, default=ATLAS_IMAGE_HEIGHT, help="Aya image height inside the atlas (0 keeps source size)")
+    parser.add_argument('--output', default=ATLAS_DIR)
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument('--force', action='store_true', help="Rebuild every sura")
+    args = parser.parse_args()
+    build_atlases(output_dir=args.output, image_height=args.height, workers=args.workers, force=args.force)
+
+
+if __name__ == "__main__":
+    main()
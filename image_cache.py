@@ -0,0 +1,198 @@
+# File: image_cache.py
+import argparse
+import base64
+import contextlib
+import os
+import queue
+import threading
+import time
+from collections import OrderedDict
+from typing import List, Dict, Optional, Callable
+
+CACHE_MAX_BYTES = 32 * 1024 * 1024
+PREFETCH_RADIUS = 3
+
+
+class ImageCache:
+    """LRU of base64-encoded aya images under a byte budget, filled ahead of navigation.
+
+    Images are stored already encoded so the page can hand them to Image.src_base64
+    without touching the disk or re-encoding on the navigation path.
+    """
+
+    def __init__(self, max_bytes: int = CACHE_MAX_BYTES, prefetch_radius: int = PREFETCH_RADIUS,
+                 reader: Callable[[str], bytes] = None):
+        self.max_bytes = max_bytes
+        self.reader = reader  # path -> bytes, e.g. from an asset pack; defaults to reading the file
+        self.prefetch_radius = prefetch_radius
+        self.entries = OrderedDict()  # path -> base64 text, least recently used first
+        self.total_bytes = 0
+        self.lock = threading.Lock()
+        self.queue = queue.Queue()
+        self.worker = None
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.prefetched = 0
+
+    def _load(self, path: str) -> str:
+        if self.reader:
+            return base64.b64encode(self.reader(path)).decode('ascii')
+        with open(path, 'rb') as f:
+            return base64.b64encode(f.read()).decode('ascii')
+
+    def _store(self, path: str, encoded: str) -> None:
+        with self.lock:
+            if path in self.entries:
+                return
+            self.entries[path] = encoded
+            self.total_bytes += len(encoded)
+            while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+                _, evicted = self.entries.popitem(last=False)
+                self.total_bytes -= len(evicted)
+                self.evictions += 1
+
+    def get_base64(self, path: str) -> str:
+        """Return the image as base64, loading it synchronously on a miss."""
+        with self.lock:
+            encoded = self.entries.get(path)
+            if encoded is not None:
+                self.entries.move_to_end(path)
+                self.hits += 1
+                return encoded
+            self.misses += 1
+        encoded = self._load(path)
+        self._store(path, encoded)
+        return encoded
+
+    def invalidate(self, paths: List[str]) -> None:
+        """Drop entries whose files changed on disk."""
+        with self.lock:
+            for path in paths:
+                encoded = self.entries.pop(path, None)
+                if encoded is not None:
+                    self.total_bytes -= len(encoded)
+
+    def prefetch(self, paths: List[str], replace: bool = False) -> None:
+        """Queue images to be loaded by the background thread.
+
+        replace drops what is still queued first, e.g. neighbours of an aya
+        that was skipped past.
+        """
+        if replace:
+            while True:
+                try:
+                    self.queue.get_nowait()
+                except queue.Empty:
+                    break
+                self.queue.task_done()
+        if self.worker is None:
+            self.worker = threading.Thread(target=self._prefetch_worker, daemon=True)
+            self.worker.start()
+        for path in paths:
+            self.queue.put(path)
+
+    def prefetch_around(self, aya_data: List[Dict], index: int, resolve: Callable = None) -> None:
+        """Prefetch the neighbouring ayas, next ones first.
+
+        resolve maps an aya to the image path actually displayed (e.g. a resized variant).
+        """
+        paths = []
+        for offset in range(1, self.prefetch_radius + 1):
+            for neighbour in (index + offset, index - offset):
+                item = aya_data[neighbour % len(aya_data)]
+                path = resolve(item) if resolve else item['image']
+                if path not in paths:
+                    paths.append(path)
+        with self.lock:
+            missing = [path for path in paths if path not in self.entries]
+        self.prefetch(missing, replace=True)
+
+    def _prefetch_worker(self) -> None:
+        while True:
+            path = self.queue.get()
+            with self.lock:
+                cached = path in self.entries
+            if not cached:
+                try:
+                    self._store(path, self._load(path))
+                    self.prefetched += 1
+                except OSError as e:
+                    print(f"Error prefetching image {path}: {e}")
+            self.queue.task_done()
+
+    def stats(self) -> Dict:
+        with self.lock:
+            lookups = self.hits + self.misses
+            return {
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'prefetched': self.prefetched,
+                'entries': len(self.entries),
+                'bytes': self.total_bytes,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+
+def benchmark_navigation(db_path: str = None, steps: int = 200, start: int = 0,
+                         cache: Optional[ImageCache] = None) -> Dict:
+    """Time forward navigation steps with the image cache on and off.
+
+    Both arms run the same path as the page's show_aya on a headless app:
+    the aya load (DB write, player swap, state flush) and the image step.
+    With the cache off the page only sets the file path and the client
+    fetches the file, which is stood in for by reading it; with the cache
+    on the image comes inline from memory and neighbours are prefetched.
+    """
+    from headless import HeadlessSession
+    report = {}
+    cache = cache or ImageCache()
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        session = HeadlessSession(db_path)
+        app = session.app
+        for arm, image_cache in (('off', None), ('on', cache)):
+            app.image_cache = image_cache
+            app.go_to_index(start % len(app.aya_data))
+            session.clock.advance(session.backend.load_ms)
+            timings = []
+            for _ in range(steps):
+                started = time.perf_counter()
+                app.next_item()
+                src, _ = app.image_payload(app.current_index)
+                if src:
+                    with open(src, 'rb') as f:
+                        f.read()
+                timings.append(time.perf_counter() - started)
+                # Let the player load and the prefetcher run in the time a user spends on an aya
+                session.clock.advance(session.backend.load_ms)
+                if image_cache:
+                    image_cache.queue.join()
+            report[arm] = _summarize(timings)
+    report['cache'] = cache.stats()
+    return report
+
+
+def _summarize(timings: List[float]) -> Dict:
+    ordered = sorted(t * 1000 for t in timings)
+    return {
+        'mean_ms': round(sum(ordered) / len(ordered), 4),
+        'p50_ms': round(ordered[len(ordered) // 2], 4),
+        'p95_ms': round(ordered[int(len(ordered) * 0.95) - 1], 4),
+        'max_ms': round(ordered[-1], 4),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark aya navigation with the image cache on and off.")
+    parser.add_argument('--steps', type=int, default=200)
+    parser.add_argument('--start', type=int, default=0)
+    parser.add_argument('--db', help="Catalog database (default aya.db)")
+    args = parser.parse_args()
+    report = benchmark_navigation(args.db, args.steps, args.start)
+    for key, value in report.items():
+        print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,188 @@
+# File: image_variants.py
+import argparse
+import hashlib
+import os
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import Dict
+from PIL import Image
+from db_functions import get_db_connection, load_aya_data
+from asset_scan import catalog_files
+
+VARIANT_HEIGHTS = (0, 150, 300, 600)   # 0 keeps the source size, only recompressed
+VARIANT_FORMATS = ('png', 'webp')
+VARIANTS_DIR = os.path.join('q_files', 'variants')
+WEBP_QUALITY = 90
+
+
+def init_variant_tables(db_path: str = None) -> None:
+    """Create the image variant tables if they don't exist."""
+    with get_db_connection(db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS aya_image_sources (
+            image TEXT PRIMARY KEY,
+            source_hash TEXT,
+            width INTEGER,
+            height INTEGER,
+            bytes INTEGER
+        );
+        ''')
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS aya_image_variants (
+            image TEXT,
+            height INTEGER,
+            format TEXT,
+            path TEXT,
+            width INTEGER,
+            bytes INTEGER,
+            source_hash TEXT,
+            PRIMARY KEY (image, height, format)
+        );
+        ''')
+        conn.commit()
+
+
+def file_hash(path: str) -> str:
+    with open(path, 'rb') as f:
+        return hashlib.sha1(f.read()).hexdigest()
+
+
+def render_variants(path: str, output_dir: str = VARIANTS_DIR, heights=VARIANT_HEIGHTS,
+                    formats=VARIANT_FORMATS) -> Dict:
+    """Write resized/recompressed variants of one image and describe them."""
+    name = os.path.basename(path)
+    stem = os.path.splitext(name)[0]
+    source_bytes = os.path.getsize(path)
+    variants = []
+    with Image.open(path) as source:
+        source.load()
+        width, height = source.size
+        for target in heights:
+            # Never upscale: the full-size variant already covers larger displays
+            if target and target >= height:
+                continue
+            if target:
+                size = (max(1, round(width * target / height)), target)
+                image = source.resize(size, Image.LANCZOS)
+            else:
+                image = source
+            for fmt in formats:
+                out_path = os.path.join(output_dir, f"{stem}_h{target or height}.{fmt}")
+                if fmt == 'png':
+                    image.save(out_path, format='PNG', optimize=True)
+                else:
+                    image.save(out_path, format='WEBP', quality=WEBP_QUALITY, method=6)
+                variants.append({
+                    'height': target or height,
+                    'format': fmt,
+                    'path': out_path,
+                    'width': image.size[0],
+                    'bytes': os.path.getsize(out_path),
+                })
+    return {'image': name, 'width': width, 'height': height, 'bytes': source_bytes, 'variants': variants}
+
+
+def _render_job(job):
+    path, source_hash, output_dir = job
+    try:
+        result = render_variants(path, output_dir)
+        result['source_hash'] = source_hash
+        return result, None
+    except Exception as e:
+        return None, f"{path}: {e}"
+
+
+def build_variants(db_path: str = None, output_dir: str = VARIANTS_DIR, workers: int = None,
+                   force: bool = False) -> Dict:
+    """Render variants for every catalog image whose content changed since the last run."""
+    print("\n=== Building image variants ===")
+    started = time.perf_counter()
+    init_variant_tables(db_path)
+    os.makedirs(output_dir, exist_ok=True)
+    images = catalog_files(load_aya_data(db_path), key='image')
+
+    with get_db_connection(db_path) as conn:
+        known = {row[0]: row[1] for row in conn.execute('SELECT image, source_hash FROM aya_image_sources')}
+
+    jobs = []
+    for name, path in images.items():
+        if not os.path.exists(path):
+            print(f"Warning: Image file {path} not found")
+            continue
+        source_hash = file_hash(path)
+        if force or known.get(name) != source_hash:
+            jobs.append((path, source_hash, output_dir))
+    print(f"{len(jobs)} of {len(images)} images need variants")
+
+    done = failed = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool, get_db_connection(db_path) as conn:
+        futures = [pool.submit(_render_job, job) for job in jobs]
+        for future in as_completed(futures):
+            result, error = future.result()
+            if error:
+                failed += 1
+                print(f"Error rendering variants for {error}")
+                continue
+            image = result['image']
+            conn.execute('DELETE FROM aya_image_variants WHERE image = ?', (image,))
+            conn.executemany(
+                'INSERT INTO aya_image_variants (image, height, format, path, width, bytes, source_hash) VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [(image, v['height'], v['format'], v['path'], v['width'], v['bytes'], result['source_hash'])
+                 for v in result['variants']]
+            )
+            conn.execute(
+                'INSERT OR REPLACE INTO aya_image_sources (image, source_hash, width, height, bytes) VALUES (?, ?, ?, ?, ?)',
+                (image, result['source_hash'], result['width'], result['height'], result['bytes'])
+            )
+            done += 1
+            if done % 500 == 0:
+                conn.commit()
+                print(f"Rendered {done}/{len(jobs)} images")
+        conn.commit()
+
+    report = savings_report(db_path)
+    report.update({'rendered': done, 'failed': failed, 'elapsed_s': round(time.perf_counter() - started, 1)})
+    print(f"Image variants complete: {done} rendered, {failed} failed in {report['elapsed_s']}s")
+    for height, saved in report['saved_by_height'].items():
+        print(f"  smallest variant at {height}px saves {saved / 1024 / 1024:.1f} MB")
+    return report
+
+
+def savings_report(db_path: str = None) -> Dict:
+    """Bytes saved per display height when serving the smallest fitting variant instead of the source."""
+    with get_db_connection(db_path) as conn:
+        source_total = conn.execute('SELECT COALESCE(SUM(bytes), 0) FROM aya_image_sources').fetchone()[0]
+        rows = conn.execute('''
+            SELECT s.image, s.bytes, v.height, v.bytes
+            FROM aya_image_sources s JOIN aya_image_variants v ON v.image = s.image
+        ''').fetchall()
+    by_image = {}
+    for image, source_bytes, height, variant_bytes in rows:
+        by_image.setdefault(image, (source_bytes, []))[1].append((height, variant_bytes))
+
+    saved = {height: 0 for height in VARIANT_HEIGHTS if height}
+    for source_bytes, variants in by_image.values():
+        for display_height in saved:
+            fitting = [variant_bytes for height, variant_bytes in variants if height >= display_height]
+            if fitting:
+                saved[display_height] += source_bytes - min(fitting)
+    return {'source_bytes': source_total, 'saved_by_height': saved}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render resized and recompressed variants of every aya image.")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument('--output', default=VARIANTS_DIR)
+    parser.add_argument('--force', action='store_true', help="Re-render every image")
+    args = parser.parse_args()
+    try:
+        build_variants(output_dir=args.output, workers=args.workers, force=args.force)
+    except Exception:
+        print(traceback.format_exc())
+        raise
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,193 @@
+# File: input_bus.py
+import argparse
+import json
+import os
+import queue
+import threading
+import time
+from collections import deque, Counter
+from typing import Callable, Dict
+
+KEYMAP_PATH = 'keymap.json'
+QUEUE_CAPACITY = 64
+LATENCY_SAMPLES = 1000
+
+# Key name -> command; the media keys are what the Bluetooth ring sends
+DEFAULT_KEYMAP = {
+    'Key.right': 'next',
+    'Key.left': 'previous',
+    'Key.media_next': 'next',
+    'Key.media_previous': 'previous',
+    'Key.media_play_pause': 'toggle_play',
+    'Key.page_down': 'next',
+    'Key.page_up': 'previous',
+    'Key.media_volume_up': 'volume_up',
+    'Key.media_volume_down': 'volume_down',
+}
+
+
+def key_name(key) -> str:
+    """Stable name for a pynput key: 'Key.media_next', a character, or 'vk:<code>'."""
+    name = getattr(key, 'name', None)
+    if name:
+        return f"Key.{name}"
+    char = getattr(key, 'char', None)
+    if char:
+        return char
+    return f"vk:{getattr(key, 'vk', None)}"
+
+
+def load_keymap(path: str = KEYMAP_PATH) -> Dict[str, str]:
+    """DEFAULT_KEYMAP with the overrides from a JSON {key name: command} file, if there is one.
+
+    A command of null unmaps the key.
+    """
+    keymap = dict(DEFAULT_KEYMAP)
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as f:
+            for key, command in json.load(f).items():
+                if command is None:
+                    keymap.pop(key, None)
+                else:
+                    keymap[key] = command
+    return keymap
+
+
+def _percentile(ordered, fraction):
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))], 3)
+
+
+class InputBus:
+    """Carries key events from the listener thread to commands run on the app's event loop.
+
+    The listener only names the key and puts it on a bounded queue; one
+    drain is scheduled per batch with dispatch (e.g. the page loop's
+    call_soon_threadsafe), so commands never run on the listener thread
+    and never race with Flet's handlers. When the queue is full, as with
+    a stuck key, new events are dropped and counted rather than stalling
+    the listener.
+    """
+
+    def __init__(self, commands: Dict[str, Callable[[], None]], keymap: Dict[str, str] = None,
+                 capacity: int = QUEUE_CAPACITY, dispatch: Callable[[Callable], None] = None):
+        self.commands = commands
+        self.keymap = keymap if keymap is not None else load_keymap()
+        self.dispatch = dispatch  # runs a callable on the app's loop; None drains on the caller's thread
+        self.queue = queue.Queue(maxsize=capacity)
+        self.drain_scheduled = False
+        self.lock = threading.Lock()
+        self.listener = None
+        self.tracer = None  # LatencyTracer while key-to-audio latency is traced
+        self.recorder = None  # IntentRecorder while intents are recorded for replay
+        self.events = 0
+        self.dropped = 0
+        self.unmapped = 0
+        self.errors = 0
+        self.actions = Counter()
+        self.latencies = deque(maxlen=LATENCY_SAMPLES)  # seconds from key press to command done
+        unknown = sorted(set(self.keymap.values()) - set(commands))
+        if unknown:
+            print(f"Warning: keymap uses unknown commands: {', '.join(unknown)}")
+
+    def push(self, name: str, pressed_at: float = None) -> None:
+        """Queue a key event; safe to call from any thread."""
+        if self.recorder:
+            self.recorder.record('key', name)
+        try:
+            self.queue.put_nowait((name, pressed_at if pressed_at is not None else time.perf_counter()))
+        except queue.Full:
+            with self.lock:
+                self.dropped += 1
+            return
+        with self.lock:
+            self.events += 1
+            if self.drain_scheduled:
+                return
+            self.drain_scheduled = True
+        if self.dispatch:
+            self.dispatch(self.drain)
+        else:
+            self.drain()
+
+    def drain(self) -> None:
+        """Run the commands for every queued event, in order."""
+        with self.lock:
+            self.drain_scheduled = False
+        while True:
+            try:
+                name, pressed_at = self.queue.get_nowait()
+            except queue.Empty:
+                return
+            command = self.keymap.get(name)
+            if command not in self.commands:
+                with self.lock:
+                    self.unmapped += 1
+                continue
+            if self.tracer:
+                self.tracer.begin(command, pressed_at)
+                self.tracer.mark('dispatch')
+            try:
+                self.commands[command]()
+            except Exception as e:
+                print(f"Error running input command {command}: {e}")
+                with self.lock:
+                    self.errors += 1
+                continue
+            with self.lock:
+                self.actions[command] += 1
+                self.latencies.append(time.perf_counter() - pressed_at)
+
+    def start_listener(self) -> None:
+        """Listen to the keyboard (and HID rings that present as one) on pynput's thread."""
+        from pynput import keyboard
+        if self.listener:
+            return
+        self.listener = keyboard.Listener(on_press=lambda key: self.push(key_name(key)))
+        self.listener.start()
+
+    def stop_listener(self) -> None:
+        if self.listener:
+            self.listener.stop()
+            self.listener = None
+
+    def stats(self) -> Dict:
+        with self.lock:
+            ordered = sorted(latency * 1000 for latency in self.latencies)
+            report = {
+                'events': self.events,
+                'dropped': self.dropped,
+                'unmapped': self.unmapped,
+                'errors': self.errors,
+                'actions': dict(self.actions),
+            }
+        if ordered:
+            report.update({
+                'latency_p50_ms': _percentile(ordered, 0.50),
+                'latency_p95_ms': _percentile(ordered, 0.95),
+                'latency_p99_ms': _percentile(ordered, 0.99),
+                'latency_max_ms': round(ordered[-1], 3),
+            })
+        return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Show which command each key or ring button maps to, and how fast.")
+    parser.add_argument('--keymap', default=KEYMAP_PATH, help="JSON file of key name -> command overrides")
+    args = parser.parse_args()
+    keymap = load_keymap(args.keymap)
+    commands = {command: (lambda command=command: print(f"-> {command}")) for command in set(keymap.values())}
+    bus = InputBus(commands, keymap)
+    bus.start_listener()
+    print("Press keys or ring buttons, Ctrl+C to stop")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pass
+    bus.stop_listener()
+    for key, value in bus.stats().items():
+        print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
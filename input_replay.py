@@ -0,0 +1,297 @@
+# File: input_replay.py
+import argparse
+import contextlib
+import json
+import os
+import threading
+import time
+from collections import Counter
+from typing import Callable, Dict, List, Tuple
+
+LOG_FORMAT = 1
+RUN_TIMEOUT_S = 30  # longest an intent may wait for the app's event loop during a replay
+
+# What the user can do; args as recorded, e.g. [1520.4, "aya", "ٱلْبَقَرَة", 255]
+INTENTS = {
+    'key': ('key name',),             # keyboard or ring press, mapped by the keymap like a live one
+    'sura': ('sura name',),           # sura dropdown
+    'aya': ('sura name', 'aya'),      # aya dropdown
+    'speed': ('change',),             # speed buttons
+    'play': (),                       # play button
+    'previous': (),                   # previous button
+    'play_beginning': ('enabled',),   # play-beginning switch, with the value it was switched to
+}
+
+# (ms since recording started, kind, args)
+Intent = Tuple[float, str, list]
+
+
+def intent_log_path() -> str:
+    return time.strftime('intents_%Y%m%d-%H%M%S.jsonl')
+
+
+class IntentRecorder:
+    """Appends timestamped user intents to a compact JSONL log as they happen.
+
+    The first line holds the app's state when recording started (aya,
+    speed, volume, play-beginning flag, keymap), so a replay starts from
+    the same place; each further line is [ms since start, kind, *args].
+    Lines are written as they come, so a session that ends in a crash is
+    still on disk. Safe to call from the listener thread and the page loop.
+    """
+
+    def __init__(self, path: str, initial_state: Dict):
+        self.path = path
+        self.lock = threading.Lock()
+        self.started = time.perf_counter()
+        self.counts = Counter()
+        self.file = open(path, 'w', encoding='utf-8', buffering=1)
+        self.file.write(json.dumps(dict(initial_state, format=LOG_FORMAT, time=time.time()), ensure_ascii=False) + '\n')
+
+    def record(self, kind: str, *args) -> None:
+        offset_ms = round((time.perf_counter() - self.started) * 1000, 1)
+        line = json.dumps([offset_ms, kind, *args], ensure_ascii=False, separators=(',', ':'))
+        with self.lock:
+            if self.file.closed:
+                return
+            self.file.write(line + '\n')
+            self.counts[kind] += 1
+
+    def close(self) -> None:
+        with self.lock:
+            self.file.close()
+
+
+def read_log(path: str) -> Tuple[Dict, List[Intent]]:
+    with open(path, encoding='utf-8') as f:
+        header = json.loads(f.readline() or '{}')
+        if header.get('format') != LOG_FORMAT:
+            raise ValueError(f"{path} is not a format {LOG_FORMAT} intent log")
+        intents = []
+        for line in f:
+            if line.strip():
+                offset_ms, kind, *args = json.loads(line)
+                intents.append((offset_ms, kind, args))
+    return header, intents
+
+
+def describe(header: Dict, intents: List[Intent]) -> Dict:
+    """What a log holds: intents per kind, how long the session was and how fast the input came."""
+    gaps = sorted(round(b[0] - a[0], 1) for a, b in zip(intents, intents[1:]))
+    report = {
+        'recorded_at': time.strftime('%Y-%m-%d %H:%M:%S', time.localtime(header['time'])),
+        'intents': len(intents),
+        'per_kind': dict(Counter(kind for _, kind, _ in intents)),
+        'duration_s': round(intents[-1][0] / 1000, 1) if intents else 0.0,
+    }
+    if gaps:
+        report.update({'gap_min_ms': gaps[0], 'gap_p50_ms': gaps[len(gaps) // 2]})
+    return report
+
+
+def apply_intent(app, kind: str, args: list) -> None:
+    """Do what the page or the input bus does for a recorded intent."""
+    if kind == 'key':
+        app.input_bus.push(args[0])
+    elif kind == 'sura':
+        app.select_aya(args[0], 1)
+    elif kind == 'aya':
+        app.select_aya(args[0], args[1])
+    elif kind == 'speed':
+        app.change_speed(args[0])
+    elif kind == 'play':
+        app.play()
+    elif kind == 'previous':
+        app.prev_item()
+    elif kind == 'play_beginning':
+        if app.play_begining_of_aya_is_true != args[0]:
+            app.toggle_play_beginning_of_aya(None)
+    else:
+        raise ValueError(f"Unknown intent {kind}")
+
+
+class Replayer:
+    """Drives an app through a recorded session and times every intent.
+
+    Intents run at their recorded offsets divided by speed (0 runs them
+    back to back). On a live page dispatch is the page loop's
+    call_soon_threadsafe and the gaps are waited out in wall time; key
+    presses are pushed from the replay thread, as the listener would, so
+    their cost shows in the input bus latencies. Headless, advance moves
+    the simulated clock through each gap instead, so playback events
+    between intents happen as they did and nothing waits.
+    """
+
+    def __init__(self, app, dispatch: Callable[[Callable], None] = None, advance: Callable[[float], None] = None):
+        self.app = app
+        self.dispatch = dispatch
+        self.advance = advance
+
+    def run(self, fn: Callable[[], None]) -> Tuple[float, float]:
+        """Run fn where the UI would run it; returns when it started and ended."""
+        if self.dispatch is None:
+            started = time.perf_counter()
+            fn()
+            return started, time.perf_counter()
+        times = []
+        done = threading.Event()
+
+        def timed():
+            times.append(time.perf_counter())
+            try:
+                fn()
+            finally:
+                times.append(time.perf_counter())
+                done.set()
+        self.dispatch(timed)
+        if not done.wait(RUN_TIMEOUT_S):
+            raise TimeoutError(f"The app's event loop did not run an intent within {RUN_TIMEOUT_S}s")
+        return times[0], times[1]
+
+    def restore(self, header: Dict) -> None:
+        """Put the app where it was when the recording started."""
+        app = self.app
+        if header.get('keymap'):
+            app.input_bus.keymap = dict(header['keymap'])
+        index = next((i for i, item in enumerate(app.aya_data) if item['id'] == header.get('aya_id')),
+                     header.get('index', app.current_index))
+        with app.state.batch():
+            app.play_begining_of_aya_is_true = header.get('play_beginning', False)
+            app.current_index = index % len(app.aya_data)
+        if header.get('speed') and header['speed'] != app.speed:
+            app.update_speed(header['speed'])
+        app.audio_volume = header.get('volume', app.audio_volume)
+        app.change_volume(0)
+
+    def replay(self, header: Dict, intents: List[Intent], speed: float = 1.0) -> Dict:
+        from benchmarks.run import summarize
+        self.run(lambda: self.restore(header))
+        applied = {}
+        lags = []
+        errors = 0
+        elapsed_ms = 0.0  # simulated time passed so far, headless
+        started = time.perf_counter()
+        for offset_ms, kind, args in intents:
+            due_ms = offset_ms / speed if speed else 0.0
+            if self.advance:
+                self.advance(due_ms - elapsed_ms)
+                elapsed_ms = due_ms
+                due = time.perf_counter()
+            else:
+                due = started + due_ms / 1000
+                time.sleep(max(0.0, due - time.perf_counter()))
+            try:
+                if kind == 'key' and self.dispatch:
+                    begun = time.perf_counter()
+                    apply_intent(self.app, kind, args)
+                    ended = time.perf_counter()
+                else:
+                    begun, ended = self.run(lambda: apply_intent(self.app, kind, args))
+            except Exception as e:
+                print(f"Error replaying {kind} {args}: {e}")
+                errors += 1
+                continue
+            lags.append((begun - due) * 1000)
+            applied.setdefault(kind, []).append((ended - begun) * 1000)
+
+        results = {f"apply_{kind}": summarize(samples) for kind, samples in sorted(applied.items())}
+        if applied:
+            results['apply_all'] = summarize([sample for samples in applied.values() for sample in samples])
+            results['lag'] = summarize(lags)
+        state = self.app.state.stats()
+        state.pop('last_commit', None)
+        return {
+            'intents': len(intents),
+            'errors': errors,
+            'speed': speed,
+            'recorded_s': round(intents[-1][0] / 1000, 3) if intents else 0.0,
+            'wall_s': round(time.perf_counter() - started, 3),
+            'results': {'replay': results},
+            'state': state,
+            'navigation': self.app.navigation.stats(),
+            'input': self.app.input_bus.stats(),
+        }
+
+
+def replay_headless(path: str, db_path: str = None, speed: float = 1.0) -> Dict:
+    """Replay a log against the app on simulated audio; see headless.py."""
+    from headless import HeadlessSession
+    header, intents = read_log(path)
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        session = HeadlessSession(db_path, persist_position=True)
+        session.clock.advance(session.backend.load_ms)
+        replayer = Replayer(session.app, advance=session.clock.advance)
+        report = replayer.replay(header, intents, speed)
+    report.update({
+        'target': 'headless',
+        'simulated_s': round(session.clock.now_ms / 1000, 3),
+        'page_updates': session.page.updates,
+        'players': session.backend.players,
+    })
+    return report
+
+
+def replay_in_page(app, page, path: str, speed: float = 1.0, output: str = None) -> threading.Thread:
+    """Replay a log against the running app from a background thread, once the page is built."""
+    def worker():
+        header, intents = read_log(path)
+        replayer = Replayer(app, dispatch=getattr(page, 'loop', None) and page.loop.call_soon_threadsafe)
+        report = dict(replayer.replay(header, intents, speed), target='app')
+        print(format_report(report))
+        if output:
+            save_report(report, output)
+
+    thread = threading.Thread(target=worker, daemon=True)
+    thread.start()
+    return thread
+
+
+def save_report(report: Dict, path: str) -> None:
+    """JSON in the benchmark results layout, so benchmarks.run --compare takes two replays."""
+    with open(path, 'w', encoding='utf-8') as f:
+        json.dump(report, f, indent=1, ensure_ascii=False)
+
+
+def format_report(report: Dict) -> str:
+    lines = [f"Replayed {report['intents']} intents ({report['recorded_s']}s recorded) in {report['wall_s']}s "
+             f"at speed {report['speed'] or 'max'}, {report['errors']} errors"]
+    for name, summary in report['results']['replay'].items():
+        lines.append(f"  {name:<22} n={summary['n']:<5} p50 {summary['p50_ms']:>9.3f}ms  "
+                     f"p95 {summary['p95_ms']:>9.3f}ms  max {summary['max_ms']:>9.3f}ms")
+    lines.append(f"state: {report['state']['commits']} commits, {report['state']['messages']} page updates, "
+                 f"{report['state']['bytes']} bytes")
+    lines.append(f"navigation: {report['navigation']}")
+    return '\n'.join(lines)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Replay a session recorded with QURAN_RECORD_INTENTS=1 and time it.")
+    parser.add_argument('path', help="Intent log (intents_<time>.jsonl)")
+    parser.add_argument('--speed', type=float, default=1.0, help="Playback speed of the session; 0 runs intents back to back")
+    parser.add_argument('--db', help="Catalog database for the headless replay (default aya.db)")
+    parser.add_argument('--app', action='store_true', help="Replay in the real app window instead of headless")
+    parser.add_argument('--output', help="Write the report as JSON")
+    parser.add_argument('--info', action='store_true', help="Only describe the log")
+    args = parser.parse_args()
+
+    if args.info:
+        header, intents = read_log(args.path)
+        for key, value in describe(header, intents).items():
+            print(f"{key}: {value}")
+        return
+    if args.app:
+        os.environ['QURAN_REPLAY'] = args.path
+        os.environ['QURAN_REPLAY_SPEED'] = str(args.speed)
+        if args.output:
+            os.environ['QURAN_REPLAY_OUTPUT'] = args.output
+        import main as app_main
+        app_main.main()
+        return
+    report = replay_headless(args.path, args.db, args.speed)
+    print(format_report(report))
+    if args.output:
+        save_report(report, args.output)
+
+
+if __name__ == "__main__":
+    main()
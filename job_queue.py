@@ -0,0 +1,389 @@
+# File: job_queue.py
+import argparse
+import json
+import multiprocessing
+import os
+import socket
+import sqlite3
+import threading
+import time
+import traceback
+from contextlib import contextmanager
+from typing import List, Dict, Optional, Iterator, Callable
+from db_functions import get_db_connection, load_aya_data, ASSET_DIR
+
+QUEUE_PATH = 'jobs.db'
+LEASE_S = 300
+HEARTBEAT_S = 30
+RETRY_DELAY_S = 30          # doubled per failed attempt
+MAX_ATTEMPTS = 3
+IDLE_POLL_S = 2.0
+BUSY_TIMEOUT_S = 30
+
+
+class JobQueue:
+    """Job queue in a SQLite file that several processes (or hosts on a shared filesystem) can work from.
+
+    The file uses a rollback journal rather than WAL: WAL needs shared
+    memory between the processes, which hosts on a network filesystem don't
+    have. Sharing across hosts still relies on the filesystem honouring
+    POSIX locks (e.g. NFS with locking enabled); without them use one host.
+    A worker claims a job by taking a lease inside a BEGIN IMMEDIATE
+    transaction, so two workers never hold the same job. Jobs whose lease
+    runs out (a crashed or stuck worker) become claimable again. Jobs with an
+    idempotency key are only enqueued once per key.
+    """
+
+    def __init__(self, path: str = QUEUE_PATH, lease_s: float = LEASE_S):
+        self.path = path
+        self.lease_s = lease_s
+        with self._connect() as conn:
+            conn.execute('PRAGMA journal_mode = DELETE')
+            conn.execute('''
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY,
+                type TEXT NOT NULL,
+                payload TEXT NOT NULL,
+                idempotency_key TEXT UNIQUE,
+                status TEXT NOT NULL DEFAULT 'queued',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                max_attempts INTEGER NOT NULL,
+                not_before REAL NOT NULL DEFAULT 0,
+                lease_owner TEXT,
+                lease_expires REAL,
+                result TEXT,
+                error TEXT,
+                created_at REAL,
+                started_at REAL,
+                finished_at REAL
+            );
+            ''')
+            conn.execute('CREATE INDEX IF NOT EXISTS jobs_claim ON jobs (status, not_before)')
+
+    @contextmanager
+    def _connect(self) -> Iterator[sqlite3.Connection]:
+        # Autocommit mode: transactions are opened explicitly where they matter
+        conn = sqlite3.connect(self.path, timeout=BUSY_TIMEOUT_S, isolation_level=None)
+        try:
+            yield conn
+        finally:
+            conn.close()
+
+    def enqueue(self, job_type: str, payload: Dict, key: str = None, max_attempts: int = MAX_ATTEMPTS) -> Optional[int]:
+        """Add a job; returns its id, or None if a job with the same key already exists."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                'INSERT OR IGNORE INTO jobs (type, payload, idempotency_key, max_attempts, created_at) VALUES (?, ?, ?, ?, ?)',
+                (job_type, json.dumps(payload), key, max_attempts, time.time())
+            )
+            return cursor.lastrowid if cursor.rowcount else None
+
+    def enqueue_many(self, jobs: List[tuple], max_attempts: int = MAX_ATTEMPTS) -> int:
+        """Add (type, payload, key) tuples in one transaction; returns how many were new."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            before = conn.total_changes
+            conn.executemany(
+                'INSERT OR IGNORE INTO jobs (type, payload, idempotency_key, max_attempts, created_at) VALUES (?, ?, ?, ?, ?)',
+                [(job_type, json.dumps(payload), key, max_attempts, now) for job_type, payload, key in jobs]
+            )
+            added = conn.total_changes - before
+            conn.execute('COMMIT')
+        return added
+
+    def claim(self, worker: str, types: List[str] = None) -> Optional[Dict]:
+        """Lease the oldest runnable job (queued, or running with an expired lease)."""
+        now = time.time()
+        type_filter = f"AND type IN ({','.join('?' * len(types))})" if types else ''
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            while True:
+                row = conn.execute(f'''
+                    SELECT id, type, payload, attempts, max_attempts, status FROM jobs
+                    WHERE ((status = 'queued' AND not_before <= ?) OR (status = 'running' AND lease_expires < ?))
+                    {type_filter}
+                    ORDER BY id LIMIT 1
+                ''', [now, now] + list(types or [])).fetchone()
+                if row is None:
+                    conn.execute('COMMIT')
+                    return None
+                job_id, job_type, payload, attempts, max_attempts, status = row
+                if status == 'queued' or attempts < max_attempts:
+                    break
+                # Its last attempt never reported back: the worker died with it (OOM, a crashed decoder)
+                conn.execute("UPDATE jobs SET status = 'failed', error = ?, lease_owner = NULL, finished_at = ? WHERE id = ?",
+                             (f"lease expired on attempt {attempts} of {max_attempts}", now, job_id))
+            conn.execute(
+                "UPDATE jobs SET status = 'running', attempts = ?, lease_owner = ?, lease_expires = ?, started_at = ? WHERE id = ?",
+                (attempts + 1, worker, now + self.lease_s, now, job_id)
+            )
+            conn.execute('COMMIT')
+        return {'id': job_id, 'type': job_type, 'payload': json.loads(payload), 'attempt': attempts + 1}
+
+    def heartbeat(self, job_id: int, worker: str) -> bool:
+        """Extend a lease; False means the job was taken over and the result will be discarded."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET lease_expires = ? WHERE id = ? AND lease_owner = ? AND status = 'running'",
+                (time.time() + self.lease_s, job_id, worker)
+            )
+            return cursor.rowcount == 1
+
+    def complete(self, job_id: int, worker: str, result=None) -> bool:
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'done', result = ?, error = NULL, lease_owner = NULL, finished_at = ? "
+                "WHERE id = ? AND lease_owner = ? AND status = 'running'",
+                (json.dumps(result), time.time(), job_id, worker)
+            )
+            return cursor.rowcount == 1
+
+    def fail(self, job_id: int, worker: str, error: str) -> None:
+        """Requeue with exponential delay, or mark failed once attempts run out."""
+        now = time.time()
+        with self._connect() as conn:
+            conn.execute('BEGIN IMMEDIATE')
+            row = conn.execute("SELECT attempts, max_attempts FROM jobs WHERE id = ? AND lease_owner = ?",
+                               (job_id, worker)).fetchone()
+            if row:
+                attempts, max_attempts = row
+                if attempts >= max_attempts:
+                    conn.execute("UPDATE jobs SET status = 'failed', error = ?, lease_owner = NULL, finished_at = ? WHERE id = ?",
+                                 (error, now, job_id))
+                else:
+                    conn.execute("UPDATE jobs SET status = 'queued', error = ?, lease_owner = NULL, not_before = ? WHERE id = ?",
+                                 (error, now + RETRY_DELAY_S * 2 ** (attempts - 1), job_id))
+            conn.execute('COMMIT')
+
+    def retry_failed(self, job_type: str = None) -> int:
+        """Give failed jobs a fresh set of attempts."""
+        with self._connect() as conn:
+            cursor = conn.execute(
+                "UPDATE jobs SET status = 'queued', attempts = 0, not_before = 0 WHERE status = 'failed'"
+                + (" AND type = ?" if job_type else ''), (job_type,) if job_type else ()
+            )
+            return cursor.rowcount
+
+    def status(self, window_s: float = 600, straggler_factor: float = 3.0) -> Dict:
+        """Counts per type and status, recent throughput and jobs running much longer than usual."""
+        now = time.time()
+        with self._connect() as conn:
+            counts = {}
+            for job_type, status, count in conn.execute('SELECT type, status, COUNT(*) FROM jobs GROUP BY type, status'):
+                counts.setdefault(job_type, {})[status] = count
+            recent = dict(conn.execute(
+                "SELECT type, COUNT(*) FROM jobs WHERE status = 'done' AND finished_at >= ? GROUP BY type",
+                (now - window_s,)
+            ))
+            durations = {}
+            for job_type, duration in conn.execute(
+                    "SELECT type, finished_at - started_at FROM jobs WHERE status = 'done' ORDER BY finished_at DESC LIMIT 5000"):
+                durations.setdefault(job_type, []).append(duration)
+            running = conn.execute(
+                "SELECT id, type, lease_owner, started_at, lease_expires FROM jobs WHERE status = 'running'"
+            ).fetchall()
+
+        typical = {job_type: sorted(values)[len(values) // 2] for job_type, values in durations.items()}
+        stragglers = []
+        for job_id, job_type, owner, started_at, lease_expires in running:
+            age = now - started_at
+            if lease_expires < now or (job_type in typical and age > straggler_factor * max(typical[job_type], 1.0)):
+                stragglers.append({'id': job_id, 'type': job_type, 'worker': owner, 'running_s': round(age, 1),
+                                   'lease_expired': lease_expires < now})
+        return {
+            'counts': counts,
+            'per_minute': {job_type: round(count * 60 / window_s, 1) for job_type, count in recent.items()},
+            'median_s': {job_type: round(value, 2) for job_type, value in typical.items()},
+            'stragglers': stragglers,
+        }
+
+
+# --- Handlers: payload -> JSON-serializable result. They must be safe to run twice. ---
+
+def _split(payload: Dict) -> Dict:
+    from pydub import AudioSegment
+    audio = AudioSegment.from_file(payload['source'])
+    segment = audio[payload['start_ms']:payload['end_ms']]
+    temp_path = f"{payload['output']}.{os.getpid()}.tmp"
+    segment.export(temp_path, format=os.path.splitext(payload['output'])[1].lstrip('.') or 'mp3')
+    os.replace(temp_path, payload['output'])
+    return {'output': payload['output'], 'duration_ms': len(segment)}
+
+
+def _transcode(payload: Dict) -> Dict:
+    from pydub import AudioSegment
+    audio = AudioSegment.from_file(payload['source'])
+    fmt = payload.get('format', 'mp3')
+    temp_path = f"{payload['output']}.{os.getpid()}.tmp"
+    audio.export(temp_path, format=fmt, bitrate=payload.get('bitrate'))
+    os.replace(temp_path, payload['output'])
+    return {'output': payload['output'], 'bytes': os.path.getsize(payload['output'])}
+
+
+def _analyze_pauses(payload: Dict) -> Dict:
+    from pause_analysis import analyze_file, store_analysis, init_pause_tables
+    stat = os.stat(payload['path'])
+    result = analyze_file(payload['path'])
+    init_pause_tables(payload.get('db_path'))
+    with get_db_connection(payload.get('db_path')) as conn:
+        store_analysis(conn, os.path.basename(payload['path']), stat.st_size, stat.st_mtime, result)
+        conn.commit()
+    return {'duration_ms': result['duration_ms'], 'pauses': len(result['pauses'])}
+
+
+def _verify(payload: Dict) -> Dict:
+    from asset_manifest import check_file, store_check, init_manifest_table
+    result = check_file(payload['path'])
+    init_manifest_table(payload.get('db_path'))
+    with get_db_connection(payload.get('db_path')) as conn:
+        store_check(conn, payload['name'], result)
+        conn.commit()
+    return {'status': result['status'], 'detail': result['detail']}
+
+
+def _download(payload: Dict) -> Dict:
+    from downloader import DownloadJob, _fetch
+    return {'bytes': _fetch(DownloadJob(payload['url'], payload['path'], payload.get('sha1')))}
+
+
+HANDLERS: Dict[str, Callable[[Dict], Dict]] = {
+    'split': _split,
+    'transcode': _transcode,
+    'analyze_pauses': _analyze_pauses,
+    'verify': _verify,
+    'download': _download,
+}
+
+
+def run_worker(queue_path: str = QUEUE_PATH, types: List[str] = None, worker: str = None,
+               exit_when_idle: bool = False) -> int:
+    """Claim and run jobs until the queue is empty (with exit_when_idle) or forever."""
+    worker = worker or f"{socket.gethostname()}:{os.getpid()}"
+    queue = JobQueue(queue_path)
+    done = 0
+    print(f"Worker {worker} started")
+    while True:
+        job = queue.claim(worker, types)
+        if job is None:
+            if exit_when_idle:
+                break
+            time.sleep(IDLE_POLL_S)
+            continue
+
+        # Keep the lease alive while long jobs (e.g. decoding a full sura) run
+        stop = threading.Event()
+
+        def beat(job_id=job['id']):
+            while not stop.wait(HEARTBEAT_S):
+                if not queue.heartbeat(job_id, worker):
+                    return
+
+        beater = threading.Thread(target=beat, daemon=True)
+        beater.start()
+        try:
+            handler = HANDLERS[job['type']]
+            result = handler(job['payload'])
+        except Exception:
+            stop.set()
+            error = traceback.format_exc()
+            print(f"Job {job['id']} ({job['type']}) failed on attempt {job['attempt']}: {error.splitlines()[-1]}")
+            queue.fail(job['id'], worker, error)
+            continue
+        stop.set()
+        if queue.complete(job['id'], worker, result):
+            done += 1
+        else:
+            print(f"Job {job['id']} lost its lease before finishing; result discarded")
+    print(f"Worker {worker} finished {done} jobs")
+    return done
+
+
+def enqueue_catalog(queue: JobQueue, job_type: str, db_path: str = None) -> int:
+    """Queue analyze_pauses or verify jobs for every catalog file.
+
+    Keys include size and mtime, so a re-run only adds jobs for changed files.
+    """
+    jobs = []
+    for item in load_aya_data(db_path):
+        names = [('audio', item['audio'])] if job_type == 'analyze_pauses' else [('audio', item['audio']), ('image', item['image'])]
+        for _, path in names:
+            try:
+                stat = os.stat(path)
+            except FileNotFoundError:
+                continue
+            name = os.path.basename(path)
+            jobs.append((job_type, {'name': name, 'path': os.path.abspath(path), 'db_path': db_path},
+                         f"{job_type}:{name}:{stat.st_size}:{stat.st_mtime}"))
+    return queue.enqueue_many(jobs)
+
+
+def enqueue_splits(queue: JobQueue, splits_path: str, source_dir: str = ASSET_DIR, output_dir: str = 'splits') -> int:
+    """Queue one split job per segment listed in an audio_splits.json-style file."""
+    with open(splits_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    jobs = []
+    for audio, info in data.get('files', {}).items():
+        for split in info.get('splits', []):
+            output = os.path.abspath(os.path.join(output_dir, split['split_file']))
+            payload = {'source': os.path.abspath(os.path.join(source_dir, audio)), 'output': output,
+                       'start_ms': split['start_ms'], 'end_ms': split['end_ms']}
+            jobs.append(('split', payload, f"split:{audio}:{split['start_ms']}:{split['end_ms']}"))
+    os.makedirs(output_dir, exist_ok=True)
+    return queue.enqueue_many(jobs)
+
+
+def _print_status(report: Dict) -> None:
+    print(f"{'type':<16}{'queued':>8}{'running':>9}{'done':>8}{'failed':>8}{'/min':>8}{'median s':>10}")
+    for job_type, counts in sorted(report['counts'].items()):
+        print(f"{job_type:<16}{counts.get('queued', 0):>8}{counts.get('running', 0):>9}{counts.get('done', 0):>8}"
+              f"{counts.get('failed', 0):>8}{report['per_minute'].get(job_type, 0):>8}"
+              f"{report['median_s'].get(job_type, '-'):>10}")
+    if report['stragglers']:
+        print("\nStragglers:")
+        for job in report['stragglers']:
+            expired = " (lease expired)" if job['lease_expired'] else ""
+            print(f"  job {job['id']} {job['type']} on {job['worker']}: {job['running_s']}s{expired}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="SQLite-backed job queue for the asset pipelines.")
+    parser.add_argument('--queue', default=QUEUE_PATH, help="Queue database (shared between hosts)")
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    enqueue_parser = subparsers.add_parser('enqueue', help="Queue jobs for the catalog or a splits file")
+    enqueue_parser.add_argument('type', choices=['analyze_pauses', 'verify', 'split'])
+    enqueue_parser.add_argument('--splits', help="audio_splits.json-style file for split jobs")
+    enqueue_parser.add_argument('--output', default='splits')
+    worker_parser = subparsers.add_parser('worker', help="Run worker processes")
+    worker_parser.add_argument('--processes', type=int, default=1)
+    worker_parser.add_argument('--types', nargs='*', choices=sorted(HANDLERS))
+    worker_parser.add_argument('--exit-when-idle', action='store_true')
+    subparsers.add_parser('status', help="Show counts, throughput and stragglers")
+    retry_parser = subparsers.add_parser('retry', help="Requeue failed jobs")
+    retry_parser.add_argument('--type')
+    args = parser.parse_args()
+
+    queue = JobQueue(args.queue)
+    if args.command == 'enqueue':
+        if args.type == 'split':
+            if not args.splits:
+                parser.error("split jobs need --splits")
+            added = enqueue_splits(queue, args.splits, output_dir=args.output)
+        else:
+            added = enqueue_catalog(queue, args.type)
+        print(f"Queued {added} new {args.type} jobs")
+    elif args.command == 'worker':
+        worker_args = (args.queue, args.types, None, args.exit_when_idle)
+        processes = [multiprocessing.Process(target=run_worker, args=worker_args) for _ in range(args.processes)]
+        for process in processes:
+            process.start()
+        for process in processes:
+            process.join()
+    elif args.command == 'status':
+        _print_status(queue.status())
+    else:
+        print(f"Requeued {queue.retry_failed(args.type)} failed jobs")
+
+
+if __name__ == "__main__":
+    main()
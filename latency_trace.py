@@ -0,0 +1,173 @@
+# File: latency_trace.py
+import argparse
+import json
+import threading
+import time
+from typing import List, Dict
+
+TRACE_PATH = 'latency_traces.jsonl'
+
+# Stages of the key-to-audio path in the order they happen; a trace may skip some
+STAGES = (
+    'input',           # key or ring press seen by the listener
+    'dispatch',        # its command runs on the app's event loop
+    'load_start',      # the navigation scheduler starts loading the target
+    'render',          # the page renders the aya (image, status, dropdowns)
+    'db_write',        # current aya saved
+    'player_created',  # new audio player set up
+    'sent',            # page update sent to the client
+    'loaded',          # the client loaded the audio (on_loaded)
+    'playing',         # playback started (on_state_changed)
+    'paused',          # playback paused (on_state_changed)
+)
+
+# Stages that complete a trace, per command; the player does not autoplay after navigating,
+# so navigation ends when the new aya's audio is ready. Play/pause ends when the player
+# starts or stops; volume and speed are applied as their command runs, so they end at dispatch
+FINISH_STAGE = {
+    'next': ('loaded',),
+    'previous': ('loaded',),
+    'jump': ('loaded',),
+    'toggle_play': ('playing', 'paused'),
+    'volume_up': ('dispatch',),
+    'volume_down': ('dispatch',),
+    'speed_up': ('dispatch',),
+    'speed_down': ('dispatch',),
+}
+
+HISTOGRAM_EDGES_MS = (5, 10, 20, 50, 100, 200, 500, 1000, 2000)
+
+
+def _percentile(ordered: List[float], fraction: float) -> float:
+    return round(ordered[min(len(ordered) - 1, int(len(ordered) * fraction))], 2)
+
+
+def summarize(values: List[float]) -> Dict:
+    ordered = sorted(values)
+    if not ordered:
+        return {'count': 0}
+    return {
+        'count': len(ordered),
+        'p50_ms': _percentile(ordered, 0.50),
+        'p95_ms': _percentile(ordered, 0.95),
+        'p99_ms': _percentile(ordered, 0.99),
+        'max_ms': round(ordered[-1], 2),
+    }
+
+
+def histogram(values: List[float], edges=HISTOGRAM_EDGES_MS) -> Dict[str, int]:
+    """Counts per latency bucket, e.g. {'<5ms': 3, '5-10ms': 7, ..., '>=2000ms': 0}."""
+    labels = [f"<{edges[0]}ms"] + [f"{low}-{high}ms" for low, high in zip(edges, edges[1:])] + [f">={edges[-1]}ms"]
+    counts = dict.fromkeys(labels, 0)
+    for value in values:
+        bucket = sum(value >= edge for edge in edges)
+        counts[labels[bucket]] += 1
+    return counts
+
+
+class LatencyTracer:
+    """Timestamps each stage of a key press's path to audio, one trace per navigation.
+
+    begin() opens a trace at the press; mark() stamps a stage on the open
+    trace with a monotonic clock. A press that arrives before the previous
+    one finished supersedes it (the navigation scheduler will only load the
+    last target), so the superseded trace is counted but not measured.
+    Finished traces are appended to a JSONL file when a path is given.
+    """
+
+    def __init__(self, path: str = None):
+        self.path = path
+        self.lock = threading.Lock()
+        self.current = None
+        self.next_id = 1
+        self.finished = []
+        self.superseded = 0
+
+    def begin(self, command: str, started_at: float = None) -> int:
+        with self.lock:
+            if self.current is not None:
+                self.superseded += 1
+            trace_id = self.next_id
+            self.next_id += 1
+            self.current = {'id': trace_id, 'command': command,
+                            'marks': {'input': started_at if started_at is not None else time.perf_counter()}}
+            return trace_id
+
+    def mark(self, stage: str) -> None:
+        """Stamp stage on the open trace; the first stamp of a stage wins."""
+        now = time.perf_counter()
+        with self.lock:
+            trace = self.current
+            if trace is None or stage in trace['marks']:
+                return
+            trace['marks'][stage] = now
+            if stage not in FINISH_STAGE.get(trace['command'], ('playing',)):
+                return
+            self.current = None
+            self.finished.append(trace)
+        if self.path:
+            with open(self.path, 'a', encoding='utf-8') as f:
+                f.write(json.dumps(trace) + '\n')
+
+    def report(self) -> Dict:
+        with self.lock:
+            traces = list(self.finished)
+            superseded = self.superseded
+        return dict(build_report(traces), superseded=superseded)
+
+
+def build_report(traces: List[Dict]) -> Dict:
+    """Total latency percentiles and histogram, plus the time spent between consecutive stages."""
+    totals = []
+    stages = {}
+    for trace in traces:
+        marks = trace['marks']
+        present = [stage for stage in STAGES if stage in marks]
+        totals.append((marks[present[-1]] - marks['input']) * 1000)
+        for previous, stage in zip(present, present[1:]):
+            stages.setdefault(f"{previous}->{stage}", []).append((marks[stage] - marks[previous]) * 1000)
+    order = {stage: index for index, stage in enumerate(STAGES)}
+    return {
+        'traces': len(traces),
+        'total': summarize(totals),
+        'histogram': histogram(totals),
+        'stages': {name: summarize(values) for name, values in
+                   sorted(stages.items(), key=lambda item: order[item[0].split('->')[1]])},
+    }
+
+
+def format_report(report: Dict) -> str:
+    lines = [f"{report['traces']} traces, {report.get('superseded', 0)} superseded by a newer press"]
+    total = report['total']
+    if total['count']:
+        lines.append(f"key to audio: p50 {total['p50_ms']}ms  p95 {total['p95_ms']}ms  "
+                     f"p99 {total['p99_ms']}ms  max {total['max_ms']}ms")
+        widest = max(report['histogram'].values())
+        for label, count in report['histogram'].items():
+            bar = '#' * round(40 * count / widest) if widest else ''
+            lines.append(f"  {label:>11} {count:6d} {bar}")
+        lines.append("per stage:")
+        for name, stage in report['stages'].items():
+            lines.append(f"  {name:<28} p50 {stage['p50_ms']:>8}ms  p95 {stage['p95_ms']:>8}ms  "
+                         f"p99 {stage['p99_ms']:>8}ms")
+    return '\n'.join(lines)
+
+
+def read_traces(path: str = TRACE_PATH) -> List[Dict]:
+    with open(path, encoding='utf-8') as f:
+        return [json.loads(line) for line in f if line.strip()]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Report key-to-audio latency from traces recorded with QURAN_TRACE_LATENCY=1.")
+    parser.add_argument('path', nargs='?', default=TRACE_PATH)
+    parser.add_argument('--command', help="Only traces of this command, e.g. next")
+    parser.add_argument('--json', action='store_true', help="Print the report as JSON")
+    args = parser.parse_args()
+    traces = [trace for trace in read_traces(args.path) if not args.command or trace['command'] == args.command]
+    report = build_report(traces)
+    print(json.dumps(report, indent=1) if args.json else format_report(report))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,10 +1,36 @@
+import os
 import flet as ft
 from app import QuranApp
 
 def main():
     print("\n=== Starting Application ===")
-    app = QuranApp()
-    ft.app(target=app.page)
+    # Serve audio and images from a single asset pack or the content store instead of q_files/ when set
+    app = QuranApp(asset_pack=os.environ.get('QURAN_ASSET_PACK'),
+                   content_addressed=os.environ.get('QURAN_CONTENT_STORE') == '1')
+    if os.environ.get('QURAN_WATCH_ASSETS') == '1':
+        app.start_asset_watcher()
+    if os.environ.get('QURAN_TRACE_LATENCY') == '1':
+        app.enable_latency_trace()
+    if os.environ.get('QURAN_RECORD_INTENTS') == '1':
+        app.enable_intent_recording()
+    replay_path = os.environ.get('QURAN_REPLAY')
+
+    def target(page):
+        app.page(page)
+        if replay_path:
+            # Drive the window through a recorded session; see input_replay.py
+            from input_replay import replay_in_page
+            replay_in_page(app, page, replay_path, float(os.environ.get('QURAN_REPLAY_SPEED', '1')),
+                           os.environ.get('QURAN_REPLAY_OUTPUT'))
+
+    ft.app(target=target)
+    if app.recorder:
+        app.recorder.close()
+        print(f"Recorded {sum(app.recorder.counts.values())} intents to {app.recorder.path}")
+    if app.tracer:
+        from latency_trace import format_report
+        print(format_report(app.tracer.report()))
+        print(f"Input: {app.input_bus.stats()}")
 
 if __name__ == "__main__":
     main()
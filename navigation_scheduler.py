@@ -0,0 +1,230 @@
+# File: navigation_scheduler.py
+import argparse
+import threading
+import time
+from typing import Callable, Dict
+
+SETTLE_S = 0.08  # quiet time after the last intent before the target is loaded
+MAX_WAIT_S = 0.4  # load at least this often while a key is held down
+FRAME_S = 1 / 30  # intermediate status updates are shown at most at this rate
+
+
+class NavigationScheduler:
+    """Collapses bursts of navigation intents into a single load of the final target.
+
+    Intents (key presses, skip clicks, dropdown picks) only record the target
+    and return at once. A worker thread loads it with apply(index): right away
+    for the first intent after an idle period, so a single press is not
+    delayed, and otherwise once no new intent arrived for settle_s, or after
+    max_wait_s of continuous input. In
+    between, preview(index) is called at most once per frame so the status
+    can follow along without loading anything. A load already in progress
+    can call is_stale() to give up when a newer target is waiting.
+
+    dispatch runs the load where the UI lives (the page loop's
+    call_soon_threadsafe); the worker only decides when to load and waits
+    for it. Without dispatch, apply runs on the worker thread.
+    """
+
+    def __init__(self, apply: Callable[[int], None], preview: Callable[[int], None] = None,
+                 settle_s: float = SETTLE_S, max_wait_s: float = MAX_WAIT_S, frame_s: float = FRAME_S,
+                 dispatch: Callable[[Callable], None] = None):
+        self.apply = apply
+        self.dispatch = dispatch
+        self.preview = preview
+        self.settle_s = settle_s
+        self.max_wait_s = max_wait_s
+        self.frame_s = frame_s
+        self.condition = threading.Condition()
+        self.target = None  # index waiting to be loaded
+        self.latest = None  # last requested index, kept until its load finishes
+        self.busy = False
+        self.leading = False  # the pending intent came while idle and loads without waiting
+        self.first_intent_at = None
+        self.last_intent_at = None
+        self.last_preview_at = float('-inf')
+        self.worker = None
+        self.closed = False
+        self.intents = 0
+        self.loads = 0
+        self.previews = 0
+        self.stale = 0
+        self.load_times = []
+
+    def request(self, index: int) -> None:
+        """Ask to go to index; earlier targets that are not loaded yet are dropped."""
+        with self.condition:
+            self._request_locked(index)
+        self._preview(index)
+
+    def step(self, delta: int, current: int, count: int) -> None:
+        """Move delta ayas from the pending target, or from current when nothing is pending."""
+        with self.condition:
+            base = self.latest if self.busy else current
+            index = (base + delta) % count
+            self._request_locked(index)
+        self._preview(index)
+
+    def _request_locked(self, index: int) -> None:
+        now = time.monotonic()
+        self.target = self.latest = index
+        if not self.busy:
+            self.leading = True
+        self.busy = True
+        self.intents += 1
+        self.last_intent_at = now
+        if self.first_intent_at is None:
+            self.first_intent_at = now
+        if self.worker is None:
+            self.worker = threading.Thread(target=self._run, daemon=True)
+            self.worker.start()
+        self.condition.notify()
+
+    def _preview(self, index: int) -> None:
+        if not self.preview:
+            return
+        now = time.monotonic()
+        with self.condition:
+            if now - self.last_preview_at < self.frame_s:
+                return
+            self.last_preview_at = now
+            self.previews += 1
+        self.preview(index)
+
+    def is_stale(self) -> bool:
+        """True while a newer target is waiting, so the current load can stop early."""
+        with self.condition:
+            stale = self.target is not None
+            if stale:
+                self.stale += 1
+            return stale
+
+    def _run(self) -> None:
+        while True:
+            with self.condition:
+                while self.target is None and not self.closed:
+                    self.condition.wait()
+                if self.closed:
+                    return
+                # Wait for the burst to end, but not longer than max_wait_s after it started
+                while not self.leading:
+                    deadline = min(self.last_intent_at + self.settle_s, self.first_intent_at + self.max_wait_s)
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        break
+                    self.condition.wait(remaining)
+                index = self.target
+                self.target = None
+                self.leading = False
+                self.first_intent_at = None
+
+            started = time.perf_counter()
+            if not self._load(index):
+                return
+            with self.condition:
+                self.loads += 1
+                self.load_times.append(time.perf_counter() - started)
+                if self.target is None:
+                    self.busy = False
+                    self.condition.notify_all()
+
+    def _load(self, index: int) -> bool:
+        """Run apply(index), through dispatch when set, and wait for it; False if closed meanwhile."""
+        done = threading.Event()
+
+        def load():
+            try:
+                self.apply(index)
+            except Exception as e:
+                print(f"Error loading aya at index {index}: {e}")
+            finally:
+                done.set()
+
+        if self.dispatch is None:
+            load()
+            return True
+        self.dispatch(load)
+        while not done.wait(0.5):
+            if self.closed:
+                return False
+        return True
+
+    def wait_idle(self, timeout: float = None) -> bool:
+        """Block until every requested target has been loaded."""
+        with self.condition:
+            return self.condition.wait_for(lambda: not self.busy, timeout)
+
+    def close(self) -> None:
+        with self.condition:
+            self.closed = True
+            self.condition.notify_all()
+
+    def stats(self) -> Dict:
+        with self.condition:
+            ordered = sorted(t * 1000 for t in self.load_times)
+            return {
+                'intents': self.intents,
+                'loads': self.loads,
+                'previews': self.previews,
+                'stale_loads_cut_short': self.stale,
+                'load_p50_ms': round(ordered[len(ordered) // 2], 2) if ordered else None,
+                'load_max_ms': round(ordered[-1], 2) if ordered else None,
+            }
+
+
+def self_test(presses: int = 100, interval_s: float = 0.01, load_s: float = 0.03) -> Dict:
+    """Hold "next" for presses key repeats against a slow fake load and check the work stays bounded.
+
+    Without coalescing every press costs a full load; here the number of
+    loads is bounded by the burst length over max_wait_s, previews by the
+    frame rate, and the last load must be the final target.
+    """
+    loaded = []
+    current = [0]
+
+    def apply(index):
+        current[0] = index
+        # Loads past a stale target are cut short, as the page's loader does
+        time.sleep(load_s / 2)
+        if scheduler.is_stale():
+            return
+        time.sleep(load_s / 2)
+        loaded.append(index)
+
+    scheduler = NavigationScheduler(apply, preview=lambda index: None)
+    count = 6236
+    started = time.perf_counter()
+    for _ in range(presses):
+        scheduler.step(1, current[0], count)
+        time.sleep(interval_s)
+    scheduler.wait_idle(timeout=10)
+    elapsed = time.perf_counter() - started
+    scheduler.close()
+
+    burst_s = presses * interval_s
+    max_loads = int(burst_s / scheduler.max_wait_s) + 3
+    max_previews = int(burst_s / scheduler.frame_s) + 2
+    report = dict(scheduler.stats(), completed=len(loaded), final=loaded[-1] if loaded else None,
+                  elapsed_s=round(elapsed, 2), max_loads=max_loads, max_previews=max_previews)
+    if report['final'] != presses % count:
+        raise AssertionError(f"last load was {report['final']}, expected {presses % count}")
+    if report['loads'] > max_loads or report['previews'] > max_previews:
+        raise AssertionError(f"unbounded work for {presses} presses: {report}")
+    print(f"Self test: {presses} presses -> {report['loads']} loads, {report['previews']} previews, "
+          f"final index {report['final']}")
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Check that a burst of navigation key presses does bounded work.")
+    parser.add_argument('--presses', type=int, default=100)
+    parser.add_argument('--interval-ms', type=float, default=10.0, help="Time between presses (key repeat)")
+    parser.add_argument('--load-ms', type=float, default=30.0, help="Simulated cost of loading one aya")
+    args = parser.parse_args()
+    report = self_test(args.presses, args.interval_ms / 1000, args.load_ms / 1000)
+    for key, value in report.items():
+        print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
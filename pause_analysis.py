@@ -0,0 +1,164 @@
+# File: pause_analysis.py
+import argparse
+import time
+import traceback
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Dict
+from audio_features import load_audio, frame_energy_db, DEFAULT_SAMPLE_RATE, HOP_MS
+from db_functions import get_db_connection, load_aya_data
+from asset_scan import catalog_files, changed_files
+
+MAX_CUT_POINTS = 8
+MIN_PAUSE_MS = 120
+PAUSE_DROP_DB = 25.0      # a pause is this far below the aya's speech level
+SMOOTHING_MS = 50
+
+
+def init_pause_tables(db_path: str = None) -> None:
+    """Create the pause analysis tables if they don't exist."""
+    with get_db_connection(db_path) as conn:
+        cursor = conn.cursor()
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS aya_pause_scan (
+            audio TEXT PRIMARY KEY,
+            size INTEGER,
+            mtime REAL,
+            duration_ms INTEGER,
+            analyzed_at REAL
+        );
+        ''')
+        cursor.execute('''
+        CREATE TABLE IF NOT EXISTS aya_pause_points (
+            audio TEXT,
+            rank INTEGER,
+            position_ms INTEGER,
+            start_ms INTEGER,
+            end_ms INTEGER,
+            depth_db REAL,
+            PRIMARY KEY (audio, rank)
+        );
+        ''')
+        conn.commit()
+
+
+def find_pauses(energy_db: np.ndarray, hop_ms: int = HOP_MS, min_pause_ms: int = MIN_PAUSE_MS,
+                drop_db: float = PAUSE_DROP_DB, max_points: int = MAX_CUT_POINTS) -> List[Dict]:
+    """Find in-aya energy valleys and rank them by depth times length."""
+    window = max(1, SMOOTHING_MS // hop_ms)
+    smoothed = np.convolve(energy_db, np.ones(window) / window, mode='same')
+    speech_level = np.percentile(smoothed, 95)
+    quiet = np.concatenate(([False], smoothed < speech_level - drop_db, [False]))
+    edges = np.flatnonzero(np.diff(quiet.astype(np.int8)))
+
+    pauses = []
+    for start, stop in zip(edges[::2], edges[1::2]):
+        # Leading and trailing silence are not cut points
+        if start == 0 or stop == len(smoothed):
+            continue
+        if (stop - start) * hop_ms < min_pause_ms:
+            continue
+        depth = float(speech_level - smoothed[start:stop].mean())
+        pauses.append({
+            'position_ms': int((start + stop) // 2 * hop_ms),
+            'start_ms': int(start * hop_ms),
+            'end_ms': int(stop * hop_ms),
+            'depth_db': round(depth, 2),
+            'score': depth * (stop - start),
+        })
+
+    pauses.sort(key=lambda p: p['score'], reverse=True)
+    for rank, pause in enumerate(pauses[:max_points]):
+        pause['rank'] = rank
+        del pause['score']
+    return pauses[:max_points]
+
+
+def analyze_file(path: str) -> Dict:
+    """Decode one aya file and return its ranked pause candidates."""
+    samples = load_audio(path, DEFAULT_SAMPLE_RATE)
+    energy = frame_energy_db(samples, DEFAULT_SAMPLE_RATE)
+    return {
+        'duration_ms': int(len(samples) * 1000 / DEFAULT_SAMPLE_RATE),
+        'pauses': find_pauses(energy),
+    }
+
+
+def store_analysis(conn, audio: str, size: int, mtime: float, result: Dict) -> None:
+    """Replace the stored pauses of one file with a fresh analyze_file() result (not committed)."""
+    conn.execute('DELETE FROM aya_pause_points WHERE audio = ?', (audio,))
+    conn.executemany(
+        'INSERT INTO aya_pause_points (audio, rank, position_ms, start_ms, end_ms, depth_db) VALUES (?, ?, ?, ?, ?, ?)',
+        [(audio, p['rank'], p['position_ms'], p['start_ms'], p['end_ms'], p['depth_db']) for p in result['pauses']]
+    )
+    conn.execute(
+        'INSERT OR REPLACE INTO aya_pause_scan (audio, size, mtime, duration_ms, analyzed_at) VALUES (?, ?, ?, ?, ?)',
+        (audio, size, mtime, result['duration_ms'], time.time())
+    )
+
+
+def _analyze_job(job):
+    audio, path = job
+    try:
+        return audio, analyze_file(path), None
+    except Exception as e:
+        return audio, None, str(e)
+
+
+def _stale_files(aya_data: List[Dict], db_path: str = None) -> List[tuple]:
+    """Return (audio, path, size, mtime) for files that are new or changed since the last scan."""
+    with get_db_connection(db_path) as conn:
+        scanned = {row[0]: (row[1], row[2]) for row in conn.execute('SELECT audio, size, mtime FROM aya_pause_scan')}
+    return changed_files(catalog_files(aya_data), scanned)
+
+
+def analyze_catalog(db_path: str = None, workers: int = None, force: bool = False) -> Dict:
+    """Analyze every catalog aya whose file changed since the last run, in parallel."""
+    print("\n=== Analyzing aya pauses ===")
+    started = time.perf_counter()
+    init_pause_tables(db_path)
+    aya_data = load_aya_data(db_path)
+    if force:
+        with get_db_connection(db_path) as conn:
+            conn.execute('DELETE FROM aya_pause_scan')
+            conn.commit()
+    stale = _stale_files(aya_data, db_path)
+    print(f"{len(stale)} files need analysis")
+
+    file_info = {audio: (size, mtime) for audio, _, size, mtime in stale}
+    done = failed = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool, get_db_connection(db_path) as conn:
+        futures = [pool.submit(_analyze_job, (audio, path)) for audio, path, _, _ in stale]
+        for future in as_completed(futures):
+            audio, result, error = future.result()
+            if error:
+                failed += 1
+                print(f"Error analyzing {audio}: {error}")
+                continue
+            size, mtime = file_info[audio]
+            store_analysis(conn, audio, size, mtime, result)
+            done += 1
+            if done % 500 == 0:
+                conn.commit()
+                print(f"Analyzed {done}/{len(stale)} files")
+        conn.commit()
+
+    elapsed = time.perf_counter() - started
+    print(f"Pause analysis complete: {done} analyzed, {failed} failed in {elapsed:.1f}s")
+    return {'analyzed': done, 'failed': failed, 'elapsed_s': elapsed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Find natural pause cut points for every aya file.")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument('--force', action='store_true', help="Re-analyze every file")
+    args = parser.parse_args()
+    try:
+        analyze_catalog(workers=args.workers, force=args.force)
+    except Exception:
+        print(traceback.format_exc())
+        raise
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+# File: playback_core.py
+
+
+class PlaybackLogic:
+    """Playback behaviour shared by the Flet audio player and the simulated one.
+
+    Expects the player API of flet_audio.Audio: volume and playback_rate
+    attributes, get_current_position(), play(), pause(), resume(), seek()
+    and update(). Nothing here touches Flet itself, so it also runs headless.
+    """
+
+    last_volume_update = 0
+    start_offset = 0  # ms to seek past leading silence when playback starts
+
+    def handle_audio_position_changed(self, aya_duration, play_begining_of_aya_is_true, audio_volume,
+                                      fade_start=None, stop_at=None):
+        """Handle audio position changes and volume fading.
+
+        fade_start/stop_at override the default 30%/60% cut, e.g. with a natural pause.
+        """
+        if aya_duration and play_begining_of_aya_is_true:
+            current_position = float(self.get_current_position())
+            thirty_percent = aya_duration * 0.3 if fade_start is None else fade_start
+            sixty_percent = aya_duration * 0.6 if stop_at is None else stop_at
+
+            print(f"[DEBUG] Position: {current_position:.2f}/{aya_duration:.2f} (30%={thirty_percent:.2f}, 60%={sixty_percent:.2f})")
+
+            if current_position > sixty_percent:
+                self.pause()
+                play_begining_of_aya_is_true = False
+                audio_volume = 1.0
+                self.volume = audio_volume
+                self.update()
+                print("[DEBUG] Stopped at 60%, reset flag to False and volume to 1.0")
+            elif current_position > thirty_percent:
+                if current_position - self.last_volume_update >= 0.1:
+                    self.last_volume_update = current_position
+
+                    fade_position = current_position - thirty_percent
+                    fade_period = sixty_percent - thirty_percent
+
+                    print(f"[DEBUG] Current volume before fade: {audio_volume:.3f}")
+                    fade_progress = fade_position / fade_period
+                    fade_factor = (1 - fade_progress) ** 2
+                    audio_volume = max(0.0, min(1.0, fade_factor))
+                    self.volume = audio_volume
+                    self.update()
+                    print(f"[DEBUG] Volume decreased to: {audio_volume:.3f}")
+
+    def play_current(self, audio_volume=1.0, speed=1):
+        """Play the current audio with passed volume."""
+        print("Playing current audio")
+        if self:
+            self.volume = audio_volume
+            print(self.playback_rate)
+            self.playback_rate = speed
+            self.update()
+            if self.start_offset:
+                self.seek(int(self.start_offset))
+                self.resume()
+            else:
+                self.play()
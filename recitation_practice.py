@@ -0,0 +1,148 @@
+# File: recitation_practice.py
+import argparse
+import os
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from functools import lru_cache
+from typing import List, Dict, Optional
+from audio_features import load_audio, mfcc, banded_dtw, DEFAULT_SAMPLE_RATE, HOP_MS
+from db_functions import load_aya_data
+
+RECORDING_EXTENSIONS = ('.wav', '.mp3', '.m4a', '.ogg', '.flac', '.webm')
+SCORE_SCALE = 2.0            # path cost at which the score drops to ~37/100
+DEVIATION_THRESHOLD = 3.0    # smoothed per-frame distance flagged as a deviation
+MIN_DEVIATION_MS = 150
+SMOOTHING_MS = 150
+
+
+@lru_cache(maxsize=64)
+def _reference_features(path: str, mtime: float) -> np.ndarray:
+    """Reference MFCCs, cached per file version so a session reuses them."""
+    return mfcc(load_audio(path, DEFAULT_SAMPLE_RATE))
+
+
+def _deviation_regions(result, threshold: float, min_ms: int) -> List[Dict]:
+    """Group consecutive high-cost path steps into time-aligned regions."""
+    window = max(1, SMOOTHING_MS // HOP_MS)
+    smoothed = np.convolve(result.step_costs, np.ones(window) / window, mode='same')
+    flagged = np.concatenate(([False], smoothed > threshold, [False]))
+    edges = np.flatnonzero(np.diff(flagged.astype(np.int8)))
+    regions = []
+    for start, stop in zip(edges[::2], edges[1::2]):
+        ref_start, ref_end = result.path_x[start], result.path_x[stop - 1] + 1
+        if (ref_end - ref_start) * HOP_MS < min_ms:
+            continue
+        regions.append({
+            'reference_start_ms': int(ref_start * HOP_MS),
+            'reference_end_ms': int(ref_end * HOP_MS),
+            'user_start_ms': int(result.path_y[start] * HOP_MS),
+            'user_end_ms': int((result.path_y[stop - 1] + 1) * HOP_MS),
+            'severity': round(float(smoothed[start:stop].mean()), 3),
+        })
+    return regions
+
+
+def score_recording(user_path: str, reference_path: str, radius: float = 0.1,
+                    threshold: float = DEVIATION_THRESHOLD,
+                    min_deviation_ms: int = MIN_DEVIATION_MS) -> Dict:
+    """Score a user recording against the reference aya audio."""
+    started = time.perf_counter()
+    reference = _reference_features(os.path.abspath(reference_path), os.path.getmtime(reference_path))
+    user = mfcc(load_audio(user_path, DEFAULT_SAMPLE_RATE))
+    result = banded_dtw(reference, user, radius=radius)
+
+    return {
+        'recording': user_path,
+        'reference': reference_path,
+        'score': round(100.0 * float(np.exp(-result.normalized_cost / SCORE_SCALE)), 1),
+        'normalized_cost': round(result.normalized_cost, 4),
+        'reference_ms': len(reference) * HOP_MS,
+        'user_ms': len(user) * HOP_MS,
+        'regions': _deviation_regions(result, threshold, min_deviation_ms),
+        'elapsed_s': round(time.perf_counter() - started, 4),
+    }
+
+
+def build_reference_index(aya_data: List[Dict]) -> Dict[str, str]:
+    """Map catalog audio file stems (e.g. 002017_1) to their audio paths."""
+    return {os.path.splitext(os.path.basename(item['audio']))[0]: item['audio'] for item in aya_data}
+
+
+def match_reference(recording_name: str, by_stem: Dict[str, str]) -> Optional[str]:
+    """Find the reference audio for a recording named after its aya file (e.g. 002017_1_take2.wav)."""
+    stem = os.path.splitext(os.path.basename(recording_name))[0]
+    # Prefer the longest catalog stem the recording name starts with, so 002017_1 beats 002017
+    for length in range(len(stem), 5, -1):
+        if stem[:length] in by_stem:
+            return by_stem[stem[:length]]
+    return None
+
+
+def _score_pair(pair):
+    user_path, reference_path = pair
+    try:
+        return score_recording(user_path, reference_path)
+    except Exception as e:
+        return {'recording': user_path, 'reference': reference_path, 'error': str(e)}
+
+
+def score_session(recordings_dir: str, aya_data: Optional[List[Dict]] = None, workers: int = 1) -> List[Dict]:
+    """Score every recording in a directory against its matching reference aya."""
+    print(f"\n=== Scoring session in {recordings_dir} ===")
+    if aya_data is None:
+        aya_data = load_aya_data()
+
+    by_stem = build_reference_index(aya_data)
+    pairs = []
+    for name in sorted(os.listdir(recordings_dir)):
+        if not name.lower().endswith(RECORDING_EXTENSIONS):
+            continue
+        reference = match_reference(name, by_stem)
+        if reference is None:
+            print(f"No reference aya found for recording: {name}")
+            continue
+        pairs.append((os.path.join(recordings_dir, name), reference))
+
+    if workers > 1:
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            results = list(pool.map(_score_pair, pairs))
+    else:
+        results = [_score_pair(pair) for pair in pairs]
+
+    print(f"Scored {len(results)} recordings")
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Score recitation practice recordings against reference ayas.")
+    parser.add_argument('recording', nargs='?', help="User recording to score")
+    parser.add_argument('--reference', help="Reference aya audio (defaults to catalog match by file name)")
+    parser.add_argument('--session', help="Directory of recordings to score in batch")
+    parser.add_argument('--workers', type=int, default=1)
+    args = parser.parse_args()
+
+    if args.session:
+        results = score_session(args.session, workers=args.workers)
+    elif args.recording:
+        reference = args.reference
+        if reference is None:
+            reference = match_reference(args.recording, build_reference_index(load_aya_data()))
+        if reference is None:
+            parser.error("Could not match the recording to an aya; pass --reference")
+        results = [score_recording(args.recording, reference)]
+    else:
+        parser.error("Pass a recording or --session directory")
+
+    for result in results:
+        if 'error' in result:
+            print(f"{result['recording']}: ERROR {result['error']}")
+            continue
+        print(f"{result['recording']}: score {result['score']} ({result['elapsed_s']}s)")
+        for region in result['regions']:
+            print(f"  deviation {region['reference_start_ms']}-{region['reference_end_ms']}ms "
+                  f"(you: {region['user_start_ms']}-{region['user_end_ms']}ms) severity {region['severity']}")
+
+
+if __name__ == "__main__":
+    main()
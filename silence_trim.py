@@ -0,0 +1,184 @@
+# File: silence_trim.py
+import argparse
+import json
+import os
+import time
+import traceback
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Dict, Optional
+from audio_features import load_audio, frame_energy_db, DEFAULT_SAMPLE_RATE, HOP_MS, FRAME_MS
+from db_functions import get_db_connection, load_aya_data, ASSET_DIR
+from asset_scan import catalog_files, changed_files
+
+SILENCE_DROP_DB = 35.0     # frames this far below the speech level count as silence
+SILENCE_FLOOR_DB = -60.0   # anything quieter than this is always silence
+
+
+def init_trim_table(db_path: str = None) -> None:
+    """Create the trim offsets table if it doesn't exist."""
+    with get_db_connection(db_path) as conn:
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS aya_trim (
+            audio TEXT,
+            segment INTEGER,
+            segment_start_ms INTEGER,
+            segment_end_ms INTEGER,
+            trim_start_ms INTEGER,
+            trim_end_ms INTEGER,
+            size INTEGER,
+            mtime REAL,
+            PRIMARY KEY (audio, segment)
+        );
+        ''')
+        conn.commit()
+
+
+def find_trim(energy_db: np.ndarray, hop_ms: int = HOP_MS, drop_db: float = SILENCE_DROP_DB) -> Optional[tuple]:
+    """Return (start_ms, end_ms) of the audible part, or None if it is all silence."""
+    if len(energy_db) == 0:
+        return None
+    threshold = max(np.percentile(energy_db, 95) - drop_db, SILENCE_FLOOR_DB)
+    audible = np.flatnonzero(energy_db > threshold)
+    if len(audible) == 0:
+        return None
+    return int(audible[0] * hop_ms), int(audible[-1] * hop_ms + FRAME_MS)
+
+
+def scan_file(path: str, segments: List[tuple] = ()) -> List[tuple]:
+    """Trim offsets for the whole file (segment 0) and each virtual segment.
+
+    Returns (segment, segment_start_ms, segment_end_ms, trim_start_ms, trim_end_ms)
+    with all offsets relative to the start of the file.
+    """
+    samples = load_audio(path, DEFAULT_SAMPLE_RATE)
+    energy = frame_energy_db(samples, DEFAULT_SAMPLE_RATE)
+    duration_ms = int(len(samples) * 1000 / DEFAULT_SAMPLE_RATE)
+
+    rows = []
+    for segment, (start_ms, end_ms) in enumerate([(0, duration_ms)] + list(segments)):
+        first, last = start_ms // HOP_MS, min(len(energy), end_ms // HOP_MS)
+        trim = find_trim(energy[first:last])
+        if trim is None:
+            trim = (0, end_ms - start_ms)
+        rows.append((segment, start_ms, end_ms, start_ms + trim[0], min(end_ms, start_ms + trim[1])))
+    return rows
+
+
+def load_virtual_segments(splits_path: str) -> Dict[str, List[tuple]]:
+    """Read a splits file in the audio_splits.json format: source file -> [(split file, start_ms, end_ms)].
+
+    The split file names (002001_1.mp3) are the ones the catalog refers to.
+    """
+    with open(splits_path, 'r', encoding='utf-8') as f:
+        data = json.load(f)
+    return {
+        audio: [(split['split_file'], split['start_ms'], split['end_ms']) for split in info.get('splits', [])]
+        for audio, info in data.get('files', {}).items()
+    }
+
+
+def split_trims(rows: List[tuple], splits: List[tuple]) -> Dict[str, tuple]:
+    """Turn scan_file() segment rows of a source into a segment 0 row per split file, relative to that file."""
+    trims = {}
+    for (segment, start_ms, end_ms, trim_start_ms, trim_end_ms), (split_file, _, _) in zip(rows[1:], splits):
+        trims[split_file] = (0, 0, end_ms - start_ms, trim_start_ms - start_ms, trim_end_ms - start_ms)
+    return trims
+
+
+def store_trim(conn, audio: str, size: int, mtime: float, rows: List[tuple]) -> None:
+    """Replace the stored trim rows of one file with a fresh scan_file() result (not committed)."""
+    conn.execute('DELETE FROM aya_trim WHERE audio = ?', (audio,))
+    conn.executemany(
+        'INSERT INTO aya_trim (audio, segment, segment_start_ms, segment_end_ms, trim_start_ms, trim_end_ms, size, mtime) '
+        'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+        [(audio, *row, size, mtime) for row in rows]
+    )
+
+
+def _scan_job(job):
+    audio, path, segments = job
+    try:
+        return audio, scan_file(path, segments), None
+    except Exception as e:
+        return audio, None, str(e)
+
+
+def scan_catalog(db_path: str = None, splits_path: str = None, workers: int = None, force: bool = False,
+                 asset_dir: str = ASSET_DIR) -> Dict:
+    """Record trim offsets for every new or changed catalog audio file, in parallel.
+
+    With a splits file, catalog files cut from a source listed there are
+    trimmed from one decode of the source instead of one decode each; their
+    rows are stored under the catalog names, relative to the split files,
+    and track the source's size/mtime.
+    """
+    print("\n=== Scanning aya silence ===")
+    started = time.perf_counter()
+    init_trim_table(db_path)
+    files = catalog_files(load_aya_data(db_path))
+    segments = {}
+    sources = {}
+    if splits_path:
+        for source, splits in load_virtual_segments(splits_path).items():
+            path = os.path.abspath(os.path.join(asset_dir, source))
+            splits = [split for split in splits if split[0] in files]
+            if splits and os.path.exists(path):
+                segments[source] = splits
+                sources[source] = path
+    via_source = {split[0] for splits in segments.values() for split in splits}
+
+    with get_db_connection(db_path) as conn:
+        scanned = {} if force else {
+            row[0]: (row[1], row[2])
+            for row in conn.execute('SELECT audio, size, mtime FROM aya_trim WHERE segment = 0')
+        }
+    stale = changed_files({name: path for name, path in files.items() if name not in via_source}, scanned)
+    stale += changed_files(sources, scanned)
+    print(f"{len(stale)} files need scanning")
+
+    file_info = {audio: (size, mtime) for audio, _, size, mtime in stale}
+    done = failed = 0
+    saved_ms = 0
+    with ProcessPoolExecutor(max_workers=workers) as pool, get_db_connection(db_path) as conn:
+        futures = [pool.submit(_scan_job, (audio, path, [(start_ms, end_ms) for _, start_ms, end_ms in segments.get(audio, [])]))
+                   for audio, path, _, _ in stale]
+        for future in as_completed(futures):
+            audio, rows, error = future.result()
+            if error:
+                failed += 1
+                print(f"Error scanning {audio}: {error}")
+                continue
+            size, mtime = file_info[audio]
+            store_trim(conn, audio, size, mtime, rows[:1])
+            for split_file, row in split_trims(rows, segments.get(audio, [])).items():
+                store_trim(conn, split_file, size, mtime, [row])
+            _, start_ms, end_ms, trim_start_ms, trim_end_ms = rows[0]
+            saved_ms += (trim_start_ms - start_ms) + (end_ms - trim_end_ms)
+            done += 1
+            if done % 500 == 0:
+                conn.commit()
+                print(f"Scanned {done}/{len(stale)} files")
+        conn.commit()
+
+    elapsed = time.perf_counter() - started
+    print(f"Silence scan complete: {done} scanned, {failed} failed in {elapsed:.1f}s, "
+          f"{saved_ms / 1000:.1f}s of silence found")
+    return {'scanned': done, 'failed': failed, 'silence_ms': saved_ms, 'elapsed_s': elapsed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Record leading/trailing silence trim offsets for every aya file.")
+    parser.add_argument('--splits', help="Virtual segments in the audio_splits.json format")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument('--force', action='store_true', help="Re-scan every file")
+    args = parser.parse_args()
+    try:
+        scan_catalog(splits_path=args.splits, workers=args.workers, force=args.force)
+    except Exception:
+        print(traceback.format_exc())
+        raise
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,195 @@
+# File: similarity_search.py
+import argparse
+import os
+import time
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Tuple
+from audio_features import load_audio, mfcc, DEFAULT_SAMPLE_RATE
+from db_functions import load_aya_data
+
+EMBEDDINGS_PATH = 'aya_embeddings.npy'
+TIME_SLICES = 4      # mean MFCCs over this many equal parts keeps coarse word order
+LSH_TABLES = 16
+LSH_BITS = 8
+
+
+def embed_audio(path: str) -> np.ndarray:
+    """Fixed-size embedding: MFCC mean, std and per-slice means of one aya."""
+    features = mfcc(load_audio(path, DEFAULT_SAMPLE_RATE), normalize=False)
+    slices = np.array_split(features, TIME_SLICES)
+    parts = [features.mean(axis=0), features.std(axis=0)]
+    parts += [part.mean(axis=0) if len(part) else features.mean(axis=0) for part in slices]
+    return np.concatenate(parts).astype(np.float32)
+
+
+def _embed_job(path):
+    try:
+        return embed_audio(path)
+    except Exception as e:
+        print(f"Error embedding {path}: {e}")
+        return None
+
+
+def build_embeddings(output_path: str = EMBEDDINGS_PATH, db_path: str = None, workers: int = None) -> np.ndarray:
+    """Embed every catalog aya in parallel and save one contiguous float32 matrix plus its ids."""
+    print("\n=== Building aya embeddings ===")
+    started = time.perf_counter()
+    aya_data = load_aya_data(db_path)
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        vectors = list(pool.map(_embed_job, [item['audio'] for item in aya_data], chunksize=32))
+
+    dim = next((v.shape[0] for v in vectors if v is not None), None)
+    if dim is None:
+        raise ValueError(f"None of the {len(aya_data)} catalog ayas could be embedded; check that the audio files exist")
+    keep = [i for i, v in enumerate(vectors) if v is not None]
+    matrix = np.empty((len(keep), dim), dtype=np.float32)
+    for row, i in enumerate(keep):
+        matrix[row] = vectors[i]
+
+    # Standardise each dimension over the corpus, then L2-normalise so dot product is cosine similarity
+    matrix -= matrix.mean(axis=0)
+    matrix /= np.maximum(matrix.std(axis=0), 1e-8)
+    matrix /= np.maximum(np.linalg.norm(matrix, axis=1, keepdims=True), 1e-8)
+
+    np.save(output_path, np.ascontiguousarray(matrix))
+    np.save(_ids_path(output_path), np.array([aya_data[i]['id'] for i in keep], dtype=np.int64))
+    print(f"Embedded {len(keep)}/{len(aya_data)} ayas ({dim} dims) in {time.perf_counter() - started:.1f}s")
+    return matrix
+
+
+def _ids_path(embeddings_path: str) -> str:
+    return os.path.splitext(embeddings_path)[0] + '_ids.npy'
+
+
+class ExactIndex:
+    """Brute-force cosine search over the full embedding matrix."""
+
+    def __init__(self, matrix: np.ndarray):
+        self.matrix = matrix
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        scores = self.matrix @ query
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return top, scores[top]
+
+
+class LSHIndex:
+    """Random-hyperplane LSH: each table hashes a vector to the sign pattern of LSH_BITS projections.
+
+    Buckets are stored as sorted code arrays so a lookup is two searchsorted calls per table;
+    candidates from all tables are re-ranked exactly.
+    """
+
+    def __init__(self, matrix: np.ndarray, tables: int = LSH_TABLES, bits: int = LSH_BITS, seed: int = 0):
+        rng = np.random.default_rng(seed)
+        self.matrix = matrix
+        self.planes = rng.standard_normal((tables, matrix.shape[1], bits)).astype(np.float32)
+        self.weights = (1 << np.arange(bits)).astype(np.int64)
+        self.sorted_codes = []
+        self.order = []
+        for table in range(tables):
+            codes = self._codes(matrix, table)
+            order = np.argsort(codes, kind='stable')
+            self.order.append(order)
+            self.sorted_codes.append(codes[order])
+
+    def _codes(self, vectors: np.ndarray, table: int) -> np.ndarray:
+        return ((vectors @ self.planes[table]) > 0).astype(np.int64) @ self.weights
+
+    def search(self, query: np.ndarray, k: int) -> Tuple[np.ndarray, np.ndarray]:
+        codes = ((np.einsum('d,tdb->tb', query, self.planes) > 0).astype(np.int64) @ self.weights)
+        buckets = []
+        for table, code in enumerate(codes):
+            lo = np.searchsorted(self.sorted_codes[table], code, side='left')
+            hi = np.searchsorted(self.sorted_codes[table], code, side='right')
+            buckets.append(self.order[table][lo:hi])
+        candidates = np.unique(np.concatenate(buckets))
+        if len(candidates) == 0:
+            return candidates, np.empty(0, dtype=np.float32)
+        scores = self.matrix[candidates] @ query
+        k = min(k, len(scores))
+        top = np.argpartition(-scores, k - 1)[:k]
+        top = top[np.argsort(-scores[top])]
+        return candidates[top], scores[top]
+
+
+class AyaSimilarity:
+    """Find similar-sounding ayas by catalog id."""
+
+    def __init__(self, embeddings_path: str = EMBEDDINGS_PATH):
+        self.matrix = np.load(embeddings_path, mmap_mode='r')
+        self.ids = np.load(_ids_path(embeddings_path))
+        self.row_of = {int(aya_id): row for row, aya_id in enumerate(self.ids)}
+        self.exact = ExactIndex(self.matrix)
+        self.approximate = LSHIndex(np.asarray(self.matrix))
+
+    def similar(self, aya_id: int, k: int = 10, approximate: bool = False) -> List[Tuple[int, float]]:
+        """Return the k most similar (aya id, cosine similarity) pairs, excluding the aya itself.
+
+        Exact search is already sub-millisecond for one reciter; LSH pays off on multi-reciter catalogs.
+        """
+        row = self.row_of[aya_id]
+        index = self.approximate if approximate else self.exact
+        rows, scores = index.search(self.matrix[row], k + 1)
+        return [(int(self.ids[r]), float(s)) for r, s in zip(rows, scores) if r != row][:k]
+
+
+def benchmark(similarity: AyaSimilarity, queries: int = 200, k: int = 10, seed: int = 0) -> Dict:
+    """Compare exact and LSH search on recall@k and per-query latency."""
+    rng = np.random.default_rng(seed)
+    rows = rng.choice(len(similarity.ids), size=min(queries, len(similarity.ids)), replace=False)
+    timings = {'exact': [], 'approximate': []}
+    recall = []
+    for row in rows:
+        query = similarity.matrix[row]
+        started = time.perf_counter()
+        exact_rows, _ = similarity.exact.search(query, k + 1)
+        timings['exact'].append(time.perf_counter() - started)
+        started = time.perf_counter()
+        approx_rows, _ = similarity.approximate.search(query, k + 1)
+        timings['approximate'].append(time.perf_counter() - started)
+        truth = set(exact_rows.tolist()) - {row}
+        recall.append(len(truth & set(approx_rows.tolist())) / max(1, len(truth)))
+
+    report = {'queries': len(rows), 'k': k, 'recall': round(float(np.mean(recall)), 4)}
+    for name, values in timings.items():
+        values = np.array(values) * 1000
+        report[f'{name}_mean_ms'] = round(float(values.mean()), 3)
+        report[f'{name}_p95_ms'] = round(float(np.percentile(values, 95)), 3)
+    return report
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Acoustic similarity search across ayas.")
+    parser.add_argument('command', choices=['build', 'query', 'bench'])
+    parser.add_argument('--id', type=int, help="Catalog id of the aya to query")
+    parser.add_argument('-k', type=int, default=10)
+    parser.add_argument('--approximate', action='store_true', help="Use LSH instead of brute-force search")
+    parser.add_argument('--embeddings', default=EMBEDDINGS_PATH)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+
+    if args.command == 'build':
+        build_embeddings(args.embeddings, workers=args.workers)
+        return
+
+    similarity = AyaSimilarity(args.embeddings)
+    if args.command == 'query':
+        if args.id is None:
+            parser.error("query needs --id")
+        names = {item['id']: f"{item['sura_name']} {item['aya']}" for item in load_aya_data()}
+        started = time.perf_counter()
+        results = similarity.similar(args.id, args.k, approximate=args.approximate)
+        print(f"Similar to {names.get(args.id, args.id)} ({(time.perf_counter() - started) * 1000:.2f}ms):")
+        for aya_id, score in results:
+            print(f"  {aya_id:5d} {names.get(aya_id, '')}  {score:.3f}")
+    else:
+        for key, value in benchmark(similarity, k=args.k).items():
+            print(f"{key}: {value}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,180 @@
+# File: state.py
+import threading
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, List
+
+# Slices of app state and their initial values; a subscriber names the slice and fields it renders
+SLICES = {
+    'navigation': {'index': 0},
+    'playback': {'speed': 1.0, 'play_beginning': False, 'aya_duration': None},
+}
+
+
+def payload_size(control) -> int:
+    """Rough size of the properties a Flet control will send on its next update.
+
+    Flet keeps each property as (value, dirty); only dirty ones go over the
+    websocket, so this is what an update of the control costs, give or take
+    the JSON framing.
+    """
+    attrs = getattr(control, '_Control__attrs', None) or {}
+    size = 0
+    for name, entry in attrs.items():
+        if isinstance(entry, tuple) and len(entry) == 2 and entry[1]:
+            size += len(name) + len(str(entry[0]))
+    return size
+
+
+def page_flush(page) -> Callable[[List], None]:
+    """Send the controls a commit touched in one page.update() round trip.
+
+    The page itself is listed when its overlay changed (a new audio player),
+    in which case the whole page is diffed.
+    """
+    def flush(controls):
+        if any(control is page for control in controls):
+            page.update()
+        else:
+            page.update(*controls)
+    return flush
+
+
+class StateStore:
+    """Central app state split into slices, with change subscriptions and batched commits.
+
+    Setting fields records what actually changed; at commit time every
+    subscriber whose fields changed re-renders and returns the controls it
+    touched, and all of them go to the client in a single flush. Outside a
+    batch() each set() commits on its own.
+    """
+
+    def __init__(self, slices: Dict[str, Dict] = None, flush: Callable[[List], None] = None):
+        self.slices = {name: dict(values) for name, values in (slices or SLICES).items()}
+        self.flush = flush  # controls -> None, e.g. page_flush(page); None while there is no UI
+        self.subscribers = []  # (slice name, fields or None for all, callback)
+        self.pending = {}  # slice name -> names of fields changed since the last commit
+        self.depth = 0
+        self.lock = threading.RLock()
+        self.commits = 0
+        self.messages = 0
+        self.controls_sent = 0
+        self.bytes_sent = 0
+        self.by_slice = {}  # slice name -> commits, messages, bytes of commits that changed it
+        self.last_commit = None
+
+    def get(self, slice_name: str, field: str = None) -> Any:
+        values = self.slices[slice_name]
+        return values if field is None else values[field]
+
+    def set(self, slice_name: str, **values) -> None:
+        """Change fields of a slice; subscribers only hear about values that differ."""
+        with self.lock:
+            current = self.slices[slice_name]
+            changed = [field for field, value in values.items() if current[field] != value]
+            if not changed:
+                return
+            for field in changed:
+                current[field] = values[field]
+            self.pending.setdefault(slice_name, set()).update(changed)
+            if self.depth == 0:
+                self.commit()
+
+    def set_silently(self, slice_name: str, **values) -> None:
+        """Change fields without notifying subscribers, e.g. re-indexing the same aya."""
+        with self.lock:
+            self.slices[slice_name].update(values)
+
+    def touch(self, slice_name: str, *fields: str) -> None:
+        """Mark fields changed so their subscribers re-render with the same values."""
+        with self.lock:
+            self.pending.setdefault(slice_name, set()).update(fields or self.slices[slice_name])
+            if self.depth == 0:
+                self.commit()
+
+    @contextmanager
+    def batch(self):
+        """Group several set() calls into one commit and one round trip."""
+        with self.lock:
+            self.depth += 1
+            try:
+                yield self
+            finally:
+                self.depth -= 1
+                if self.depth == 0 and self.pending:
+                    self.commit()
+
+    def subscribe(self, slice_name: str, callback: Callable[[Dict, set], Iterable],
+                  fields: Iterable[str] = None) -> Callable[[], None]:
+        """Call callback(slice values, changed fields) on commits that change the given fields.
+
+        The callback returns the controls it modified (or None). Returns a
+        function that removes the subscription.
+        """
+        subscriber = (slice_name, frozenset(fields) if fields else None, callback)
+        with self.lock:
+            self.subscribers.append(subscriber)
+
+        def unsubscribe():
+            with self.lock:
+                if subscriber in self.subscribers:
+                    self.subscribers.remove(subscriber)
+        return unsubscribe
+
+    def commit(self) -> None:
+        with self.lock:
+            started = time.perf_counter()
+            slices_changed = set()
+            controls = []
+            # A subscriber may set more state while rendering; keep going until nothing is pending
+            while self.pending:
+                changes, self.pending = self.pending, {}
+                slices_changed.update(changes)
+                for slice_name, fields, callback in list(self.subscribers):
+                    changed = changes.get(slice_name)
+                    if not changed or (fields is not None and not fields & changed):
+                        continue
+                    for control in callback(self.slices[slice_name], changed) or ():
+                        if not any(control is seen for seen in controls):
+                            controls.append(control)
+            self.commits += 1
+
+            size = sum(payload_size(control) for control in controls)
+            messages = 0
+            if controls and self.flush:
+                self.flush(controls)
+                messages = 1
+                self.messages += 1
+                self.controls_sent += len(controls)
+                self.bytes_sent += size
+            for slice_name in slices_changed:
+                counters = self.by_slice.setdefault(slice_name, {'commits': 0, 'messages': 0, 'bytes': 0})
+                counters['commits'] += 1
+                counters['messages'] += messages
+                counters['bytes'] += size if messages else 0
+            self.last_commit = {
+                'slices': sorted(slices_changed),
+                'controls': len(controls),
+                'messages': messages,
+                'bytes': size if messages else 0,
+                'elapsed_ms': round((time.perf_counter() - started) * 1000, 2),
+            }
+
+    def stats(self) -> Dict:
+        with self.lock:
+            per_slice = {}
+            for slice_name, counters in self.by_slice.items():
+                commits = counters['commits']
+                per_slice[slice_name] = dict(
+                    counters,
+                    messages_per_commit=round(counters['messages'] / commits, 2),
+                    bytes_per_commit=round(counters['bytes'] / commits),
+                )
+            return {
+                'commits': self.commits,
+                'messages': self.messages,
+                'controls': self.controls_sent,
+                'bytes': self.bytes_sent,
+                'by_slice': per_slice,
+                'last_commit': self.last_commit,
+            }
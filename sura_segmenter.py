@@ -0,0 +1,214 @@
+# File: sura_segmenter.py
+import argparse
+import json
+import os
+import time
+import traceback
+import numpy as np
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from typing import List, Dict
+from audio_features import load_audio, mfcc_chunked, frame_energy_db, banded_dtw, HOP_MS
+from db_functions import get_db_connection, load_aya_data
+
+SAMPLE_RATE = 8000          # speech alignment doesn't need more bandwidth
+DOWNSAMPLE = 8              # pool 10ms MFCC frames into 80ms alignment frames
+BAND_S = 90                 # how far a reciter may drift from a proportional tempo
+SNAP_WINDOW_MS = 1500       # max distance to move a boundary onto a silence
+MIN_SILENCE_MS = 150
+SILENCE_DROP_DB = 30.0
+LOW_CONFIDENCE = 0.5
+
+
+def init_segment_table(db_path: str = None) -> None:
+    """Create the reciter segment offsets table if it doesn't exist."""
+    with get_db_connection(db_path) as conn:
+        conn.execute('''
+        CREATE TABLE IF NOT EXISTS reciter_segments (
+            reciter TEXT,
+            audio TEXT,
+            source TEXT,
+            start_ms INTEGER,
+            end_ms INTEGER,
+            confidence REAL,
+            flagged INTEGER,
+            PRIMARY KEY (reciter, audio)
+        );
+        ''')
+        conn.commit()
+
+
+def _pooled_features(samples: np.ndarray, downsample: int) -> np.ndarray:
+    """MFCCs averaged over groups of `downsample` frames (not normalized)."""
+    features = mfcc_chunked(samples, SAMPLE_RATE)
+    usable = len(features) // downsample * downsample
+    if usable == 0:
+        return features.mean(axis=0, keepdims=True)
+    return features[:usable].reshape(-1, downsample, features.shape[1]).mean(axis=1)
+
+
+def _normalize(features: np.ndarray) -> np.ndarray:
+    features = features - features.mean(axis=0)
+    return features / np.maximum(features.std(axis=0), 1e-8)
+
+
+def _silences(energy_db: np.ndarray) -> np.ndarray:
+    """(start_frame, stop_frame) rows for every quiet run long enough to be a pause."""
+    speech_level = np.percentile(energy_db, 95)
+    quiet = np.concatenate(([False], energy_db < speech_level - SILENCE_DROP_DB, [False]))
+    edges = np.flatnonzero(np.diff(quiet.astype(np.int8))).reshape(-1, 2)
+    return edges[(edges[:, 1] - edges[:, 0]) * HOP_MS >= MIN_SILENCE_MS]
+
+
+def segment_sura(recording_path: str, reference_paths: List[str], downsample: int = DOWNSAMPLE,
+                 band_s: int = BAND_S) -> List[Dict]:
+    """Align a full-sura recording to per-aya reference audio and return one offset row per aya."""
+    reference_parts = [_pooled_features(load_audio(path, SAMPLE_RATE), downsample) for path in reference_paths]
+    reference_bounds = np.cumsum([0] + [len(part) for part in reference_parts])
+    reference = _normalize(np.concatenate(reference_parts))
+
+    samples = load_audio(recording_path, SAMPLE_RATE)
+    recording = _normalize(_pooled_features(samples, downsample))
+    energy = frame_energy_db(samples, SAMPLE_RATE)
+    duration_ms = int(len(samples) * 1000 / SAMPLE_RATE)
+    del samples
+
+    frame_ms = HOP_MS * downsample
+    result = banded_dtw(reference, recording, band=max(1, band_s * 1000 // frame_ms))
+
+    # First recording frame aligned to each reference aya boundary
+    inner = reference_bounds[1:-1]
+    first_step = np.searchsorted(result.path_x, inner)
+    boundaries_ms = result.path_y[first_step] * frame_ms
+
+    # Local alignment quality around each boundary, relative to the whole sura
+    window = max(1, 1000 // frame_ms)
+    typical = max(float(np.median(result.step_costs)), 1e-6)
+    local_cost = np.array([
+        result.step_costs[max(0, k - window):k + window].mean() for k in first_step
+    ]) / typical
+
+    silences = _silences(energy)
+    silence_mid_ms = (silences[:, 0] + silences[:, 1]) * HOP_MS / 2.0
+
+    snapped, confidence = [], []
+    for boundary, cost in zip(boundaries_ms, local_cost):
+        alignment_conf = float(np.exp(-max(0.0, cost - 1.0)))
+        if len(silence_mid_ms):
+            nearest = int(np.argmin(np.abs(silence_mid_ms - boundary)))
+            distance = abs(silence_mid_ms[nearest] - boundary)
+        else:
+            distance = np.inf
+        if distance <= SNAP_WINDOW_MS:
+            snapped.append(int(silence_mid_ms[nearest]))
+            confidence.append(alignment_conf * (1.0 - 0.5 * distance / SNAP_WINDOW_MS))
+        else:
+            # No pause nearby: keep the DTW boundary but don't trust it much
+            snapped.append(int(boundary))
+            confidence.append(alignment_conf * 0.4)
+
+    # Boundaries must stay ordered even if two ayas snapped onto the same pause
+    starts = np.maximum.accumulate([0] + snapped)
+    ends = list(starts[1:]) + [duration_ms]
+    edge_conf = [1.0] + confidence
+    rows = []
+    for k, path in enumerate(reference_paths):
+        start_ms, end_ms = int(starts[k]), int(ends[k])
+        conf = round(float(min(edge_conf[k], edge_conf[k + 1] if k + 1 < len(edge_conf) else 1.0)), 3)
+        rows.append({
+            'audio': os.path.basename(path),
+            'start_ms': start_ms,
+            'end_ms': end_ms,
+            'duration_ms': end_ms - start_ms,
+            'confidence': conf,
+            'low_confidence': conf < LOW_CONFIDENCE or end_ms <= start_ms,
+        })
+    return rows
+
+
+def _segment_job(job):
+    sura, recording_path, reference_paths, downsample, band_s = job
+    started = time.perf_counter()
+    try:
+        rows = segment_sura(recording_path, reference_paths, downsample, band_s)
+        return sura, recording_path, rows, None, time.perf_counter() - started
+    except Exception:
+        return sura, recording_path, None, traceback.format_exc(), time.perf_counter() - started
+
+
+def find_sura_recordings(recordings_dir: str) -> Dict[int, str]:
+    """Map sura numbers to full-sura recordings named like 002.mp3."""
+    recordings = {}
+    for name in sorted(os.listdir(recordings_dir)):
+        stem = os.path.splitext(name)[0]
+        if stem.isdigit() and 1 <= int(stem) <= 114:
+            recordings[int(stem)] = os.path.join(recordings_dir, name)
+    return recordings
+
+
+def segment_recordings(recordings_dir: str, reciter: str, output_path: str, db_path: str = None,
+                       workers: int = None, downsample: int = DOWNSAMPLE, band_s: int = BAND_S) -> Dict:
+    """Segment every full-sura recording in a directory against the catalog's reference ayas."""
+    print(f"\n=== Segmenting {reciter} recordings in {recordings_dir} ===")
+    started = time.perf_counter()
+    references = {}
+    for item in load_aya_data(db_path):
+        references.setdefault(item['sura'], []).append(item['audio'])
+
+    recordings = find_sura_recordings(recordings_dir)
+    jobs = [(sura, path, references[sura], downsample, band_s) for sura, path in recordings.items() if sura in references]
+    print(f"Found {len(jobs)} sura recordings to segment")
+
+    init_segment_table(db_path)
+    table = {
+        'config': {'reciter': reciter, 'downsample': downsample, 'band_s': band_s,
+                   'snap_window_ms': SNAP_WINDOW_MS, 'low_confidence': LOW_CONFIDENCE},
+        'files': {},
+    }
+    flagged = 0
+    # Largest suras first so they don't become the stragglers
+    jobs.sort(key=lambda job: len(job[2]), reverse=True)
+    with ProcessPoolExecutor(max_workers=workers) as pool, get_db_connection(db_path) as conn:
+        futures = [pool.submit(_segment_job, job) for job in jobs]
+        for future in as_completed(futures):
+            sura, recording_path, rows, error, elapsed = future.result()
+            if error:
+                print(f"Error segmenting sura {sura}: {error}")
+                continue
+            source = os.path.basename(recording_path)
+            table['files'][source] = {'sura': sura, 'splits': rows}
+            conn.executemany(
+                'INSERT OR REPLACE INTO reciter_segments (reciter, audio, source, start_ms, end_ms, confidence, flagged) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?)',
+                [(reciter, row['audio'], source, row['start_ms'], row['end_ms'], row['confidence'], int(row['low_confidence']))
+                 for row in rows]
+            )
+            conn.commit()
+            low = [row['audio'] for row in rows if row['low_confidence']]
+            flagged += len(low)
+            print(f"Sura {sura}: {len(rows)} ayas in {elapsed:.1f}s, {len(low)} low-confidence")
+            for audio in low:
+                print(f"  check boundary: {audio}")
+
+    with open(output_path, 'w', encoding='utf-8') as f:
+        json.dump(table, f, indent=2, ensure_ascii=False)
+
+    elapsed = time.perf_counter() - started
+    print(f"Segmentation complete: {len(table['files'])} suras in {elapsed:.1f}s, {flagged} boundaries flagged")
+    return {'suras': len(table['files']), 'flagged': flagged, 'elapsed_s': elapsed}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Cut full-sura recordings into aya offsets by aligning to the reference reciter.")
+    parser.add_argument('recordings_dir', help="Directory of full-sura recordings named NNN.mp3")
+    parser.add_argument('--reciter', required=True, help="Name stored with the offsets in aya.db")
+    parser.add_argument('--output', default='reciter_segments.json', help="Offset table in the audio_splits.json format")
+    parser.add_argument('--workers', type=int, default=None, help="Worker processes (default: all cores)")
+    parser.add_argument('--downsample', type=int, default=DOWNSAMPLE)
+    parser.add_argument('--band', type=int, default=BAND_S, help="Alignment band in seconds")
+    args = parser.parse_args()
+    segment_recordings(args.recordings_dir, args.reciter, args.output,
+                       workers=args.workers, downsample=args.downsample, band_s=args.band)
+
+
+if __name__ == "__main__":
+    main()
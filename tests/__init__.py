@@ -0,0 +1 @@
+# File: tests/__init__.py
@@ -0,0 +1,57 @@
+# File: tests/test_headless.py
+import contextlib
+import csv
+import os
+
+import pytest
+
+from catalog_import import CATALOG_COLUMNS, import_catalog
+from headless import HeadlessSession
+
+AYAS = 7
+DURATION_MS = 10000
+
+
+@pytest.fixture
+def session(tmp_path):
+    """Headless app on a one-sura catalog whose ayas all last DURATION_MS."""
+    csv_path = tmp_path / 'catalog.csv'
+    db_path = str(tmp_path / 'aya.db')
+    with open(csv_path, 'w', newline='', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=CATALOG_COLUMNS)
+        writer.writeheader()
+        for aya in range(1, AYAS + 1):
+            writer.writerow({'id': aya, 'audio': f"001{aya:03d}.mp3", 'image': f"1_{aya}.png", 'sura': 1,
+                             'aya': aya, 'aya_suffix': 0, 'sura_name': 'Al-Fatiha'})
+    durations = {f"001{aya:03d}.mp3": DURATION_MS for aya in range(1, AYAS + 1)}
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        import_catalog(str(csv_path), db_path)
+        yield HeadlessSession(db_path, durations=durations, tick_ms=100)
+
+
+def test_auto_advance_keeps_playing(session):
+    # Each aya takes its 10s plus the 40ms load, so a minute finishes five of them
+    report = session.run(1 / 60)
+    assert report['ayas_played'] == 5
+    assert (report['start_index'], report['end_index']) == (0, 5)
+    assert session.app.is_playing
+
+
+def test_play_beginning_stops_at_sixty_percent(session):
+    with open(os.devnull, 'w') as devnull, contextlib.redirect_stdout(devnull):
+        session.app.toggle_play_beginning_of_aya(None)
+    players = session.backend.players
+    index = session.app.current_index
+    session.run(1 / 60)
+    player = session.app.audio_player
+    assert player.state == 'paused'
+    assert DURATION_MS * 0.6 < player.position_ms <= DURATION_MS * 0.6 + 100
+    assert session.app.current_index == index
+    assert session.backend.players == players
+
+
+def test_position_is_saved_once_at_the_end(session):
+    from db_functions import get_current_aya
+    session.run(1 / 60)
+    assert session.position is None
+    assert get_current_aya(session.app.db_path) == session.app.aya_data[session.app.current_index]['id']
@@ -0,0 +1,49 @@
+# File: tests/test_navigation_scheduler.py
+import asyncio
+import threading
+import time
+
+from navigation_scheduler import NavigationScheduler
+
+
+def press(scheduler, presses, interval_s=0.005):
+    for step in range(1, presses + 1):
+        scheduler.request(step)
+        time.sleep(interval_s)
+    assert scheduler.wait_idle(5)
+
+
+def test_burst_loads_stay_bounded():
+    loaded = []
+    scheduler = NavigationScheduler(apply=lambda index: (loaded.append(index), time.sleep(0.04)))
+    try:
+        press(scheduler, 100)
+    finally:
+        scheduler.close()
+    assert loaded[-1] == 100
+    assert 1 <= len(loaded) <= 10
+
+
+def test_dispatched_loads_run_on_the_loop():
+    loop = asyncio.new_event_loop()
+    loop_thread = threading.Thread(target=loop.run_forever, daemon=True)
+    loop_thread.start()
+    threads = []
+    loaded = []
+
+    def apply(index):
+        threads.append(threading.current_thread())
+        loaded.append(index)
+        time.sleep(0.04)
+
+    scheduler = NavigationScheduler(apply=apply, dispatch=loop.call_soon_threadsafe)
+    try:
+        press(scheduler, 100)
+    finally:
+        scheduler.close()
+        loop.call_soon_threadsafe(loop.stop)
+        loop_thread.join(1)
+        loop.close()
+    assert loaded[-1] == 100
+    assert 1 <= len(loaded) <= 10
+    assert set(threads) == {loop_thread}
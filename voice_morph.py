@@ -0,0 +1,279 @@
+# File: voice_morph.py
+import argparse
+import hashlib
+import json
+import os
+import threading
+import time
+import wave
+import numpy as np
+from collections import OrderedDict
+from concurrent.futures import ProcessPoolExecutor
+from typing import List, Dict, Optional
+from audio_features import load_audio, frame_signal
+
+SAMPLE_RATE = 22050
+N_FFT = 1024
+HOP = 256
+CEPSTRUM_LIFTER = 30          # quefrency bins kept for the spectral envelope
+CACHE_DIR = 'morph_cache'
+CACHE_MAX_BYTES = 512 * 1024 * 1024
+
+
+def stft(samples: np.ndarray, n_fft: int = N_FFT, hop: int = HOP) -> np.ndarray:
+    """Complex STFT of shape (n_frames, n_fft // 2 + 1) with a Hann window."""
+    padded = np.pad(samples.astype(np.float32), (n_fft // 2, n_fft // 2 + hop))
+    return np.fft.rfft(frame_signal(padded, n_fft, hop) * np.hanning(n_fft).astype(np.float32), axis=1)
+
+
+def istft(spectrum: np.ndarray, length: int, n_fft: int = N_FFT, hop: int = HOP) -> np.ndarray:
+    """Weighted overlap-add inverse of stft(), vectorised over frames."""
+    window = np.hanning(n_fft)
+    frames = np.fft.irfft(spectrum, n=n_fft, axis=1) * window
+    n_frames = len(frames)
+    overlap = n_fft // hop
+    out = np.zeros((n_frames + overlap) * hop)
+    norm = np.zeros_like(out)
+    # Each hop-sized slice of every frame lands on a contiguous run of output blocks
+    for k in range(overlap):
+        block = frames[:, k * hop:(k + 1) * hop].reshape(-1)
+        out[k * hop:k * hop + len(block)] += block
+        norm[k * hop:k * hop + len(block)] += np.tile(window[k * hop:(k + 1) * hop] ** 2, n_frames)
+    out = out / np.maximum(norm, 1e-8)
+    return out[n_fft // 2:n_fft // 2 + length]
+
+
+def time_stretch(samples: np.ndarray, rate: float) -> np.ndarray:
+    """Phase-vocoder time stretch; rate > 1 makes the audio longer."""
+    spectrum = stft(samples)
+    n_frames, n_bins = spectrum.shape
+    steps = np.arange(0, n_frames - 1, 1.0 / rate)
+    base = steps.astype(int)
+    frac = (steps - base)[:, None]
+
+    magnitude = np.abs(spectrum)
+    magnitude = (1 - frac) * magnitude[base] + frac * magnitude[base + 1]
+
+    expected = 2 * np.pi * HOP * np.arange(n_bins) / N_FFT
+    phase = np.angle(spectrum)
+    advance = phase[base + 1] - phase[base] - expected
+    advance = advance - 2 * np.pi * np.round(advance / (2 * np.pi)) + expected
+    phase_out = np.concatenate([phase[:1], phase[0] + np.cumsum(advance[:-1], axis=0)])
+
+    return istft(magnitude * np.exp(1j * phase_out), int(round(len(samples) * rate)))
+
+
+def spectral_envelope(magnitude: np.ndarray) -> np.ndarray:
+    """Smooth per-frame spectral envelope from a low-quefrency cepstrum."""
+    cepstrum = np.fft.irfft(np.log(np.maximum(magnitude, 1e-8)), axis=1)
+    cepstrum[:, CEPSTRUM_LIFTER:-CEPSTRUM_LIFTER] = 0
+    return np.exp(np.fft.rfft(cepstrum, axis=1).real)
+
+
+def morph(samples: np.ndarray, semitones: float = 0.0, formant: float = 1.0) -> np.ndarray:
+    """Shift pitch by semitones and scale the formant envelope of the original by formant."""
+    ratio = 2.0 ** (semitones / 12.0)
+    shifted = samples
+    if semitones:
+        stretched = time_stretch(samples, ratio)
+        # Resample back to the original length: this raises the pitch by ratio
+        positions = np.linspace(0, len(stretched) - 1, len(samples))
+        shifted = np.interp(positions, np.arange(len(stretched)), stretched)
+
+    if semitones or formant != 1.0:
+        original = np.abs(stft(samples))
+        spectrum = stft(shifted)
+        frames = min(len(original), len(spectrum))
+        source_env = spectral_envelope(original[:frames])
+        bins = np.arange(source_env.shape[1])
+        # Target envelope: the original envelope with its frequency axis scaled by formant
+        target_env = np.stack([np.interp(bins / formant, bins, env) for env in source_env])
+        current_env = spectral_envelope(np.abs(spectrum[:frames]))
+        spectrum = spectrum[:frames] * (target_env / np.maximum(current_env, 1e-8))
+        shifted = istft(spectrum, len(samples))
+
+    peak = np.max(np.abs(shifted)) if len(shifted) else 0.0
+    return shifted / peak * 0.95 if peak > 0.95 else shifted
+
+
+def write_wav(path: str, samples: np.ndarray, sample_rate: int = SAMPLE_RATE) -> None:
+    """Write mono 16-bit PCM."""
+    pcm = (np.clip(samples, -1.0, 1.0) * 32767).astype('<i2')
+    with wave.open(path, 'wb') as f:
+        f.setnchannels(1)
+        f.setsampwidth(2)
+        f.setframerate(sample_rate)
+        f.writeframes(pcm.tobytes())
+
+
+def render_variant(source_path: str, output_path: str, semitones: float, formant: float) -> str:
+    """Render one morphed variant to output_path (written via a temporary file)."""
+    samples = load_audio(source_path, SAMPLE_RATE)
+    temp_path = f"{output_path}.{os.getpid()}.tmp"
+    write_wav(temp_path, morph(samples, semitones, formant))
+    os.replace(temp_path, output_path)
+    return output_path
+
+
+class MorphCache:
+    """Size-bounded directory of rendered variants, evicted least-recently-used first."""
+
+    def __init__(self, directory: str = CACHE_DIR, max_bytes: int = CACHE_MAX_BYTES):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self.lock = threading.Lock()
+        self.entries = OrderedDict()  # file name -> size, oldest first
+        self.total_bytes = 0
+        self._hashes = {}
+        os.makedirs(directory, exist_ok=True)
+        files = [entry for entry in os.scandir(directory) if entry.name.endswith('.wav')]
+        for entry in sorted(files, key=lambda e: e.stat().st_mtime):
+            self.entries[entry.name] = entry.stat().st_size
+            self.total_bytes += entry.stat().st_size
+
+    def content_hash(self, source_path: str) -> str:
+        """SHA-1 of the source audio, memoized per (path, size, mtime)."""
+        stat = os.stat(source_path)
+        key = (source_path, stat.st_size, stat.st_mtime)
+        if key not in self._hashes:
+            with open(source_path, 'rb') as f:
+                self._hashes[key] = hashlib.sha1(f.read()).hexdigest()
+        return self._hashes[key]
+
+    def key(self, source_path: str, params: Dict) -> str:
+        payload = self.content_hash(source_path) + json.dumps(params, sort_keys=True)
+        return hashlib.sha1(payload.encode('utf-8')).hexdigest() + '.wav'
+
+    def path_for(self, name: str) -> str:
+        return os.path.abspath(os.path.join(self.directory, name))
+
+    def get(self, source_path: str, params: Dict) -> Optional[str]:
+        """Return the cached variant path and mark it recently used, or None."""
+        return self.touch(self.key(source_path, params))
+
+    def touch(self, name: str) -> Optional[str]:
+        """Path of a cached variant by name, marked recently used, or None; reads no audio."""
+        with self.lock:
+            if name not in self.entries:
+                return None
+            self.entries.move_to_end(name)
+        path = self.path_for(name)
+        try:
+            os.utime(path)
+        except FileNotFoundError:
+            with self.lock:
+                self.total_bytes -= self.entries.pop(name, 0)
+            return None
+        return path
+
+    def add(self, name: str) -> None:
+        """Register a freshly rendered file and evict until under the byte budget."""
+        size = os.path.getsize(self.path_for(name))
+        with self.lock:
+            self.total_bytes += size - self.entries.pop(name, 0)
+            self.entries[name] = size
+            while self.total_bytes > self.max_bytes and len(self.entries) > 1:
+                evicted, evicted_size = self.entries.popitem(last=False)
+                self.total_bytes -= evicted_size
+                try:
+                    os.remove(self.path_for(evicted))
+                except FileNotFoundError:
+                    pass
+
+
+class MorphRenderScheduler:
+    """Renders variants for the sura being listened to in a background process pool.
+
+    focus() and resolve() run on the player setup path, so neither reads
+    audio: hashing the sura's sources to find their cache keys happens on a
+    queueing thread, and resolve() only looks up variants already known.
+    """
+
+    def __init__(self, cache: MorphCache, semitones: float = 0.0, formant: float = 1.0, workers: int = 2):
+        self.cache = cache
+        self.params = {'semitones': semitones, 'formant': formant}
+        self.pool = ProcessPoolExecutor(max_workers=workers)
+        self.lock = threading.Lock()  # pending and ready are also changed from the pool's callback threads
+        self.pending = {}
+        self.ready = {}  # source path -> cache name of its rendered variant
+        self.current_sura = None
+        self.generation = 0  # bumped per focus so an outdated queueing thread stops
+
+    def resolve(self, source_path: str) -> str:
+        """Cached variant if it has been rendered, otherwise the original file."""
+        with self.lock:
+            name = self.ready.get(source_path)
+        return (name and self.cache.touch(name)) or source_path
+
+    def focus(self, aya_items: List[Dict], sura: int) -> None:
+        """Cancel renders for other suras and queue this sura's missing variants in order."""
+        if sura == self.current_sura:
+            return
+        self.current_sura = sura
+        with self.lock:
+            self.generation += 1
+            generation = self.generation
+            pending = list(self.pending.values())
+            self.pending = {}
+        # cancel() runs _rendered right away, so not while holding the lock or iterating pending
+        for future in pending:
+            future.cancel()
+        threading.Thread(target=self._queue, args=(list(aya_items), sura, generation), daemon=True).start()
+
+    def _queue(self, aya_items: List[Dict], sura: int, generation: int) -> None:
+        queued = 0
+        for item in aya_items:
+            source = item['audio']
+            try:
+                name = self.cache.key(source, self.params)
+            except OSError as e:
+                print(f"Error reading {source} for voice morph: {e}")
+                continue
+            with self.lock:
+                if generation != self.generation:
+                    return
+                if self.cache.touch(name):
+                    self.ready[source] = name
+                    continue
+                if name in self.pending:
+                    continue
+                future = self.pool.submit(render_variant, source, self.cache.path_for(name),
+                                          self.params['semitones'], self.params['formant'])
+                self.pending[name] = future
+            future.add_done_callback(lambda f, name=name, source=source: self._rendered(name, source, f))
+            queued += 1
+        print(f"Queued {queued} voice morph renders for sura {sura}")
+
+    def _rendered(self, name, source, future):
+        with self.lock:
+            if self.pending.get(name) is future:
+                del self.pending[name]
+        if future.cancelled():
+            return
+        if future.exception():
+            print(f"Error rendering voice morph {name}: {future.exception()}")
+            return
+        self.cache.add(name)
+        with self.lock:
+            self.ready[source] = name
+
+    def shutdown(self):
+        with self.lock:
+            self.generation += 1
+        self.pool.shutdown(wait=False, cancel_futures=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Render a pitch/formant-morphed variant of an aya file.")
+    parser.add_argument('source')
+    parser.add_argument('output')
+    parser.add_argument('--semitones', type=float, default=0.0)
+    parser.add_argument('--formant', type=float, default=1.0)
+    args = parser.parse_args()
+    started = time.perf_counter()
+    render_variant(args.source, args.output, args.semitones, args.formant)
+    print(f"Rendered {args.output} in {time.perf_counter() - started:.2f}s")
+
+
+if __name__ == "__main__":
+    main()